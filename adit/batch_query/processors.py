@@ -6,6 +6,8 @@ from adit.core.processors import DicomTaskProcessor
 from adit.core.types import DicomLogEntry, ProcessingResult
 from adit.core.utils.dicom_dataset import QueryDataset, ResultDataset
 from adit.core.utils.dicom_operator import DicomOperator
+from adit.core.utils.parallel_queries import ParallelQueryExecutor, QueryFunc, merge_results
+from adit.core.utils.query_filter import QueryFilter
 
 from .models import BatchQueryResult, BatchQuerySettings, BatchQueryTask
 
@@ -17,15 +19,19 @@ class BatchQueryTaskProcessor(DicomTaskProcessor):
 
     def __init__(self, dicom_task: DicomTask) -> None:
         assert isinstance(dicom_task, BatchQueryTask)
+        super().__init__(dicom_task)
         self.query_task = dicom_task
 
         source = self.query_task.source
         assert source.node_type == DicomNode.NodeType.SERVER
         self.operator = DicomOperator(source.dicomserver)
+        # Independent queries (e.g. for multiple modalities) are run concurrently
+        self.query_executor = ParallelQueryExecutor(source.dicomserver)
 
     def _get_logs(self) -> list[DicomLogEntry]:
         logs: list[DicomLogEntry] = []
         logs.extend(self.operator.get_logs())
+        logs.extend(self.query_executor.logs)
         logs.extend(self.logs)
         return logs
 
@@ -91,92 +97,133 @@ class BatchQueryTaskProcessor(DicomTaskProcessor):
 
         return patients
 
-    def _find_studies(self, patient_id: str) -> list[ResultDataset]:
+    def _build_study_queries(self, patient_id: str) -> list[QueryDataset]:
         start_date = self.query_task.study_date_start
         end_date = self.query_task.study_date_end
         study_date = (start_date, end_date)
 
+        query_args = {
+            "PatientID": patient_id,
+            "PatientName": self.query_task.patient_name,
+            "PatientBirthDate": self.query_task.patient_birth_date,
+            "AccessionNumber": self.query_task.accession_number,
+            "StudyDate": study_date,
+            "StudyDescription": self.query_task.study_description,
+        }
+
         if not self.query_task.modalities:
-            study_results = list(
-                self.operator.find_studies(
-                    QueryDataset.create(
-                        PatientID=patient_id,
-                        PatientName=self.query_task.patient_name,
-                        PatientBirthDate=self.query_task.patient_birth_date,
-                        AccessionNumber=self.query_task.accession_number,
-                        StudyDate=study_date,
-                        StudyDescription=self.query_task.study_description,
-                    )
-                )
-            )
-        else:
-            seen: set[str] = set()
-            study_results: list[ResultDataset] = []
-            for modality in self.query_task.modalities:
-                # ModalitiesInStudy does not support to query multiple modalities at once,
-                # so we have to query them one by one.
-                studies = list(
-                    self.operator.find_studies(
-                        QueryDataset.create(
-                            PatientID=patient_id,
-                            PatientName=self.query_task.patient_name,
-                            PatientBirthDate=self.query_task.patient_birth_date,
-                            AccessionNumber=self.query_task.accession_number,
-                            StudyDate=study_date,
-                            StudyDescription=self.query_task.study_description,
-                            ModalitiesInStudy=modality,
-                        )
-                    )
-                )
-                for study in studies:
-                    if study.StudyInstanceUID not in seen:
-                        seen.add(study.StudyInstanceUID)
-                        study_results.append(study)
+            return [QueryDataset.create(**query_args)]
 
-        return sorted(study_results, key=lambda study: study.StudyDate)
+        # ModalitiesInStudy does not support to query multiple modalities at once,
+        # so we have to query them one by one.
+        return [
+            QueryDataset.create(**query_args, ModalitiesInStudy=modality)
+            for modality in self.query_task.modalities
+        ]
 
-    def _find_series(self, patient_id: str, study_uid: str) -> list[ResultDataset]:
+    def _build_series_queries(self, patient_id: str, study_uid: str) -> list[QueryDataset]:
         series_numbers = self.query_task.series_numbers
 
         if not series_numbers:
-            series_query = QueryDataset.create(
-                PatientID=patient_id,
-                StudyInstanceUID=study_uid,
-                SeriesDescription=self.query_task.series_description,
-            )
-            series_results = list(self.operator.find_series(series_query))
-        else:
-            seen: set[str] = set()
-            series_results: list[ResultDataset] = []
-            for series_number in series_numbers:
-                series_query = QueryDataset.create(
+            return [
+                QueryDataset.create(
                     PatientID=patient_id,
                     StudyInstanceUID=study_uid,
                     SeriesDescription=self.query_task.series_description,
-                    SeriesNumber=series_number,
                 )
-                series_list = list(self.operator.find_series(series_query))
-                for series in series_list:
-                    if series.SeriesInstanceUID not in seen:
-                        seen.add(series.SeriesInstanceUID)
-                        series_results.append(series)
+            ]
+
+        return [
+            QueryDataset.create(
+                PatientID=patient_id,
+                StudyInstanceUID=study_uid,
+                SeriesDescription=self.query_task.series_description,
+                SeriesNumber=series_number,
+            )
+            for series_number in series_numbers
+        ]
+
+    def _build_series_filters(self) -> dict[int | None, QueryFilter]:
+        """Returns the filters of the series queries (per series number). The series queries
+        of all studies only differ in the study they are for, so the filters are only
+        compiled once."""
+        series_description = self.query_task.series_description
+        series_numbers = self.query_task.series_numbers
+
+        if not series_numbers:
+            query = QueryDataset.create(SeriesDescription=series_description)
+            return {None: self.operator.create_query_filter(query, "SERIES")}
+
+        query_filters: dict[int | None, QueryFilter] = {}
+        for series_number in series_numbers:
+            query = QueryDataset.create(
+                SeriesDescription=series_description, SeriesNumber=series_number
+            )
+            query_filters[query.SeriesNumber] = self.operator.create_query_filter(query, "SERIES")
+        return query_filters
+
+    def _run_queries(
+        self, query_func: QueryFunc, query_groups: list[list[QueryDataset]], unique_key: str
+    ) -> list[list[ResultDataset]]:
+        """Runs all queries (of all groups) concurrently and returns the merged results
+        of each group."""
+        result_lists = self.query_executor.map(
+            query_func, [query for queries in query_groups for query in queries]
+        )
+
+        results: list[list[ResultDataset]] = []
+        offset = 0
+        for queries in query_groups:
+            group_results = result_lists[offset : offset + len(queries)]
+            results.append(merge_results(group_results, unique_key))
+            offset += len(queries)
+        return results
 
-        return sorted(series_results, key=lambda series: int(series.get("SeriesNumber", 0)))
+    def _find_studies(self, patient_ids: list[str]) -> list[list[ResultDataset]]:
+        """Returns the studies of each patient (sorted by StudyDate)."""
+        studies_per_patient = self._run_queries(
+            lambda operator, query: operator.find_studies(query),
+            [self._build_study_queries(patient_id) for patient_id in patient_ids],
+            "StudyInstanceUID",
+        )
+        return [
+            sorted(studies, key=lambda study: study.StudyDate) for studies in studies_per_patient
+        ]
+
+    def _find_series(self, studies: list[ResultDataset]) -> list[list[ResultDataset]]:
+        """Returns the series of each study (sorted by SeriesNumber)."""
+        query_filters = self._build_series_filters()
+        series_per_study = self._run_queries(
+            lambda operator, query: operator.find_series(
+                query, query_filter=query_filters[query.get("SeriesNumber")]
+            ),
+            [
+                self._build_series_queries(study.PatientID, study.StudyInstanceUID)
+                for study in studies
+            ],
+            "SeriesInstanceUID",
+        )
+        return [
+            sorted(series_list, key=lambda series: int(series.get("SeriesNumber", 0)))
+            for series_list in series_per_study
+        ]
+
+    def _warn_indistinct_patients(self, studies_per_patient: list[list[ResultDataset]]) -> None:
+        if len([studies for studies in studies_per_patient if studies]) > 1:
+            self.logs.append(
+                {
+                    "level": "Warning",
+                    "title": "Indistinct patients",
+                    "message": "Studies of multiple patients were found for this query.",
+                }
+            )
 
     def _query_studies(self, patient_ids: list[str]) -> list[BatchQueryResult]:
-        results: list[BatchQueryResult] = []
-        for patient_id in patient_ids:
-            studies = self._find_studies(patient_id)
-
-            if results and studies:
-                self.logs.append(
-                    {
-                        "level": "Warning",
-                        "title": "Indistinct patients",
-                        "message": "Studies of multiple patients were found for this query.",
-                    }
-                )
+        studies_per_patient = self._find_studies(patient_ids)
+        self._warn_indistinct_patients(studies_per_patient)
 
+        results: list[BatchQueryResult] = []
+        for studies in studies_per_patient:
             for study in studies:
                 batch_query_result = BatchQueryResult(
                     job=self.query_task.job,
@@ -201,40 +248,34 @@ class BatchQueryTaskProcessor(DicomTaskProcessor):
         return results
 
     def _query_series(self, patient_ids: list[str]) -> list[BatchQueryResult]:
+        studies_per_patient = self._find_studies(patient_ids)
+        self._warn_indistinct_patients(studies_per_patient)
+
+        # The series of all studies (of all patients) are queried at once
+        studies = [study for studies in studies_per_patient for study in studies]
+        series_per_study = self._find_series(studies)
+
         results: list[BatchQueryResult] = []
-        for patient_id in patient_ids:
-            studies = self._find_studies(patient_id)
-
-            if results and studies:
-                self.logs.append(
-                    {
-                        "level": "Warning",
-                        "title": "Indistinct patients",
-                        "message": "Studies of multiple patients were found for this query.",
-                    }
+        for study, series_list in zip(studies, series_per_study):
+            for series in series_list:
+                batch_query_result = BatchQueryResult(
+                    job=self.query_task.job,
+                    query=self.query_task,
+                    patient_id=study.PatientID,
+                    patient_name=study.PatientName,
+                    patient_birth_date=study.PatientBirthDate,
+                    study_uid=study.StudyInstanceUID,
+                    accession_number=study.AccessionNumber,
+                    study_date=study.StudyDate,
+                    study_time=study.StudyTime,
+                    study_description=study.StudyDescription,
+                    modalities=[series.Modality],
+                    image_count=study.NumberOfStudyRelatedInstances,
+                    pseudonym=self.query_task.pseudonym,
+                    series_uid=series.SeriesInstanceUID,
+                    series_description=series.SeriesDescription,
+                    series_number=str(series.SeriesNumber),
                 )
-
-            for study in studies:
-                series_list = self._find_series(patient_id, study.StudyInstanceUID)
-                for series in series_list:
-                    batch_query_result = BatchQueryResult(
-                        job=self.query_task.job,
-                        query=self.query_task,
-                        patient_id=study.PatientID,
-                        patient_name=study.PatientName,
-                        patient_birth_date=study.PatientBirthDate,
-                        study_uid=study.StudyInstanceUID,
-                        accession_number=study.AccessionNumber,
-                        study_date=study.StudyDate,
-                        study_time=study.StudyTime,
-                        study_description=study.StudyDescription,
-                        modalities=[series.Modality],
-                        image_count=study.NumberOfStudyRelatedInstances,
-                        pseudonym=self.query_task.pseudonym,
-                        series_uid=series.SeriesInstanceUID,
-                        series_description=series.SeriesDescription,
-                        series_number=str(series.SeriesNumber),
-                    )
-                    results.append(batch_query_result)
+                results.append(batch_query_result)
 
         return results
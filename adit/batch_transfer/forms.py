@@ -39,12 +39,14 @@ class BatchTransferJobForm(forms.ModelForm):
             "batch_file",
             "trial_protocol_id",
             "trial_protocol_name",
+            "skip_existing_images",
             "send_finished_mail",
         )
         labels = {
             "trial_protocol_id": "Trial ID",
             "trial_protocol_name": "Trial name",
             "ethics_application_id": "Ethics committee approval",
+            "skip_existing_images": "Skip images already present at the destination",
             "send_finished_mail": "Send Email when job is finished",
         }
         help_texts = {
@@ -60,6 +62,10 @@ class BatchTransferJobForm(forms.ModelForm):
                 "Fill only when to modify the ClinicalTrialProtocolName tag "
                 "of all transfered DICOM files. Leave blank otherwise."
             ),
+            "skip_existing_images": (
+                "Only transfer images that are not already present at the destination "
+                "(e.g. when re-running a job). Has no effect for pseudonymized transfers."
+            ),
         }
 
     def __init__(self, *args, **kwargs):
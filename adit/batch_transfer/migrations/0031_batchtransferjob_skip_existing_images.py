@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("batch_transfer", "0030_batchtransfertask_manifest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="batchtransferjob",
+            name="skip_existing_images",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,4 +1,5 @@
 import nest_asyncio
+import pytest
 
 pytest_plugins = ["adit_radis_shared.pytest_fixtures"]
 
@@ -11,3 +12,13 @@ def pytest_configure():
     # https://github.com/pytest-dev/pytest-asyncio/issues/543
     # https://github.com/microsoft/playwright-pytest/issues/167
     nest_asyncio.apply()
+
+
+@pytest.fixture(autouse=True)
+def clear_association_pool():
+    yield
+
+    # Make sure that no (mocked) association is reused by another test
+    from adit.core.utils.association_pool import association_pool
+
+    association_pool.clear()
@@ -8,6 +8,7 @@ from .models import (
     DicomJob,
     DicomNodeGroupAccess,
     DicomServer,
+    DicomServerHealth,
     DicomTask,
 )
 
@@ -61,12 +62,31 @@ class DicomNodeGroupAccessInline(admin.TabularInline):
 class DicomServerAdmin(admin.ModelAdmin):
     list_display = ("name", "ae_title", "host", "port")
     exclude = ("node_type",)
+    readonly_fields = ("accepted_storage_contexts", "accepted_storage_contexts_updated")
     inlines = (DicomNodeGroupAccessInline,)
+    actions = ("reset_accepted_storage_contexts",)
+
+    @admin.action(description="Reset accepted storage contexts")
+    def reset_accepted_storage_contexts(self, request, queryset):
+        queryset.update(accepted_storage_contexts={}, accepted_storage_contexts_updated=None)
 
 
 admin.site.register(DicomServer, DicomServerAdmin)
 
 
+class DicomServerHealthAdmin(admin.ModelAdmin):
+    list_display = ("server", "consecutive_failures", "circuit_opened_at", "updated")
+    readonly_fields = ("server", "samples", "consecutive_failures", "updated")
+    actions = ("close_circuit",)
+
+    @admin.action(description="Close circuit")
+    def close_circuit(self, request, queryset):
+        queryset.update(consecutive_failures=0, circuit_opened_at=None)
+
+
+admin.site.register(DicomServerHealth, DicomServerHealthAdmin)
+
+
 class DicomFolderAdmin(admin.ModelAdmin):
     list_display = ("name", "path")
     exclude = ("node_type",)
@@ -9,6 +9,15 @@ class RetriableDicomError(Exception):
     pass
 
 
+class DicomConnectionError(RetriableDicomError):
+    """The connection to a server failed (e.g. the association was rejected or aborted,
+    a timeout or a network error occurred, or the server responded with a server error).
+
+    In contrast to other (data-level) errors only those count against the health of
+    the server (see `core.utils.server_health`).
+    """
+
+
 class BatchFileSizeError(Exception):
     def __init__(self, batch_tasks_count: int, max_batch_size: int) -> None:
         super().__init__("Too many batch tasks.")
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_delete_queuedtask"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dicomserver",
+            name="accepted_storage_contexts",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="dicomserver",
+            name="accepted_storage_contexts_updated",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:00
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_dicomserver_accepted_storage_contexts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dicomserver",
+            name="max_concurrent_associations",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Maximum concurrent associations (or DICOMweb requests) to this server.",
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1)],
+            ),
+        ),
+        migrations.AddField(
+            model_name="dicomserver",
+            name="max_concurrent_retrievals",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Maximum concurrent retrievals (C-GET, C-MOVE, WADO-RS) from this server.",
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1)],
+            ),
+        ),
+    ]
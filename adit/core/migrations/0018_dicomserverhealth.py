@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_dicomserver_max_concurrent_associations_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DicomServerHealth",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("samples", models.JSONField(blank=True, default=list)),
+                ("consecutive_failures", models.PositiveIntegerField(default=0)),
+                ("circuit_opened_at", models.DateTimeField(blank=True, null=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                (
+                    "server",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="health",
+                        to="core.dicomserver",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "DICOM server healths",
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_dicomserverhealth"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dicomserver",
+            name="preferred_transfer_syntax",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("1.2.840.10008.1.2.4.90", "JPEG 2000 Lossless"),
+                    ("1.2.840.10008.1.2.4.80", "JPEG-LS Lossless"),
+                    ("1.2.840.10008.1.2.4.70", "JPEG Lossless (Selection Value 1)"),
+                    ("1.2.840.10008.1.2.5", "RLE Lossless"),
+                    ("1.2.840.10008.1.2.1.99", "Deflated Explicit VR Little Endian"),
+                ],
+                help_text=(
+                    "Transfer syntax to prefer for images retrieved from (C-GET) or stored on "
+                    "(C-STORE) this server. Images in another syntax are only transcoded if "
+                    "transcoding is enabled."
+                ),
+                max_length=64,
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_dicomserver_preferred_transfer_syntax"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dicomserver",
+            name="dicomweb_qido_page_size",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text=(
+                    "Number of results requested per QIDO-RS page (must not exceed the number of "
+                    "results the server returns at most). Empty uses the default, 0 requests all "
+                    "results at once."
+                ),
+                null=True,
+            ),
+        ),
+    ]
@@ -126,6 +126,16 @@ class DicomNodeGroupAccess(models.Model):
 class DicomServer(DicomNode):
     NODE_TYPE = DicomNode.NodeType.SERVER
 
+    class TransferSyntax(models.TextChoices):
+        JPEG_2000_LOSSLESS = "1.2.840.10008.1.2.4.90", "JPEG 2000 Lossless"
+        JPEG_LS_LOSSLESS = "1.2.840.10008.1.2.4.80", "JPEG-LS Lossless"
+        JPEG_LOSSLESS = "1.2.840.10008.1.2.4.70", "JPEG Lossless (Selection Value 1)"
+        RLE_LOSSLESS = "1.2.840.10008.1.2.5", "RLE Lossless"
+        DEFLATED_EXPLICIT_VR_LITTLE_ENDIAN = (
+            "1.2.840.10008.1.2.1.99",
+            "Deflated Explicit VR Little Endian",
+        )
+
     # traditional DICOM support
     ae_title = models.CharField(unique=True, max_length=16)
     host = models.CharField(max_length=255)
@@ -137,6 +147,37 @@ class DicomServer(DicomNode):
     study_root_get_support = models.BooleanField(default=False)
     study_root_move_support = models.BooleanField(default=False)
     store_scp_support = models.BooleanField(default=False)
+    # The transfer syntax that is proposed first (before the uncompressed ones) when
+    # retrieving images from (C-GET) or storing images on (C-STORE) the server
+    preferred_transfer_syntax = models.CharField(
+        blank=True,
+        max_length=64,
+        choices=TransferSyntax.choices,
+        help_text=(
+            "Transfer syntax to prefer for images retrieved from (C-GET) or stored on "
+            "(C-STORE) this server. Images in another syntax are only transcoded if "
+            "transcoding is enabled."
+        ),
+    )
+
+    # The storage contexts (abstract syntax to transfer syntax) the server accepted
+    # in a C-GET association, so that only those must be proposed again.
+    accepted_storage_contexts = models.JSONField(default=dict, blank=True)
+    accepted_storage_contexts_updated = models.DateTimeField(null=True, blank=True)
+
+    # Cluster wide limits (enforced by all workers) of the concurrent connections to the server
+    max_concurrent_associations = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1)],
+        help_text="Maximum concurrent associations (or DICOMweb requests) to this server.",
+    )
+    max_concurrent_retrievals = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1)],
+        help_text="Maximum concurrent retrievals (C-GET, C-MOVE, WADO-RS) from this server.",
+    )
 
     # (optional) DICOMweb support
     dicomweb_root_url = models.CharField(blank=True, max_length=2000)
@@ -147,10 +188,40 @@ class DicomServer(DicomNode):
     dicomweb_wado_prefix = models.CharField(blank=True, max_length=2000)
     dicomweb_stow_prefix = models.CharField(blank=True, max_length=2000)
     dicomweb_authorization_header = models.CharField(blank=True, max_length=2000)
+    dicomweb_qido_page_size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text=(
+            "Number of results requested per QIDO-RS page (must not exceed the number of "
+            "results the server returns at most). Empty uses the default, 0 requests all "
+            "results at once."
+        ),
+    )
 
     objects: DicomNodeManager["DicomServer"] = DicomNodeManager["DicomServer"]()
 
 
+class DicomServerHealth(models.Model):
+    """The observed health of a DICOM server (shared by all workers).
+
+    Holds the outcomes (and response latencies) of the latest operations with the server
+    and the state of its circuit breaker (see `core.utils.server_health`).
+    """
+
+    server = models.OneToOneField(DicomServer, on_delete=models.CASCADE, related_name="health")
+    # A list of [succeeded, latency in seconds (or null)] of the latest operations
+    samples = models.JSONField(default=list, blank=True)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    circuit_opened_at = models.DateTimeField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "DICOM server healths"
+
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__} [{self.pk}]"
+
+
 class DicomFolder(DicomNode):
     NODE_TYPE = DicomNode.NodeType.FOLDER
 
@@ -352,6 +423,8 @@ class TransferJob(DicomJob):
         blank=True, max_length=64, validators=[no_backslash_char_validator]
     )
     archive_password = models.CharField(blank=True, max_length=50)
+    # Only transfer the images that are not already present at the destination
+    skip_existing_images = models.BooleanField(default=False)
 
     class Meta(DicomJob.Meta):
         abstract = True
@@ -468,6 +541,9 @@ class TransferTask(DicomTask):
         max_length=64,
         validators=[no_backslash_char_validator, no_control_chars_validator],
     )
+    # The images that already reached the destination, so that a retry of the task
+    # only transfers the missing ones (see TransferManifest).
+    manifest = models.JSONField(default=dict, blank=True)
 
     class Meta(DicomTask.Meta):
         abstract = True
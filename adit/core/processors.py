@@ -1,25 +1,32 @@
 import abc
 import logging
-import os
-import subprocess
-import tempfile
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
 from functools import partial
+from io import BytesIO
 from pathlib import Path
-from typing import Callable
+from typing import Any, Callable, Iterator
 
 from dicognito.anonymizer import Anonymizer
-from dicognito.value_keeper import ValueKeeper
+from django import db
 from django.conf import settings
 from pydicom import Dataset
 
-from .errors import DicomError
+from .errors import DicomError, RetriableDicomError
 from .models import DicomAppSettings, DicomNode, DicomTask, TransferTask
 from .types import DicomLogEntry, ProcessingResult
+from .utils.archive import create_archive_writer
 from .utils.dicom_dataset import QueryDataset, ResultDataset
 from .utils.dicom_operator import DicomOperator
-from .utils.dicom_utils import write_dataset
+from .utils.dicom_utils import get_encoded_bytes, write_dataset
+from .utils.folder_writer import FolderWriter
+from .utils.pseudonymization import PseudonymizationPool, create_anonymizer, modify_dataset
 from .utils.sanitize import sanitize_filename
+from .utils.transfer_manifest import TransferManifest
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +35,10 @@ class DicomTaskProcessor(abc.ABC):
     app_name: str
     dicom_task_class: type[DicomTask]
     app_settings_class: type[DicomAppSettings]
-    logs: list[DicomLogEntry] = []
 
     def __init__(self, dicom_task: DicomTask) -> None:
         self.dicom_task = dicom_task
+        self.logs: list[DicomLogEntry] = []
 
     def is_suspended(self) -> bool:
         app_settings = self.app_settings_class.get()
@@ -51,6 +58,7 @@ class DicomTaskProcessor(abc.ABC):
 class TransferTaskProcessor(DicomTaskProcessor):
     def __init__(self, dicom_task: DicomTask) -> None:
         assert isinstance(dicom_task, TransferTask)
+        super().__init__(dicom_task)
         self.transfer_task = dicom_task
 
         source = self.transfer_task.source
@@ -62,6 +70,19 @@ class TransferTaskProcessor(DicomTaskProcessor):
         if destination.node_type == DicomNode.NodeType.SERVER:
             self.dest_operator = DicomOperator(destination.dicomserver)
 
+        # Metadata of the study to transfer, only queried once per task
+        self._study: ResultDataset | None = None
+        self._series_index: dict[str, list[ResultDataset]] | None = None
+
+        # The images that already reached the destination (also in previous attempts)
+        self._manifest = TransferManifest(self.transfer_task.manifest)
+        # The images that are already present at the destination (see skip_existing_images)
+        self._existing_images: set[str] = set()
+        # Maps the SOPInstanceUIDs of modified images to their original ones
+        self._original_uids: dict[str, str] = {}
+        # The manifest may also be saved by the threads that fetch series in parallel
+        self._manifest_save_lock = threading.Lock()
+
     def _get_logs(self) -> list[DicomLogEntry]:
         logs: list[DicomLogEntry] = []
         logs.extend(self.source_operator.get_logs())
@@ -71,13 +92,25 @@ class TransferTaskProcessor(DicomTaskProcessor):
         return logs
 
     def process(self) -> ProcessingResult:
-        if self.dest_operator:
-            self._transfer_to_server()
-        else:
-            if self.transfer_task.job.archive_password:
-                self._transfer_to_archive()
+        try:
+            if self.dest_operator:
+                if self._can_move_directly():
+                    self._move_to_server()
+                else:
+                    self._transfer_to_server()
             else:
-                self._transfer_to_folder()
+                if self.transfer_task.job.archive_password:
+                    self._transfer_to_archive()
+                else:
+                    self._transfer_to_folder()
+        except Exception:
+            # Remember what was already transferred, so that a retry can resume from there
+            self._save_manifest()
+            raise
+
+        if self.transfer_task.manifest:
+            self.transfer_task.manifest = {}
+            self.transfer_task.save(update_fields=["manifest"])
 
         status: TransferTask.Status = TransferTask.Status.SUCCESS
         message: str = "Transfer task completed successfully."
@@ -93,43 +126,202 @@ class TransferTaskProcessor(DicomTaskProcessor):
             "log": "\n".join([log["message"] for log in logs]),
         }
 
-    def _transfer_to_server(self) -> None:
-        with tempfile.TemporaryDirectory(prefix="adit_") as tmpdir:
-            patient_folder = self._download_to_folder(Path(tmpdir))
-            assert self.dest_operator
-            self.dest_operator.upload_images(patient_folder)
+    def _needs_modification(self) -> bool:
+        """Checks if the fetched images must be modified (see modify_dataset)."""
+        job = self.transfer_task.job
+        return bool(
+            self.transfer_task.pseudonym or job.trial_protocol_id or job.trial_protocol_name
+        )
 
-    def _transfer_to_archive(self) -> None:
-        assert self.transfer_task.destination.node_type == DicomNode.NodeType.FOLDER
-        archive_folder = Path(self.transfer_task.destination.dicomfolder.path)
-        archive_password = self.transfer_task.job.archive_password
+    def _can_move_directly(self) -> bool:
+        """Checks if the images can be moved by C-MOVE from the source server directly
+        to the destination server without passing ADIT."""
+        if not settings.ENABLE_DIRECT_MOVE_TRANSFERS:
+            return False
+
+        if self._needs_modification():
+            return False
+
+        # A move transfers the whole study or series, but we only want the missing images
+        if self.transfer_task.job.skip_existing_images:
+            return False
 
-        if settings.SELECTIVE_TRANSFER_ARCHIVE_TYPE == "7z":
-            suffix = ".7z"
-        elif settings.SELECTIVE_TRANSFER_ARCHIVE_TYPE == "zip":
-            suffix = ".zip"
+        source_server = self.transfer_task.source.dicomserver
+        if not (source_server.patient_root_move_support or source_server.study_root_move_support):
+            return False
+
+        destination = self.transfer_task.destination
+        return (
+            destination.node_type == DicomNode.NodeType.SERVER
+            and destination.dicomserver.store_scp_support
+        )
+
+    def _move_to_server(self) -> None:
+        dest_aet = self.transfer_task.destination.dicomserver.ae_title
+
+        study = self._find_study()
+
+        series_uids = self.transfer_task.series_uids
+        if series_uids:
+            for series_uid in series_uids:
+                series = self._find_series(series_uid)
+                completed = self.source_operator.move_series(
+                    study.PatientID, study.StudyInstanceUID, series_uid, dest_aet
+                )
+                self._verify_moved_images(
+                    completed,
+                    series.get("NumberOfSeriesRelatedInstances"),
+                    f"series {series_uid}",
+                )
         else:
-            raise DicomError(
-                f"Unsupported archive type: {settings.SELECTIVE_TRANSFER_ARCHIVE_TYPE}"
+            completed = self.source_operator.move_study(
+                study.PatientID, study.StudyInstanceUID, dest_aet
+            )
+            self._verify_moved_images(
+                completed,
+                study.get("NumberOfStudyRelatedInstances"),
+                f"study {study.StudyInstanceUID}",
+            )
+
+    def _verify_moved_images(self, completed: int | None, expected: Any, resource: str) -> None:
+        """Compares the completed C-MOVE sub-operations with the number of images
+        the source server reported for the study or series."""
+        if completed is None:
+            # The number of sub-operations is optional in the C-MOVE response
+            logger.debug("No completed sub-operations reported for %s.", resource)
+            return
+
+        try:
+            expected = int(expected)
+        except (TypeError, ValueError):
+            # The number of related instances is optional in the C-FIND response
+            return
+
+        if completed == 0 and expected > 0:
+            raise RetriableDicomError(f"No images of {resource} were moved.")
+
+        if completed < expected:
+            self.logs.append(
+                {
+                    "level": "Warning",
+                    "title": "Incomplete transfer",
+                    "message": f"Only {completed} of {expected} images of {resource} were moved.",
+                }
             )
 
-        archive_name = f"{self._create_destination_name()}{suffix}"
-        archive_path = archive_folder / archive_name
+    def _transfer_to_server(self) -> None:
+        assert self.dest_operator
+        dest_operator = self.dest_operator
+
+        # The fetched (and modified) images are directly forwarded to the destination
+        # server. A bounded queue sits between the download and the upload so that both
+        # overlap without staging the whole study on disk (and without buffering it in
+        # memory when the destination is slower than the source).
+        datasets: queue.Queue[Dataset | None] = queue.Queue(settings.TRANSFER_STREAM_QUEUE_SIZE)
+
+        def iter_datasets() -> Iterator[Dataset]:
+            while (ds := datasets.get()) is not None:
+                yield ds
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # The upload (and with it the connection to the destination server) is only
+            # started when the first image arrives. Otherwise it would occupy a connection
+            # slot of the destination server while the study is searched (and the existing
+            # images on the destination server are looked up), what deadlocks if the server
+            # allows only one connection at a time.
+            upload_future: Future[None] | None = None
+
+            def enqueue(upload_future: Future[None], ds: Dataset | None) -> bool:
+                while not upload_future.done():
+                    try:
+                        datasets.put(ds, timeout=1)
+                        return True
+                    except queue.Full:
+                        continue
+                # The upload stopped early (most probably because of an error), so there
+                # is nobody left who consumes the queue.
+                return False
+
+            def callback(ds: Dataset) -> None:
+                nonlocal upload_future
+                if upload_future is None:
+                    upload_future = executor.submit(
+                        dest_operator.upload_images,
+                        iter_datasets(),
+                        stored_callback=lambda ds: self._on_stored(
+                            ds.SOPInstanceUID, _get_encoded_size(ds)
+                        ),
+                    )
+
+                if not enqueue(upload_future, ds):
+                    raise DicomError("Upload to destination server stopped unexpectedly.")
+
+            try:
+                study = self._find_study()
+
+                # Make sure that explicitly chosen series really exist
+                series_uids = self.transfer_task.series_uids
+                for series_uid in series_uids:
+                    self._find_series(series_uid)
 
-        if not archive_path.is_file():
-            logger.debug(f"Creating archive at {archive_path}")
+                if self._should_skip_existing_images():
+                    self._existing_images = self._find_images_on_destination_server()
 
-            with tempfile.TemporaryDirectory(prefix="adit_") as tmpdir:
-                readme_path = Path(tmpdir) / "INDEX.txt"
-                with open(readme_path, "w", encoding="utf-8") as readme_file:
-                    readme_file.write(
-                        f"Archive created by {self.transfer_task.job} at {datetime.now()}."
+                with self._create_modifying_callback(callback) as modifying_callback:
+                    self._download_study(
+                        study.PatientID,
+                        study.StudyInstanceUID,
+                        modifying_callback,
+                        series_uids=series_uids or None,
                     )
-                _add_to_archive(archive_path, archive_password, readme_path)
+            except Exception:
+                # If the download was stopped because the upload failed then we raise
+                # the original error of the upload instead.
+                if upload_future and upload_future.done() and upload_future.exception():
+                    upload_future.result()
+                raise
+            finally:
+                # Signal the uploader that no more images will follow
+                if upload_future:
+                    enqueue(upload_future, None)
+
+            if upload_future:
+                upload_future.result()
 
-        with tempfile.TemporaryDirectory(prefix="adit_") as tmpdir:
-            patient_folder = self._download_to_folder(Path(tmpdir))
-            _add_to_archive(archive_path, archive_password, patient_folder)
+    def _transfer_to_archive(self) -> None:
+        assert self.transfer_task.destination.node_type == DicomNode.NodeType.FOLDER
+        archive_folder = Path(self.transfer_task.destination.dicomfolder.path)
+        archive_type = settings.SELECTIVE_TRANSFER_ARCHIVE_TYPE
+        archive_path = archive_folder / f"{self._create_destination_name()}.{archive_type}"
+
+        index = f"Archive created by {self.transfer_task.job} at {datetime.now()}."
+
+        # The SOPInstanceUIDs of the buffered images by their names in the archive
+        image_uids: dict[str, str] = {}
+
+        def on_stored(arcname: str, size: int) -> None:
+            if arcname in image_uids:
+                self._on_stored(image_uids.pop(arcname), size)
+
+        # The fetched images are directly added to the archive (in batches). Multiple tasks
+        # of the same job write to the same archive, which is coordinated by the writer.
+        with create_archive_writer(
+            archive_type,
+            archive_path,
+            self.transfer_task.job.archive_password,
+            buffer_size=settings.ARCHIVE_WRITE_BUFFER_SIZE,
+            initial_files={"INDEX.txt": index.encode("utf-8")},
+            stored_callback=on_stored,
+        ) as archive:
+
+            def write(ds: Dataset, file_path: Path) -> None:
+                buffer = BytesIO()
+                write_dataset(ds, buffer)
+                arcname = file_path.as_posix()
+                image_uids[arcname] = ds.SOPInstanceUID
+                archive.add(arcname, buffer.getvalue())
+
+            self._download_files(write)
 
     def _transfer_to_folder(self) -> None:
         assert self.transfer_task.destination.node_type == DicomNode.NodeType.FOLDER
@@ -146,17 +338,35 @@ class TransferTaskProcessor(DicomTaskProcessor):
         name += transfer_job.owner.username
         return sanitize_filename(name)
 
-    def _download_to_folder(
-        self,
-        download_folder: Path,
-    ) -> Path:
+    def _download_to_folder(self, download_folder: Path) -> None:
+        # The images are written in the background, so that a slow destination folder
+        # (e.g. on a network share) doesn't slow down the fetching of the images.
+        with FolderWriter(
+            download_folder,
+            workers=settings.FOLDER_WRITE_WORKERS,
+            queue_size=settings.FOLDER_WRITE_QUEUE_SIZE,
+            fsync_batch_size=settings.FOLDER_WRITE_FSYNC_BATCH_SIZE,
+            stored_callback=lambda ds, size: self._on_stored(ds.SOPInstanceUID, size),
+        ) as writer:
+            self._download_files(writer.write, download_folder)
+
+    def _download_files(
+        self, write: Callable[[Dataset, Path], None], download_folder: Path | None = None
+    ) -> None:
+        """Downloads the study and passes every (modified) dataset together with its
+        relative file path (patient folder / study folder / [series folder] / file name)
+        to the write function.
+
+        If the download folder is given, images that already exist in the study folder
+        there are skipped (when the job is set up to skip existing images).
+        """
         pseudonym = self.transfer_task.pseudonym
 
         if pseudonym:
-            patient_folder = download_folder / sanitize_filename(pseudonym)
+            patient_folder = Path(sanitize_filename(pseudonym))
         else:
             pseudonym = None
-            patient_folder = download_folder / sanitize_filename(self.transfer_task.patient_id)
+            patient_folder = Path(sanitize_filename(self.transfer_task.patient_id))
 
         study = self._find_study()
         modalities = study.ModalitiesInStudy
@@ -173,46 +383,40 @@ class TransferTaskProcessor(DicomTaskProcessor):
         if series_uids:
             modalities = set()
             for series_uid in series_uids:
-                # TODO: this seems to be very ineffective as we do a c-find for every series
-                # in a study and check if it is a wanted series. Better fetch all series of
-                # a study and check then.
-                for series in self._find_series_list(series_uid=series_uid):
-                    modalities.add(series.Modality)
+                modalities.add(self._find_series(series_uid).Modality)
 
         study_date = study.StudyDate
         study_time = study.StudyTime
         modalities = ",".join(modalities)
         prefix = f"{study_date.strftime('%Y%m%d')}-{study_time.strftime('%H%M%S')}"
         study_folder = patient_folder / f"{prefix}-{modalities}"
-        os.makedirs(study_folder, exist_ok=True)
 
-        anonymizer = self._setup_anonymizer()
+        if download_folder and self._should_skip_existing_images():
+            self._existing_images = _find_images_in_folder(download_folder / study_folder)
 
-        modifier = partial(
-            self._modify_dataset,
-            anonymizer,
-            pseudonym,
-        )
+        def callback(ds: Dataset) -> None:
+            final_folder: Path
+            if settings.CREATE_SERIES_SUB_FOLDERS:
+                series_folder_name = sanitize_filename(f"{ds.SeriesNumber}-{ds.SeriesDescription}")
+                final_folder = study_folder / series_folder_name
+            else:
+                final_folder = study_folder
 
-        if series_uids:
-            self._download_study(
-                study.PatientID,
-                study.StudyInstanceUID,
-                study_folder,
-                modifier,
-                series_uids=series_uids,
-            )
-        else:
+            file_name = sanitize_filename(f"{ds.SOPInstanceUID}.dcm")
+            write(ds, final_folder / file_name)
+
+        with self._create_modifying_callback(callback) as modifying_callback:
             self._download_study(
                 study.PatientID,
                 study.StudyInstanceUID,
-                study_folder,
-                modifier,
+                modifying_callback,
+                series_uids=series_uids or None,
             )
 
-        return patient_folder
-
     def _find_study(self) -> ResultDataset:
+        if self._study is not None:
+            return self._study
+
         studies = list(
             self.source_operator.find_studies(
                 QueryDataset.create(
@@ -257,62 +461,194 @@ class TransferTaskProcessor(DicomTaskProcessor):
                 }
             )
 
+        self._study = study
         return study
 
-    def _find_series_list(self, series_uid: str) -> list[ResultDataset]:
-        series_list = list(
-            self.source_operator.find_series(
-                QueryDataset.create(
-                    PatientID=self.transfer_task.patient_id,
-                    StudyInstanceUID=self.transfer_task.study_uid,
-                )
+    def _get_series_index(self) -> dict[str, list[ResultDataset]]:
+        """Returns all series of the study to transfer indexed by SeriesInstanceUID.
+
+        The series are queried only once per task with a single series level query.
+        """
+        if self._series_index is not None:
+            return self._series_index
+
+        study = self._find_study()
+        series_list = self.source_operator.find_series(
+            QueryDataset.create(
+                PatientID=study.PatientID,
+                StudyInstanceUID=study.StudyInstanceUID,
             )
         )
 
-        results = []
+        series_index: dict[str, list[ResultDataset]] = {}
         for series in series_list:
-            if series.SeriesInstanceUID == series_uid:
-                results.append(series)
+            series_index.setdefault(series.SeriesInstanceUID, []).append(series)
+
+        self._series_index = series_index
+        return series_index
+
+    def _should_skip_existing_images(self) -> bool:
+        if not self.transfer_task.job.skip_existing_images:
+            return False
+
+        # Pseudonymized images get new UIDs, so we can't tell which images already exist
+        if self.transfer_task.pseudonym:
+            logger.debug("Existing images can't be skipped when pseudonymizing.")
+            return False
+
+        return True
+
+    def _find_images_on_destination_server(self) -> set[str]:
+        """Returns the SOPInstanceUIDs of the images of the study to transfer that are
+        already present on the destination server."""
+        assert self.dest_operator
+        server = self.transfer_task.destination.dicomserver
+        if not (
+            server.patient_root_find_support
+            or server.study_root_find_support
+            or server.dicomweb_qido_support
+        ):
+            logger.warning(
+                "Can't skip existing images as destination %s does not support queries.", server
+            )
+            return set()
+
+        study = self._find_study()
+        existing_series_uids = {
+            series.SeriesInstanceUID
+            for series in self.dest_operator.find_series(
+                QueryDataset.create(
+                    PatientID=study.PatientID,
+                    StudyInstanceUID=study.StudyInstanceUID,
+                )
+            )
+        }
+
+        series_uids = self.transfer_task.series_uids or list(self._get_series_index().keys())
+
+        image_uids: set[str] = set()
+        for series_uid in series_uids:
+            if series_uid not in existing_series_uids:
+                continue
+
+            for image in self.dest_operator.find_images(
+                QueryDataset.create(
+                    PatientID=study.PatientID,
+                    StudyInstanceUID=study.StudyInstanceUID,
+                    SeriesInstanceUID=series_uid,
+                )
+            ):
+                image_uids.add(image.SOPInstanceUID)
+
+        return image_uids
+
+    def _is_transferred(self, image_uid: str) -> bool:
+        """Checks if the image was already transferred (by a previous attempt of the
+        task) or is already present at the destination."""
+        return self._manifest.is_stored(image_uid) or image_uid in self._existing_images
+
+    def _find_series(self, series_uid: str) -> ResultDataset:
+        results = self._get_series_index().get(series_uid, [])
 
         if len(results) == 0:
             raise DicomError(f"No series found with Series Instance UID {series_uid}.")
         if len(results) > 1:
             raise DicomError(f"Multiple series found with Series Instance UID {series_uid}.")
 
-        return results
+        return results[0]
 
     def _setup_anonymizer(self) -> Anonymizer:
-        anonymizer = Anonymizer()
-        for element in settings.SKIP_ELEMENTS_ANONYMIZATION:
-            anonymizer.add_element_handler(ValueKeeper(element))
-        return anonymizer
+        # The seed is persisted in the manifest, so that a retry of the task pseudonymizes
+        # the images (and especially their UIDs) the same way as the previous attempt.
+        seed = self._manifest.anonymization_seed if self.transfer_task.pseudonym else None
+        return create_anonymizer(settings.SKIP_ELEMENTS_ANONYMIZATION, seed=seed)
+
+    def _on_stored(self, image_uid: str, size: int | None) -> None:
+        """Records that the image (with the given possibly modified UID) reached the
+        destination."""
+        original_uid = self._original_uids.pop(image_uid, image_uid)
+        self._manifest.add_stored(original_uid, size)
+
+    def _save_manifest(self, force: bool = True) -> None:
+        with self._manifest_save_lock:
+            unsaved_changes = self._manifest.unsaved_changes
+            if not unsaved_changes:
+                return
+            if not force and unsaved_changes < settings.TRANSFER_MANIFEST_SAVE_INTERVAL:
+                return
+
+            self.transfer_task.manifest = self._manifest.to_dict()
+            self.transfer_task.save(update_fields=["manifest"])
+
+    @contextmanager
+    def _create_modifying_callback(
+        self, callback: Callable[[Dataset], None]
+    ) -> Iterator[Callable[[Dataset], None]]:
+        """Wraps the callback so that every fetched dataset is modified before.
+
+        When pseudonymizing and TRANSFER_PSEUDONYMIZATION_PROCESSES is set, the datasets
+        are modified by a pool of processes (but still passed to the callback in the
+        order they were fetched). Images that already reached the destination in a
+        previous attempt of the task are skipped.
+        """
+        pseudonym = self.transfer_task.pseudonym or None
+        job = self.transfer_task.job
+        modifier = partial(
+            modify_dataset,
+            self._setup_anonymizer(),
+            pseudonym,
+            job.trial_protocol_id,
+            job.trial_protocol_name,
+        )
+
+        # The original SOPInstanceUIDs of the images that are currently modified (in
+        # the same order as the modified images are passed to the callback).
+        original_uids: deque[str] = deque()
+
+        def tracking_callback(ds: Dataset) -> None:
+            original_uid = original_uids.popleft()
+            if ds.SOPInstanceUID != original_uid:
+                self._original_uids[ds.SOPInstanceUID] = original_uid
+            callback(ds)
+
+        def skip_stored(modify: Callable[[Dataset], None]) -> Callable[[Dataset], None]:
+            def skipping_callback(ds: Dataset) -> None:
+                self._save_manifest(force=False)
+
+                image_uid = ds.SOPInstanceUID
+                if self._is_transferred(image_uid):
+                    logger.debug("Skipping already transferred image %s.", image_uid)
+                    return
+
+                original_uids.append(image_uid)
+                modify(ds)
+
+            return skipping_callback
+
+        processes = settings.TRANSFER_PSEUDONYMIZATION_PROCESSES
+        if pseudonym and processes > 0:
+            with PseudonymizationPool(
+                modifier,
+                tracking_callback,
+                processes=processes,
+                max_pending=settings.TRANSFER_PSEUDONYMIZATION_QUEUE_SIZE,
+            ) as pool:
+                yield skip_stored(pool.submit)
+        else:
+
+            def modifying_callback(ds: Dataset) -> None:
+                modifier(ds)
+                tracking_callback(ds)
+
+            yield skip_stored(modifying_callback)
 
     def _download_study(
         self,
         patient_id: str,
         study_uid: str,
-        study_folder: Path,
-        modifier: Callable,
+        callback: Callable[[Dataset], None],
         series_uids: list[str] | None = None,
     ) -> None:
-        def callback(ds: Dataset | None) -> None:
-            if ds is None:
-                return
-
-            modifier(ds)
-
-            final_folder: Path
-            if settings.CREATE_SERIES_SUB_FOLDERS:
-                series_folder_name = sanitize_filename(f"{ds.SeriesNumber}-{ds.SeriesDescription}")
-                final_folder = study_folder / series_folder_name
-            else:
-                final_folder = study_folder
-
-            final_folder.mkdir(parents=True, exist_ok=True)
-            file_name = sanitize_filename(f"{ds.SOPInstanceUID}.dcm")
-            file_path = final_folder / file_name
-            write_dataset(ds, file_path)
-
         pseudonymize = bool(self.transfer_task.pseudonym)
         exclude_modalities = settings.EXCLUDE_MODALITIES
 
@@ -320,54 +656,37 @@ class TransferTaskProcessor(DicomTaskProcessor):
             # If specific series are selected we transfer only those series. When pseudonymizing
             # we have to check if a modality should be excluded.
             if pseudonymize and exclude_modalities:
-                filtered_series = []
+                series_index = self._get_series_index()
+                filtered_series_uids = []
                 for series_uid in series_uids:
-                    series_list = list(
-                        self.source_operator.find_series(
-                            QueryDataset.create(
-                                PatientID=patient_id,
-                                StudyInstanceUID=study_uid,
-                                SeriesInstanceUID=series_uid,
-                            )
-                        )
-                    )
-                    if not series_list:
+                    if series_uid not in series_index:
                         logger.warning(f"Series with UID {series_uid} not found.")
                         continue
 
-                    assert len(series_list) == 1
-                    series = series_list[0]
-
-                    if series.Modality in exclude_modalities:
+                    if self._find_series(series_uid).Modality in exclude_modalities:
                         continue
 
-                    filtered_series.append(series)
+                    filtered_series_uids.append(series_uid)
 
-                series_uids = [series.SeriesInstanceUID for series in filtered_series]
+                series_uids = filtered_series_uids
 
-            for series_uid in series_uids:
-                self.source_operator.fetch_series(
-                    patient_id=patient_id,
-                    study_uid=study_uid,
-                    series_uid=series_uid,
-                    callback=callback,
-                )
+            self._fetch_missing_series(patient_id, study_uid, series_uids, callback)
 
         elif pseudonymize:
             # If the whole study should be transferred and pseudonymized, we transfer on the
             # series level to exclude the specified modalities.
-            series_list = list(
-                self.source_operator.find_series(
-                    QueryDataset.create(PatientID=patient_id, StudyInstanceUID=study_uid)
-                )
-            )
-            for series in series_list:
-                series_uid = series.SeriesInstanceUID
-                modality = series.Modality
-                if modality in settings.EXCLUDE_MODALITIES:
-                    continue
-
-                self.source_operator.fetch_series(patient_id, study_uid, series_uid, callback)
+            series_uids = [
+                series_uid
+                for series_uid, series_list in self._get_series_index().items()
+                if series_list[0].Modality not in exclude_modalities
+            ]
+            self._fetch_missing_series(patient_id, study_uid, series_uids, callback)
+
+        elif self._manifest.is_resuming() or self._existing_images:
+            # When some images were already transferred (by a previous attempt or another
+            # job) we only fetch the missing ones (and so on the series level).
+            series_uids = list(self._get_series_index().keys())
+            self._fetch_missing_series(patient_id, study_uid, series_uids, callback)
 
         else:
             # Without pseudonymization we transfer the whole study as it is.
@@ -377,52 +696,141 @@ class TransferTaskProcessor(DicomTaskProcessor):
                 callback=callback,
             )
 
-    def _modify_dataset(
+    def _fetch_missing_series(
         self,
-        anonymizer: Anonymizer,
-        pseudonym: str | None,
-        ds: Dataset,
+        patient_id: str,
+        study_uid: str,
+        series_uids: list[str],
+        callback: Callable[[Dataset], None],
     ) -> None:
-        """Optionally pseudonymize an incoming dataset with the given pseudonym
-        and add the trial ID and name to the DICOM header if specified."""
-        if pseudonym:
-            anonymizer.anonymize(ds)
+        """Fetches the given series of a study, but without the images that were already
+        transferred (see _is_transferred).
 
-            ds.PatientID = pseudonym
-            ds.PatientName = pseudonym
+        Series that were only partly transferred are fetched image by image.
+        """
+        if not (self._manifest.is_resuming() or self._existing_images):
+            self._fetch_series(patient_id, study_uid, series_uids, callback)
+            return
+
+        missing_series_uids: list[str] = []
+        for series_uid in series_uids:
+            if self._manifest.is_series_complete(series_uid):
+                continue
+
+            image_uids = [
+                image.SOPInstanceUID
+                for image in self.source_operator.find_images(
+                    QueryDataset.create(
+                        PatientID=patient_id,
+                        StudyInstanceUID=study_uid,
+                        SeriesInstanceUID=series_uid,
+                    )
+                )
+            ]
+            missing_image_uids = [
+                image_uid for image_uid in image_uids if not self._is_transferred(image_uid)
+            ]
+
+            if not missing_image_uids:
+                self._manifest.add_complete_series(series_uid)
+            elif len(missing_image_uids) == len(image_uids):
+                missing_series_uids.append(series_uid)
+            else:
+                for image_uid in missing_image_uids:
+                    self.source_operator.fetch_image(
+                        patient_id=patient_id,
+                        study_uid=study_uid,
+                        series_uid=series_uid,
+                        image_uid=image_uid,
+                        callback=callback,
+                    )
 
-        trial_protocol_id = self.transfer_task.job.trial_protocol_id
-        trial_protocol_name = self.transfer_task.job.trial_protocol_name
+        self._fetch_series(patient_id, study_uid, missing_series_uids, callback)
 
-        if trial_protocol_id:
-            ds.ClinicalTrialProtocolID = trial_protocol_id
+    def _fetch_series(
+        self,
+        patient_id: str,
+        study_uid: str,
+        series_uids: list[str],
+        callback: Callable[[Dataset], None],
+    ) -> None:
+        """Fetches the given series of a study.
 
-        if trial_protocol_name:
-            ds.ClinicalTrialProtocolName = trial_protocol_name
+        If TRANSFER_PARALLEL_SERIES_FETCHES is greater than one, multiple series are
+        fetched at the same time (each with its own operator and so its own connection).
+        The callback is still only called by one thread at a time.
+        """
+        max_workers = min(settings.TRANSFER_PARALLEL_SERIES_FETCHES, len(series_uids))
 
-        if pseudonym and trial_protocol_id:
-            session_id = f"{ds.StudyDate}-{ds.StudyTime}"
-            ds.PatientComments = (
-                f"Project:{trial_protocol_id} Subject:{pseudonym} Session:{pseudonym}_{session_id}"
-            )
+        if max_workers <= 1:
+            for series_uid in series_uids:
+                self.source_operator.fetch_series(
+                    patient_id=patient_id,
+                    study_uid=study_uid,
+                    series_uid=series_uid,
+                    callback=callback,
+                )
+            return
+
+        source_server = self.transfer_task.source.dicomserver
+        lock = threading.Lock()
+
+        # The callback (e.g. the anonymizer used to modify the dataset) is not thread safe
+        def locked_callback(ds: Dataset) -> None:
+            with lock:
+                callback(ds)
 
+        def fetch(series_uid: str) -> None:
+            operator = DicomOperator(source_server)
+            try:
+                operator.fetch_series(
+                    patient_id=patient_id,
+                    study_uid=study_uid,
+                    series_uid=series_uid,
+                    callback=locked_callback,
+                )
+            finally:
+                with lock:
+                    self.logs.extend(operator.get_logs())
+                # The thread may have opened its own database connection (e.g. when saving
+                # the manifest) that would otherwise be leaked.
+                db.connection.close()
+
+        errors: dict[str, Exception] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(fetch, series_uid): series_uid for series_uid in series_uids}
+            for future in as_completed(futures):
+                series_uid = futures[future]
+                try:
+                    future.result()
+                except Exception as err:
+                    logger.error("Failed to fetch series %s: %s", series_uid, err)
+                    errors[series_uid] = err
+
+        if not errors:
+            return
+
+        # Programming errors are not wrapped so that they are reported as they are
+        for err in errors.values():
+            if not isinstance(err, (DicomError, RetriableDicomError)):
+                raise err
+
+        first_error = next(iter(errors.values()))
+        message = f"Failed to fetch {len(errors)} of {len(series_uids)} series: " + ", ".join(
+            errors.keys()
+        )
+        if all(isinstance(err, RetriableDicomError) for err in errors.values()):
+            raise RetriableDicomError(message) from first_error
+        raise DicomError(message) from first_error
 
-def _add_to_archive(archive_path: Path, archive_password: str, path_to_add: Path) -> None:
-    """Add a file or folder to an archive. If the archive does not exist
-    it will be created."""
-    cmd = ["7z", "a", "-y", "-mx1", f"-p{archive_password}"]
 
-    if settings.SELECTIVE_TRANSFER_ARCHIVE_TYPE == "7z":
-        cmd.extend(["-t7z", "-mhe=on"])
-    elif settings.SELECTIVE_TRANSFER_ARCHIVE_TYPE == "zip":
-        cmd.extend(["-tzip"])
-    else:
-        raise DicomError(f"Unsupported archive type: {settings.SELECTIVE_TRANSFER_ARCHIVE_TYPE}")
+def _find_images_in_folder(folder: Path) -> set[str]:
+    """Returns the SOPInstanceUIDs of the images in the folder (by their file names)."""
+    if not folder.is_dir():
+        return set()
+    return {path.stem for path in folder.rglob("*.dcm")}
 
-    cmd.extend([str(archive_path), str(path_to_add)])
 
-    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
-    proc.wait()
-    (_, stderr) = proc.communicate()
-    if proc.returncode != 0:
-        raise DicomError(f"Failed to add path {path_to_add} to archive {archive_path}: {stderr}")
+def _get_encoded_size(ds: Dataset) -> int | None:
+    encoded = get_encoded_bytes(ds)
+    return len(encoded) if encoded is not None else None
@@ -100,7 +100,12 @@ def process_dicom_task(context: JobContext, model_label: str, task_id: int):
 
     logger.info(f"Processing of {dicom_task} started.")
 
-    @concurrent.process(timeout=settings.DICOM_TASK_PROCESS_TIMEOUT, daemon=True)
+    # Daemonic processes are not allowed to have children, but the pseudonymization
+    # of transfers may use its own pool of processes.
+    @concurrent.process(
+        timeout=settings.DICOM_TASK_PROCESS_TIMEOUT,
+        daemon=settings.TRANSFER_PSEUDONYMIZATION_PROCESSES == 0,
+    )
     def _process_dicom_task(model_label: str, task_id: int) -> ProcessingResult:
         dicom_task = get_dicom_task(model_label, task_id)
         processor = get_dicom_processor(dicom_task)
@@ -165,7 +170,9 @@ def process_dicom_task(context: JobContext, model_label: str, task_id: int):
 
     finally:
         dicom_task.end = timezone.now()
-        dicom_task.save()
+        # Only the fields that were set here, as the processor may have saved other
+        # fields (e.g. the manifest of a transfer task) in the meantime.
+        dicom_task.save(update_fields=["status", "message", "log", "end"])
         logger.info(f"Processing of {dicom_task} ended.")
 
         with pglock.advisory(DISTRIBUTED_LOCK):
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("example_app", "0002_switch_to_procrastinate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exampletransfertask",
+            name="manifest",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,9 +1,16 @@
+import threading
+from pathlib import Path
+
 import pytest
+import pyzipper
 import time_machine
 from adit_radis_shared.accounts.factories import UserFactory
 from adit_radis_shared.common.utils.testing_helpers import add_user_to_group
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian
 from pytest_mock import MockerFixture
 
+from adit.core.errors import RetriableDicomError
 from adit.core.factories import (
     DicomFolderFactory,
     DicomServerFactory,
@@ -11,8 +18,13 @@ from adit.core.factories import (
 from adit.core.models import TransferJob, TransferTask
 from adit.core.processors import TransferTaskProcessor
 from adit.core.utils.auth_utils import grant_access
+from adit.core.utils.dicom_dataset import ResultDataset
 from adit.core.utils.dicom_operator import DicomOperator
-from adit.core.utils.testing_helpers import create_example_transfer_group, create_resources
+from adit.core.utils.testing_helpers import (
+    DicomTestHelper,
+    create_example_transfer_group,
+    create_resources,
+)
 
 from .example_app.factories import ExampleTransferJobFactory, ExampleTransferTaskFactory
 
@@ -41,9 +53,16 @@ def test_transfer_to_server_succeeds(mocker: MockerFixture):
 
     _, study = create_resources(task)
 
+    def fetch_study(patient_id, study_uid, callback):
+        callback(DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": "1.2.3.1"}))
+
     source_operator_mock = mocker.create_autospec(DicomOperator)
     source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.fetch_study.side_effect = fetch_study
     dest_operator_mock = mocker.create_autospec(DicomOperator)
+    dest_operator_mock.upload_images.side_effect = lambda resource, stored_callback=None: list(
+        resource
+    )
 
     processor = TransferTaskProcessor(task)
     mocker.patch.object(processor, "source_operator", source_operator_mock)
@@ -54,15 +73,538 @@ def test_transfer_to_server_succeeds(mocker: MockerFixture):
 
     # Assert
     source_operator_mock.fetch_study.assert_called_with(task.patient_id, task.study_uid, mocker.ANY)
-
-    upload_path = dest_operator_mock.upload_images.call_args.args[0]
-    assert upload_path.match(f"*/{study.PatientID}")
+    dest_operator_mock.upload_images.assert_called_once()
 
     assert result["status"] == TransferTask.Status.SUCCESS
     assert result["message"] == "Transfer task completed successfully."
     assert result["log"] == ""
 
 
+@pytest.mark.django_db
+def test_transfer_to_server_streams_images(mocker: MockerFixture):
+    # Arrange
+    user = UserFactory.create(username="kai")
+    group = create_example_transfer_group()
+    add_user_to_group(user, group)
+    job = ExampleTransferJobFactory.create(
+        status=TransferJob.Status.PENDING,
+        archive_password="",
+        owner=user,
+    )
+    task = ExampleTransferTaskFactory.create(
+        source=DicomServerFactory(),
+        destination=DicomServerFactory(),
+        status=TransferTask.Status.PENDING,
+        series_uids=[],
+        pseudonym="",
+        job=job,
+    )
+    grant_access(group, task.source, source=True)
+    grant_access(group, task.destination, destination=True)
+
+    _, study = create_resources(task)
+
+    fetched_images = [
+        DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": f"1.2.3.{i}"}) for i in range(5)
+    ]
+
+    def fetch_study(patient_id, study_uid, callback):
+        for ds in fetched_images:
+            callback(ds)
+
+    uploaded_images = []
+
+    def upload_images(resource, stored_callback=None):
+        uploaded_images.extend(resource)
+
+    source_operator_mock = mocker.create_autospec(DicomOperator)
+    source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.fetch_study.side_effect = fetch_study
+    dest_operator_mock = mocker.create_autospec(DicomOperator)
+    dest_operator_mock.upload_images.side_effect = upload_images
+
+    processor = TransferTaskProcessor(task)
+    mocker.patch.object(processor, "source_operator", source_operator_mock)
+    mocker.patch.object(processor, "dest_operator", dest_operator_mock)
+
+    # Act
+    result = processor.process()
+
+    # Assert
+    assert [ds.SOPInstanceUID for ds in uploaded_images] == [
+        ds.SOPInstanceUID for ds in fetched_images
+    ]
+    assert result["status"] == TransferTask.Status.SUCCESS
+
+
+@pytest.mark.django_db
+def test_transfer_to_server_starts_upload_with_first_image(mocker: MockerFixture):
+    # Arrange
+    user = UserFactory.create(username="kai")
+    group = create_example_transfer_group()
+    add_user_to_group(user, group)
+    job = ExampleTransferJobFactory.create(
+        status=TransferJob.Status.PENDING,
+        archive_password="",
+        owner=user,
+    )
+    task = ExampleTransferTaskFactory.create(
+        source=DicomServerFactory(),
+        destination=DicomServerFactory(),
+        status=TransferTask.Status.PENDING,
+        series_uids=[],
+        pseudonym="",
+        job=job,
+    )
+    grant_access(group, task.source, source=True)
+    grant_access(group, task.destination, destination=True)
+
+    _, study = create_resources(task)
+
+    uploads_before_fetch = []
+
+    def fetch_study(patient_id, study_uid, callback):
+        uploads_before_fetch.append(dest_operator_mock.upload_images.call_count)
+        callback(DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": "1.2.3.1"}))
+
+    source_operator_mock = mocker.create_autospec(DicomOperator)
+    source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.fetch_study.side_effect = fetch_study
+    dest_operator_mock = mocker.create_autospec(DicomOperator)
+    dest_operator_mock.upload_images.side_effect = lambda resource, stored_callback=None: list(
+        resource
+    )
+
+    processor = TransferTaskProcessor(task)
+    mocker.patch.object(processor, "source_operator", source_operator_mock)
+    mocker.patch.object(processor, "dest_operator", dest_operator_mock)
+
+    # Act
+    result = processor.process()
+
+    # Assert
+    assert uploads_before_fetch == [0]
+    dest_operator_mock.upload_images.assert_called_once()
+    assert result["status"] == TransferTask.Status.SUCCESS
+
+
+@pytest.mark.django_db
+def test_transfer_to_server_moves_directly_without_modification(mocker: MockerFixture, settings):
+    # Arrange
+    settings.ENABLE_DIRECT_MOVE_TRANSFERS = True
+    user = UserFactory.create(username="kai")
+    group = create_example_transfer_group()
+    add_user_to_group(user, group)
+    job = ExampleTransferJobFactory.create(
+        status=TransferJob.Status.PENDING,
+        archive_password="",
+        trial_protocol_id="",
+        trial_protocol_name="",
+        owner=user,
+    )
+    task = ExampleTransferTaskFactory.create(
+        source=DicomServerFactory(),
+        destination=DicomServerFactory(),
+        status=TransferTask.Status.PENDING,
+        series_uids=[],
+        pseudonym="",
+        job=job,
+    )
+    grant_access(group, task.source, source=True)
+    grant_access(group, task.destination, destination=True)
+
+    _, study = create_resources(task)
+    study._ds.NumberOfStudyRelatedInstances = 10
+
+    source_operator_mock = mocker.create_autospec(DicomOperator)
+    source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.move_study.return_value = 8
+    dest_operator_mock = mocker.create_autospec(DicomOperator)
+
+    processor = TransferTaskProcessor(task)
+    mocker.patch.object(processor, "source_operator", source_operator_mock)
+    mocker.patch.object(processor, "dest_operator", dest_operator_mock)
+
+    # Act
+    result = processor.process()
+
+    # Assert
+    source_operator_mock.move_study.assert_called_once_with(
+        task.patient_id, task.study_uid, task.destination.dicomserver.ae_title
+    )
+    source_operator_mock.fetch_study.assert_not_called()
+    dest_operator_mock.upload_images.assert_not_called()
+
+    assert result["status"] == TransferTask.Status.WARNING
+    assert result["message"] == "Incomplete transfer"
+
+
+@pytest.mark.django_db
+def test_transfer_fetches_series_in_parallel_and_collects_errors(mocker: MockerFixture, settings):
+    # Arrange
+    settings.TRANSFER_PARALLEL_SERIES_FETCHES = 3
+    user = UserFactory.create(username="kai")
+    group = create_example_transfer_group()
+    add_user_to_group(user, group)
+    job = ExampleTransferJobFactory.create(
+        status=TransferJob.Status.PENDING,
+        archive_password="",
+        owner=user,
+    )
+    series_uids = ["1.2.3.1", "1.2.3.2", "1.2.3.3"]
+    task = ExampleTransferTaskFactory.create(
+        source=DicomServerFactory(),
+        destination=DicomServerFactory(),
+        status=TransferTask.Status.PENDING,
+        series_uids=series_uids,
+        pseudonym="",
+        job=job,
+    )
+    grant_access(group, task.source, source=True)
+    grant_access(group, task.destination, destination=True)
+
+    _, study = create_resources(task)
+    series_list = [
+        ResultDataset(
+            DicomTestHelper.create_dataset_from_dict(
+                {"SeriesInstanceUID": series_uid, "Modality": "CT"}
+            )
+        )
+        for series_uid in series_uids
+    ]
+
+    def fetch_series(patient_id, study_uid, series_uid, callback):
+        if series_uid == "1.2.3.2":
+            raise RetriableDicomError("Connection refused.")
+
+    source_operator_mock = mocker.create_autospec(DicomOperator)
+    source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.find_series.side_effect = lambda query: iter(series_list)
+    source_operator_mock.fetch_series.side_effect = fetch_series
+    source_operator_mock.get_logs.return_value = []
+    dest_operator_mock = mocker.create_autospec(DicomOperator)
+    dest_operator_mock.get_logs.return_value = []
+    mocker.patch(
+        "adit.core.processors.DicomOperator",
+        side_effect=[source_operator_mock, dest_operator_mock, *[source_operator_mock] * 3],
+    )
+
+    processor = TransferTaskProcessor(task)
+
+    # Act
+    with pytest.raises(RetriableDicomError, match="Failed to fetch 1 of 3 series: 1.2.3.2"):
+        processor.process()
+
+    # Assert
+    assert source_operator_mock.fetch_series.call_count == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_transfer_saves_manifest_while_fetching_series_in_parallel(mocker: MockerFixture, settings):
+    # Arrange
+    settings.TRANSFER_PARALLEL_SERIES_FETCHES = 2
+    settings.TRANSFER_MANIFEST_SAVE_INTERVAL = 1
+    user = UserFactory.create(username="kai")
+    group = create_example_transfer_group()
+    add_user_to_group(user, group)
+    job = ExampleTransferJobFactory.create(
+        status=TransferJob.Status.PENDING,
+        archive_password="",
+        trial_protocol_id="",
+        trial_protocol_name="",
+        owner=user,
+    )
+    series_uids = ["1.2.3.1", "1.2.3.2"]
+    task = ExampleTransferTaskFactory.create(
+        source=DicomServerFactory(),
+        destination=DicomServerFactory(),
+        status=TransferTask.Status.PENDING,
+        series_uids=series_uids,
+        pseudonym="",
+        job=job,
+    )
+    grant_access(group, task.source, source=True)
+    grant_access(group, task.destination, destination=True)
+
+    _, study = create_resources(task)
+    series_list = [
+        ResultDataset(
+            DicomTestHelper.create_dataset_from_dict(
+                {"SeriesInstanceUID": series_uid, "Modality": "CT"}
+            )
+        )
+        for series_uid in series_uids
+    ]
+    images = {series_uid: [f"{series_uid}.1", f"{series_uid}.2"] for series_uid in series_uids}
+    stored_events = {
+        image_uid: threading.Event() for image_uids in images.values() for image_uid in image_uids
+    }
+
+    def fetch_series(patient_id, study_uid, series_uid, callback):
+        for image_uid in images[series_uid]:
+            callback(DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": image_uid}))
+            # Wait until the image reached the destination, so that the next image
+            # triggers a save of the manifest
+            assert stored_events[image_uid].wait(timeout=10)
+
+    def upload_images(resource, stored_callback=None):
+        for ds in resource:
+            stored_callback(ds)
+            stored_events[ds.SOPInstanceUID].set()
+
+    source_operator_mock = mocker.create_autospec(DicomOperator)
+    source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.find_series.side_effect = lambda query: iter(series_list)
+    source_operator_mock.fetch_series.side_effect = fetch_series
+    source_operator_mock.get_logs.return_value = []
+    dest_operator_mock = mocker.create_autospec(DicomOperator)
+    dest_operator_mock.upload_images.side_effect = upload_images
+    dest_operator_mock.get_logs.return_value = []
+    mocker.patch(
+        "adit.core.processors.DicomOperator",
+        side_effect=[source_operator_mock, dest_operator_mock, *[source_operator_mock] * 2],
+    )
+
+    saved_manifests: list[dict] = []
+    original_save = TransferTask.save
+
+    def save(self, *args, **kwargs):
+        if kwargs.get("update_fields") == ["manifest"]:
+            saved_manifests.append(self.manifest)
+        original_save(self, *args, **kwargs)
+
+    mocker.patch.object(TransferTask, "save", save)
+
+    processor = TransferTaskProcessor(task)
+
+    # Act
+    result = processor.process()
+
+    # Assert
+    assert result["status"] == TransferTask.Status.SUCCESS
+    intermediate_manifests = saved_manifests[:-1]
+    assert len(intermediate_manifests) >= 1
+    assert all(manifest["instances"] for manifest in intermediate_manifests)
+    assert saved_manifests[-1] == {}
+
+
+@pytest.mark.django_db
+def test_transfer_queries_series_of_study_only_once(mocker: MockerFixture, settings):
+    # Arrange
+    settings.EXCLUDE_MODALITIES = ["SR"]
+    user = UserFactory.create(username="kai")
+    group = create_example_transfer_group()
+    add_user_to_group(user, group)
+    job = ExampleTransferJobFactory.create(
+        status=TransferJob.Status.PENDING,
+        archive_password="",
+        owner=user,
+    )
+    task = ExampleTransferTaskFactory.create(
+        source=DicomServerFactory(),
+        destination=DicomServerFactory(),
+        status=TransferTask.Status.PENDING,
+        series_uids=["1.2.3.1", "1.2.3.2", "1.2.3.3"],
+        pseudonym="Foobar",
+        job=job,
+    )
+    grant_access(group, task.source, source=True)
+    grant_access(group, task.destination, destination=True)
+
+    _, study = create_resources(task)
+    series_list = [
+        ResultDataset(
+            DicomTestHelper.create_dataset_from_dict(
+                {"SeriesInstanceUID": series_uid, "Modality": modality}
+            )
+        )
+        for series_uid, modality in [("1.2.3.1", "CT"), ("1.2.3.2", "SR"), ("1.2.3.3", "CT")]
+    ]
+
+    source_operator_mock = mocker.create_autospec(DicomOperator)
+    source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.find_series.return_value = iter(series_list)
+    dest_operator_mock = mocker.create_autospec(DicomOperator)
+
+    processor = TransferTaskProcessor(task)
+    mocker.patch.object(processor, "source_operator", source_operator_mock)
+    mocker.patch.object(processor, "dest_operator", dest_operator_mock)
+
+    # Act
+    result = processor.process()
+
+    # Assert
+    source_operator_mock.find_studies.assert_called_once()
+    source_operator_mock.find_series.assert_called_once()
+    fetched_series_uids = [
+        call.kwargs["series_uid"] for call in source_operator_mock.fetch_series.call_args_list
+    ]
+    assert fetched_series_uids == ["1.2.3.1", "1.2.3.3"]
+    assert result["status"] == TransferTask.Status.SUCCESS
+
+
+@pytest.mark.django_db
+def test_transfer_resumes_from_manifest(mocker: MockerFixture):
+    # Arrange
+    user = UserFactory.create(username="kai")
+    group = create_example_transfer_group()
+    add_user_to_group(user, group)
+    job = ExampleTransferJobFactory.create(
+        status=TransferJob.Status.PENDING,
+        archive_password="",
+        trial_protocol_id="",
+        trial_protocol_name="",
+        owner=user,
+    )
+    task = ExampleTransferTaskFactory.create(
+        source=DicomServerFactory(),
+        destination=DicomServerFactory(),
+        status=TransferTask.Status.PENDING,
+        series_uids=[],
+        pseudonym="",
+        job=job,
+        manifest={"instances": {"1.2.3.1.1": 100}, "complete_series": ["1.2.3.3"]},
+    )
+    grant_access(group, task.source, source=True)
+    grant_access(group, task.destination, destination=True)
+
+    _, study = create_resources(task)
+    series_list = [
+        ResultDataset(
+            DicomTestHelper.create_dataset_from_dict(
+                {"SeriesInstanceUID": series_uid, "Modality": "CT"}
+            )
+        )
+        for series_uid in ["1.2.3.1", "1.2.3.2", "1.2.3.3"]
+    ]
+    images = {
+        "1.2.3.1": ["1.2.3.1.1", "1.2.3.1.2"],
+        "1.2.3.2": ["1.2.3.2.1"],
+    }
+
+    def find_images(query):
+        for image_uid in images[query.get("SeriesInstanceUID")]:
+            yield ResultDataset(
+                DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": image_uid})
+            )
+
+    def fetch_image(patient_id, study_uid, series_uid, image_uid, callback):
+        callback(DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": image_uid}))
+
+    def fetch_series(patient_id, study_uid, series_uid, callback):
+        for image_uid in images[series_uid]:
+            callback(DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": image_uid}))
+
+    uploaded_images = []
+
+    def upload_images(resource, stored_callback=None):
+        for ds in resource:
+            uploaded_images.append(ds.SOPInstanceUID)
+
+    source_operator_mock = mocker.create_autospec(DicomOperator)
+    source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.find_series.return_value = iter(series_list)
+    source_operator_mock.find_images.side_effect = find_images
+    source_operator_mock.fetch_image.side_effect = fetch_image
+    source_operator_mock.fetch_series.side_effect = fetch_series
+    dest_operator_mock = mocker.create_autospec(DicomOperator)
+    dest_operator_mock.upload_images.side_effect = upload_images
+
+    processor = TransferTaskProcessor(task)
+    mocker.patch.object(processor, "source_operator", source_operator_mock)
+    mocker.patch.object(processor, "dest_operator", dest_operator_mock)
+
+    # Act
+    result = processor.process()
+
+    # Assert
+    source_operator_mock.fetch_study.assert_not_called()
+    assert source_operator_mock.find_images.call_count == 2
+    source_operator_mock.fetch_image.assert_called_once()
+    source_operator_mock.fetch_series.assert_called_once()
+    assert uploaded_images == ["1.2.3.1.2", "1.2.3.2.1"]
+
+    assert result["status"] == TransferTask.Status.SUCCESS
+    task.refresh_from_db()
+    assert task.manifest == {}
+
+
+@pytest.mark.django_db
+def test_transfer_skips_images_existing_on_destination(mocker: MockerFixture):
+    # Arrange
+    user = UserFactory.create(username="kai")
+    group = create_example_transfer_group()
+    add_user_to_group(user, group)
+    job = ExampleTransferJobFactory.create(
+        status=TransferJob.Status.PENDING,
+        archive_password="",
+        trial_protocol_id="",
+        trial_protocol_name="",
+        skip_existing_images=True,
+        owner=user,
+    )
+    task = ExampleTransferTaskFactory.create(
+        source=DicomServerFactory(),
+        destination=DicomServerFactory(),
+        status=TransferTask.Status.PENDING,
+        series_uids=[],
+        pseudonym="",
+        job=job,
+    )
+    grant_access(group, task.source, source=True)
+    grant_access(group, task.destination, destination=True)
+
+    _, study = create_resources(task)
+
+    def create_series(series_uid):
+        return ResultDataset(
+            DicomTestHelper.create_dataset_from_dict(
+                {"SeriesInstanceUID": series_uid, "Modality": "CT"}
+            )
+        )
+
+    def create_image_finder(images):
+        def find_images(query):
+            for image_uid in images.get(query.get("SeriesInstanceUID"), []):
+                yield ResultDataset(
+                    DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": image_uid})
+                )
+
+        return find_images
+
+    source_images = {"1.2.3.1": ["1.2.3.1.1", "1.2.3.1.2"], "1.2.3.2": ["1.2.3.2.1"]}
+    dest_images = {"1.2.3.1": ["1.2.3.1.1"]}
+
+    def fetch_image(patient_id, study_uid, series_uid, image_uid, callback):
+        callback(DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": image_uid}))
+
+    source_operator_mock = mocker.create_autospec(DicomOperator)
+    source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.find_series.return_value = iter(
+        [create_series("1.2.3.1"), create_series("1.2.3.2")]
+    )
+    source_operator_mock.find_images.side_effect = create_image_finder(source_images)
+    source_operator_mock.fetch_image.side_effect = fetch_image
+    dest_operator_mock = mocker.create_autospec(DicomOperator)
+    dest_operator_mock.find_series.return_value = iter([create_series("1.2.3.1")])
+    dest_operator_mock.find_images.side_effect = create_image_finder(dest_images)
+
+    processor = TransferTaskProcessor(task)
+    mocker.patch.object(processor, "source_operator", source_operator_mock)
+    mocker.patch.object(processor, "dest_operator", dest_operator_mock)
+
+    # Act
+    result = processor.process()
+
+    # Assert
+    source_operator_mock.fetch_study.assert_not_called()
+    source_operator_mock.fetch_image.assert_called_once()
+    assert source_operator_mock.fetch_image.call_args.kwargs["image_uid"] == "1.2.3.1.2"
+    source_operator_mock.fetch_series.assert_called_once()
+    assert source_operator_mock.fetch_series.call_args.kwargs["series_uid"] == "1.2.3.2"
+    assert result["status"] == TransferTask.Status.SUCCESS
+
+
 @pytest.mark.django_db
 @time_machine.travel("2020-01-01")
 def test_transfer_to_folder_succeeds(mocker: MockerFixture):
@@ -95,8 +637,6 @@ def test_transfer_to_folder_succeeds(mocker: MockerFixture):
     processor = TransferTaskProcessor(task)
     mocker.patch.object(processor, "source_operator", source_operator_mock)
 
-    mocker.patch("adit.core.processors.os.mkdir", autospec=True)
-
     # Act
     result = processor.process()
 
@@ -109,7 +649,7 @@ def test_transfer_to_folder_succeeds(mocker: MockerFixture):
 
 
 @pytest.mark.django_db
-def test_transfer_to_archive_succeeds(mocker: MockerFixture):
+def test_transfer_to_archive_succeeds(mocker: MockerFixture, tmp_path: Path):
     # Arrange
     user = UserFactory.create(username="kai")
     group = create_example_transfer_group()
@@ -121,8 +661,9 @@ def test_transfer_to_archive_succeeds(mocker: MockerFixture):
     )
     task = ExampleTransferTaskFactory.create(
         source=DicomServerFactory(),
-        destination=DicomFolderFactory(),
+        destination=DicomFolderFactory(path=str(tmp_path)),
         status=TransferTask.Status.PENDING,
+        patient_id="1001",
         series_uids=[],
         pseudonym="",
         job=job,
@@ -132,23 +673,57 @@ def test_transfer_to_archive_succeeds(mocker: MockerFixture):
 
     _, study = create_resources(task)
 
+    ds = DicomTestHelper.create_dataset_from_dict(
+        {
+            "SOPClassUID": CTImageStorage,
+            "SOPInstanceUID": "1.2.3.4",
+            "SeriesNumber": 1,
+            "SeriesDescription": "Head",
+        }
+    )
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    def fetch_study(patient_id, study_uid, callback):
+        callback(ds)
+
     source_operator_mock = mocker.create_autospec(DicomOperator)
     source_operator_mock.find_studies.return_value = iter([study])
+    source_operator_mock.fetch_study.side_effect = fetch_study
 
     processor = TransferTaskProcessor(task)
     mocker.patch.object(processor, "source_operator", source_operator_mock)
 
-    Popen_mock = mocker.patch("subprocess.Popen")
-    Popen_mock.return_value.returncode = 0
-    Popen_mock.return_value.communicate.return_value = ("", "")
-
     # Act
     result = processor.process()
 
     # Assert
-    assert Popen_mock.call_args.args[0][0] == "7z"
-    assert Popen_mock.call_count == 2
+    archive_paths = list(tmp_path.glob("*.zip"))
+    assert len(archive_paths) == 1
+    with pyzipper.AESZipFile(archive_paths[0]) as archive:
+        archive.setpassword(b"mysecret")
+        assert archive.namelist() == [
+            "INDEX.txt",
+            "1001/20190923-080000-CT,SR/1-Head/1.2.3.4.dcm",
+        ]
 
     assert result["status"] == TransferTask.Status.SUCCESS
     assert result["message"] == "Transfer task completed successfully."
     assert result["log"] == ""
+
+
+@pytest.mark.django_db
+def test_processors_do_not_share_logs():
+    # Arrange
+    task = ExampleTransferTaskFactory.create(
+        source=DicomServerFactory(),
+        destination=DicomServerFactory(),
+    )
+    processor = TransferTaskProcessor(task)
+    other_processor = TransferTaskProcessor(task)
+
+    # Act
+    processor.logs.append({"level": "Warning", "title": "Test", "message": "Test warning."})
+
+    # Assert
+    assert other_processor.logs == []
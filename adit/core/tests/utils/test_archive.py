@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import pytest
+import pyzipper
+from pytest_mock import MockerFixture
+
+from adit.core.utils.archive import ZipArchiveWriter, create_archive_writer
+
+
+@pytest.mark.django_db
+def test_archive_writer_appends_files_and_reports_them(tmp_path: Path):
+    # Arrange
+    archive_path = tmp_path / "archive.zip"
+    stored_files = []
+    writer = create_archive_writer(
+        "zip",
+        archive_path,
+        "secret",
+        buffer_size=10,
+        initial_files={"INDEX.txt": b"index"},
+        stored_callback=lambda arcname, size: stored_files.append((arcname, size)),
+    )
+
+    # Act
+    with writer:
+        writer.add("foo.dcm", b"foo")
+        writer.add("bar.dcm", b"barbarbar")
+        writer.add("baz.dcm", b"baz")
+
+    # Assert
+    with pyzipper.AESZipFile(archive_path) as archive:
+        archive.setpassword(b"secret")
+        assert sorted(archive.namelist()) == ["INDEX.txt", "bar.dcm", "baz.dcm", "foo.dcm"]
+        assert archive.read("bar.dcm") == b"barbarbar"
+    assert stored_files == [("foo.dcm", 3), ("bar.dcm", 9), ("baz.dcm", 3)]
+
+
+@pytest.mark.django_db
+def test_archive_writer_keeps_original_error_when_flush_fails(
+    tmp_path: Path, mocker: MockerFixture
+):
+    # Arrange
+    mocker.patch.object(ZipArchiveWriter, "_append", side_effect=OSError("Disk full"))
+    stored_files = []
+    writer = create_archive_writer(
+        "zip",
+        tmp_path / "archive.zip",
+        "secret",
+        buffer_size=100,
+        stored_callback=lambda arcname, size: stored_files.append((arcname, size)),
+    )
+
+    # Act
+    with pytest.raises(ValueError, match="Fetching failed"):
+        with writer:
+            writer.add("foo.dcm", b"foo")
+            raise ValueError("Fetching failed")
+
+    # Assert
+    assert stored_files == []
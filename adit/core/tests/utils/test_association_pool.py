@@ -0,0 +1,71 @@
+from time import sleep
+from unittest.mock import create_autospec
+
+from pynetdicom.association import Association
+
+from adit.core.utils.association_pool import AssociationPool
+
+
+def create_association(alive: bool = True) -> Association:
+    assoc = create_autospec(Association)
+    assoc.is_established = alive
+    assoc.is_alive.return_value = alive
+    return assoc
+
+
+def test_association_pool_reuses_returned_association():
+    # Arrange
+    pool = AssociationPool()
+    assoc = create_association()
+
+    # Act
+    pool.release(("server", "C-FIND"), assoc, max_per_server=2)
+
+    # Assert
+    assert pool.acquire(("server", "C-STORE"), idle_timeout=30) is None
+    assert pool.acquire(("server", "C-FIND"), idle_timeout=30) is assoc
+    assert pool.acquire(("server", "C-FIND"), idle_timeout=30) is None
+
+
+def test_association_pool_skips_dead_association():
+    # Arrange
+    pool = AssociationPool()
+    assoc = create_association()
+    pool.release(("server", "C-FIND"), assoc, max_per_server=2)
+
+    # Act
+    assoc.is_alive.return_value = False
+
+    # Assert
+    assert pool.acquire(("server", "C-FIND"), idle_timeout=30) is None
+
+
+def test_association_pool_evicts_idle_association():
+    # Arrange
+    pool = AssociationPool()
+    assoc = create_association()
+
+    pool.release(("server", "C-FIND"), assoc, max_per_server=2)
+
+    # Act
+    sleep(0.01)
+    result = pool.acquire(("server", "C-FIND"), idle_timeout=0.001)
+
+    # Assert
+    assert result is None
+    assoc.release.assert_called_once()
+
+
+def test_association_pool_releases_association_when_full():
+    # Arrange
+    pool = AssociationPool()
+    assoc1 = create_association()
+    assoc2 = create_association()
+
+    # Act
+    pool.release(("server", "C-FIND"), assoc1, max_per_server=1)
+    pool.release(("server", "C-MOVE"), assoc2, max_per_server=1)
+
+    # Assert
+    assoc1.release.assert_not_called()
+    assoc2.release.assert_called_once()
@@ -0,0 +1,155 @@
+from io import BytesIO
+
+import httpx
+import pytest
+from pydicom import Dataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+from pytest_django.fixtures import SettingsWrapper
+from pytest_mock import MockerFixture
+
+from adit.core.errors import RetriableDicomError
+from adit.core.factories import DicomWebServerFactory
+from adit.core.utils.dicom_dataset import QueryDataset
+from adit.core.utils.dicom_operator import DicomOperator
+from adit.core.utils.dicom_utils import get_encoded_bytes, write_dataset
+from adit.core.utils.multipart import encode_multipart_related
+
+
+def create_encoded_image(patient_id: str) -> bytes:
+    ds = Dataset()
+    ds.PatientID = patient_id
+    ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+    ds.SOPInstanceUID = generate_uid()
+    ds.file_meta = Dataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+    ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+
+    buffer = BytesIO()
+    write_dataset(ds, buffer)
+    return buffer.getvalue()
+
+
+def mock_http_client(mocker: MockerFixture, handler) -> None:
+    mocker.patch(
+        "adit.core.utils.async_dicom_web_connector._get_client",
+        side_effect=lambda server: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+
+@pytest.mark.asyncio
+async def test_afetch_series_streams_images(mocker: MockerFixture):
+    # Arrange
+    images = [create_encoded_image("1001"), create_encoded_image("1002")]
+    requested_urls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested_urls.append(str(request.url))
+        return httpx.Response(
+            200,
+            headers={"Content-Type": 'multipart/related; type="application/dicom"; boundary=b1'},
+            content=encode_multipart_related(images, "b1", "application/dicom"),
+        )
+
+    mock_http_client(mocker, handler)
+    server = DicomWebServerFactory.build(dicomweb_wado_prefix="wadors")
+    operator = DicomOperator(server)
+
+    # Act
+    fetched = [ds async for ds in operator.afetch_series("1001", "1.2.3", "1.2.3.4")]
+
+    # Assert
+    assert requested_urls == [
+        f"{server.dicomweb_root_url.rstrip('/')}/wadors/studies/1.2.3/series/1.2.3.4"
+    ]
+    assert [get_encoded_bytes(ds) for ds in fetched] == images
+
+
+@pytest.mark.asyncio
+async def test_afind_studies_retries_unavailable_server(
+    mocker: MockerFixture, settings: SettingsWrapper
+):
+    # Arrange
+    settings.DICOMWEB_RETRIES = 1
+    settings.DICOMWEB_RETRY_BACKOFF_FACTOR = 0
+    status_codes = [503, 503, 200]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status_code = status_codes.pop(0)
+        if status_code != 200:
+            return httpx.Response(status_code)
+        return httpx.Response(200, json=[{"0020000D": {"vr": "UI", "Value": ["1.2.3"]}}])
+
+    mock_http_client(mocker, handler)
+    operator = DicomOperator(DicomWebServerFactory.build())
+
+    # Act
+    with pytest.raises(RetriableDicomError):
+        [r async for r in operator.afind_studies(QueryDataset.create(PatientID="1001"))]
+    results = [r async for r in operator.afind_studies(QueryDataset.create(PatientID="1001"))]
+
+    # Assert
+    assert [result.StudyInstanceUID for result in results] == ["1.2.3"]
+
+
+@pytest.mark.asyncio
+async def test_afind_studies_pages_results(mocker: MockerFixture, settings: SettingsWrapper):
+    # Arrange
+    settings.DICOMWEB_QIDO_PAGE_SIZE = 2
+    study_uids = ["1.2.1", "1.2.2", "1.2.3"]
+    requested_params: list[dict[str, str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = dict(request.url.params)
+        requested_params.append(params)
+        offset = int(params.get("offset", 0))
+        page = study_uids[offset : offset + int(params["limit"])]
+        return httpx.Response(
+            200, json=[{"0020000D": {"vr": "UI", "Value": [uid]}} for uid in page]
+        )
+
+    mock_http_client(mocker, handler)
+    operator = DicomOperator(DicomWebServerFactory.build())
+
+    # Act
+    results = [r async for r in operator.afind_studies(QueryDataset.create(PatientID="1001"))]
+
+    # Assert
+    assert [result.StudyInstanceUID for result in results] == study_uids
+    assert [(p["limit"], p.get("offset")) for p in requested_params] == [("2", None), ("2", "2")]
+
+
+@pytest.mark.asyncio
+async def test_afetch_series_metadata_uses_wado_rs_metadata(mocker: MockerFixture):
+    # Arrange
+    requested_urls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested_urls.append(str(request.url))
+        return httpx.Response(
+            200,
+            json=[
+                {
+                    "00080018": {"vr": "UI", "Value": ["1.2.3.4.5"]},
+                    "00280010": {"vr": "US", "Value": [512]},
+                    "7FE00010": {"vr": "OW", "BulkDataURI": "http://pacs/bulkdata/1"},
+                }
+            ],
+        )
+
+    mock_http_client(mocker, handler)
+    server = DicomWebServerFactory.build(dicomweb_wado_prefix="wadors")
+    operator = DicomOperator(server)
+
+    # Act
+    metadata = [ds async for ds in operator.afetch_series_metadata("1001", "1.2.3", "1.2.3.4")]
+
+    # Assert
+    assert requested_urls == [
+        f"{server.dicomweb_root_url.rstrip('/')}/wadors/studies/1.2.3/series/1.2.3.4/metadata"
+    ]
+    assert [ds.SOPInstanceUID for ds in metadata] == ["1.2.3.4.5"]
+    assert metadata[0].Rows == 512
+    assert "PixelData" not in metadata[0]
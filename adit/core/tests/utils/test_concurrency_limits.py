@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+from django import db
+
+from adit.core.factories import DicomServerFactory
+from adit.core.utils.concurrency_limits import acquire_server_lease
+
+
+@pytest.mark.django_db(transaction=True)
+def test_lease_blocks_until_slot_is_released():
+    # Arrange
+    server = DicomServerFactory.create(max_concurrent_associations=1)
+    lease = acquire_server_lease(server)
+    assert lease
+    acquired = threading.Event()
+
+    def acquire_in_other_thread():
+        other_lease = acquire_server_lease(server)
+        acquired.set()
+        assert other_lease
+        other_lease.release()
+        db.connection.close()
+
+    # Act
+    thread = threading.Thread(target=acquire_in_other_thread)
+    thread.start()
+    blocked = not acquired.wait(0.5)
+    lease.release()
+    thread.join(5)
+
+    # Assert
+    assert blocked
+    assert acquired.is_set()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_lease_is_reentrant_in_same_thread():
+    # Arrange
+    server = DicomServerFactory.create(max_concurrent_associations=1, max_concurrent_retrievals=1)
+
+    # Act
+    lease = acquire_server_lease(server, retrieval=True)
+    nested_lease = acquire_server_lease(server, retrieval=True)
+
+    # Assert
+    assert lease and nested_lease
+    assert nested_lease.release()
+    assert lease.release()
+    other_lease = acquire_server_lease(server)
+    assert other_lease and other_lease.release()
+
+
+@pytest.mark.django_db
+def test_no_lease_without_limits():
+    server = DicomServerFactory.create()
+    assert acquire_server_lease(server, retrieval=True) is None
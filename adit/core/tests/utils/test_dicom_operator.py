@@ -1,19 +1,25 @@
 import asyncio
+import json
 import threading
 from pathlib import Path
 from time import sleep
 
 import pytest
 from django.conf import settings
+from django.utils import timezone
 from pydicom import Dataset
+from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian, JPEG2000Lossless
 from pynetdicom.sop_class import (
     PatientRootQueryRetrieveInformationModelFind,  # type: ignore
     StudyRootQueryRetrieveInformationModelFind,  # type: ignore
 )
 from pytest_django.fixtures import SettingsWrapper
 from pytest_mock import MockerFixture
+from requests import Response
 
+from adit.core.factories import DicomServerFactory, DicomWebServerFactory
 from adit.core.utils.dicom_dataset import QueryDataset
+from adit.core.utils.dicom_operator import DicomOperator
 from adit.core.utils.dicom_utils import read_dataset
 from adit.core.utils.file_transmit import FileTransmitServer
 from adit.core.utils.testing_helpers import (
@@ -48,6 +54,28 @@ def test_find_patients(mocker: MockerFixture):
     )
 
 
+@pytest.mark.django_db
+def test_find_patients_reuses_association(mocker: MockerFixture):
+    # Arrange
+    associate_mock = mocker.patch("adit.core.utils.dimse_connector.AE.associate")
+    association_mock = create_association_mock()
+    associate_mock.return_value = association_mock
+    responses = [{"PatientName": "Foo^Bar", "PatientID": "1001"}]
+    association_mock.send_c_find.side_effect = lambda *args: (
+        DicomTestHelper.create_successful_c_find_responses(responses)
+    )
+    dicom_operator = create_dicom_operator()
+
+    # Act
+    for _ in range(3):
+        list(dicom_operator.find_patients(QueryDataset.create(PatientName="Foo^Bar")))
+
+    # Assert
+    associate_mock.assert_called_once()
+    assert association_mock.send_c_find.call_count == 3
+    association_mock.release.assert_not_called()
+
+
 @pytest.mark.django_db
 def test_find_studies_with_patient_root(mocker: MockerFixture):
     # Arrange
@@ -146,6 +174,51 @@ def test_download_series_with_c_get(mocker: MockerFixture):
     # called when we just mock send_c_get. And so we can't assert anything on received_ds.
 
 
+@pytest.mark.django_db
+def test_download_series_with_c_get_proposes_accepted_contexts(mocker: MockerFixture):
+    # Arrange
+    associate_mock = mocker.patch("adit.core.utils.dimse_connector.AE.associate", autospec=True)
+    association_mock = create_association_mock()
+    associate_mock.return_value = association_mock
+    association_mock.send_c_get.return_value = DicomTestHelper.create_successful_c_get_response()
+    server = DicomServerFactory.create(
+        accepted_storage_contexts={CTImageStorage: ExplicitVRLittleEndian},
+        accepted_storage_contexts_updated=timezone.now(),
+    )
+    dicom_operator = DicomOperator(server)
+
+    # Act
+    dicom_operator.fetch_series("1001", "1.2.3", "1.2.3.4", lambda ds: None)
+
+    # Assert
+    ae = associate_mock.call_args.args[0]
+    requested_syntaxes = [cx.abstract_syntax for cx in ae.requested_contexts]
+    assert len(requested_syntaxes) == 3
+    assert CTImageStorage in requested_syntaxes
+
+
+@pytest.mark.django_db
+def test_download_series_with_c_get_prefers_transfer_syntax(mocker: MockerFixture):
+    # Arrange
+    associate_mock = mocker.patch("adit.core.utils.dimse_connector.AE.associate", autospec=True)
+    association_mock = create_association_mock()
+    associate_mock.return_value = association_mock
+    association_mock.send_c_get.return_value = DicomTestHelper.create_successful_c_get_response()
+    server = DicomServerFactory.create(preferred_transfer_syntax=JPEG2000Lossless)
+    dicom_operator = DicomOperator(server)
+
+    # Act
+    dicom_operator.fetch_series("1001", "1.2.3", "1.2.3.4", lambda ds: None)
+
+    # Assert
+    ae = associate_mock.call_args.args[0]
+    storage_context = next(
+        cx for cx in ae.requested_contexts if cx.abstract_syntax == CTImageStorage
+    )
+    assert storage_context.transfer_syntax[0] == JPEG2000Lossless
+    assert ExplicitVRLittleEndian in storage_context.transfer_syntax
+
+
 @pytest.mark.django_db
 def test_download_series_with_c_move(settings: SettingsWrapper, mocker: MockerFixture):
     # Arrange
@@ -199,3 +272,267 @@ def test_download_series_with_c_move(settings: SettingsWrapper, mocker: MockerFi
     )
     association_mock.send_c_move.assert_called_once()
     assert received_ds[0] == ds
+
+
+@pytest.mark.django_db
+def test_upload_images_with_c_store_increments_message_ids(mocker: MockerFixture):
+    # Arrange
+    associate_mock = mocker.patch("adit.core.utils.dimse_connector.AE.associate")
+    association_mock = create_association_mock()
+    associate_mock.return_value = association_mock
+    association_mock.send_c_store.return_value = (
+        DicomTestHelper.create_successful_c_store_response()
+    )
+    datasets = [
+        DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": f"1.2.3.{i}"}) for i in range(3)
+    ]
+    dicom_operator = create_dicom_operator()
+
+    # Act
+    dicom_operator.upload_images(datasets)
+
+    # Assert
+    msg_ids = [call.args[1] for call in association_mock.send_c_store.call_args_list]
+    assert msg_ids == [1, 2, 3]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_images_with_parallel_c_store(settings: SettingsWrapper, mocker: MockerFixture):
+    # Arrange
+    settings.DIMSE_STORE_ASSOCIATIONS = 2
+    settings.DIMSE_ASSOCIATION_POOL_SIZE = 0
+    associate_mock = mocker.patch("adit.core.utils.dimse_connector.AE.associate")
+    association_mocks = []
+
+    def associate(*args, **kwargs):
+        association_mock = create_association_mock()
+        association_mock.send_c_store.return_value = (
+            DicomTestHelper.create_successful_c_store_response()
+        )
+        association_mocks.append(association_mock)
+        return association_mock
+
+    associate_mock.side_effect = associate
+    datasets = [
+        DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": f"1.2.3.{i}"})
+        for i in range(10)
+    ]
+    stored_threads = set()
+    stored_uids = []
+
+    def stored_callback(ds: Dataset):
+        stored_threads.add(threading.get_ident())
+        stored_uids.append(ds.SOPInstanceUID)
+
+    dicom_operator = create_dicom_operator()
+
+    # Act
+    dicom_operator.upload_images(datasets, stored_callback=stored_callback)
+
+    # Assert
+    assert associate_mock.call_count == 2
+    assert len(association_mocks) == 2
+    for association_mock in association_mocks:
+        association_mock.release.assert_called_once()
+    assert sum(mock.send_c_store.call_count for mock in association_mocks) == 10
+    assert sorted(stored_uids) == sorted(ds.SOPInstanceUID for ds in datasets)
+    assert stored_threads == {threading.get_ident()}
+
+
+def create_stow_response(result: Dataset) -> Response:
+    response = Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = "application/dicom+json"
+    response._content = json.dumps(result.to_json_dict()).encode("utf-8")
+    return response
+
+
+@pytest.mark.django_db
+def test_upload_images_with_batched_stow_rs(settings: SettingsWrapper, mocker: MockerFixture):
+    # Arrange
+    settings.DICOMWEB_STOW_BATCH_MAX_INSTANCES = 3
+    post_mock = mocker.patch("adit.core.utils.dicom_web_connector.Session.post")
+    datasets = []
+    for i in range(4):
+        ds = DicomTestHelper.create_dataset_from_dict(
+            {"SOPClassUID": CTImageStorage, "SOPInstanceUID": f"1.2.3.{i}"}
+        )
+        ds.file_meta = Dataset()
+        ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        datasets.append(ds)
+
+    failed_item = Dataset()
+    failed_item.ReferencedSOPInstanceUID = "1.2.3.1"
+    failed_item.FailureReason = 0xA700
+    batch_result = Dataset()
+    batch_result.FailedSOPSequence = [failed_item]
+    post_mock.side_effect = [
+        create_stow_response(batch_result),
+        create_stow_response(Dataset()),
+        create_stow_response(Dataset()),
+    ]
+
+    stored_uids = []
+    dicom_operator = DicomOperator(DicomWebServerFactory.create())
+
+    # Act
+    dicom_operator.upload_images(
+        datasets, stored_callback=lambda ds: stored_uids.append(ds.SOPInstanceUID)
+    )
+
+    # Assert
+    assert [
+        call.kwargs["data"].count(b"Content-Type: application/dicom\r\n")
+        for call in post_mock.call_args_list
+    ] == [3, 1, 1]
+    assert stored_uids == ["1.2.3.0", "1.2.3.1", "1.2.3.2", "1.2.3.3"]
+
+
+@pytest.mark.django_db
+def test_find_studies_with_paged_qido_rs(mocker: MockerFixture):
+    # Arrange
+    search_mock = mocker.patch(
+        "adit.core.utils.dicom_web_connector.DICOMwebClient.search_for_studies"
+    )
+    pages = [
+        [
+            {"0020000D": {"vr": "UI", "Value": ["1.2.1"]}},
+            {"0020000D": {"vr": "UI", "Value": ["1.2.2"]}},
+        ],
+        [{"0020000D": {"vr": "UI", "Value": ["1.2.3"]}}],
+    ]
+    search_mock.side_effect = pages
+    dicom_operator = DicomOperator(DicomWebServerFactory.create(dicomweb_qido_page_size=2))
+
+    # Act
+    results = list(dicom_operator.find_studies(QueryDataset.create(PatientID="1001")))
+
+    # Assert
+    assert [result.StudyInstanceUID for result in results] == ["1.2.1", "1.2.2", "1.2.3"]
+    assert [(c.kwargs["limit"], c.kwargs["offset"]) for c in search_mock.call_args_list] == [
+        (2, None),
+        (2, 2),
+    ]
+
+
+@pytest.mark.django_db
+def test_find_studies_stops_paging_if_offset_is_ignored(mocker: MockerFixture):
+    # Arrange
+    search_mock = mocker.patch(
+        "adit.core.utils.dicom_web_connector.DICOMwebClient.search_for_studies"
+    )
+    page = [
+        {"0020000D": {"vr": "UI", "Value": ["1.2.1"]}},
+        {"0020000D": {"vr": "UI", "Value": ["1.2.2"]}},
+    ]
+    search_mock.return_value = page
+    dicom_operator = DicomOperator(DicomWebServerFactory.create(dicomweb_qido_page_size=2))
+
+    # Act
+    results = list(dicom_operator.find_studies(QueryDataset.create(PatientID="1001")))
+
+    # Assert
+    assert [result.StudyInstanceUID for result in results] == ["1.2.1", "1.2.2"]
+    assert search_mock.call_count == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_fetch_study_with_parallel_wado_rs(settings: SettingsWrapper, mocker: MockerFixture):
+    # Arrange
+    settings.DICOMWEB_PARALLEL_WADO_FETCHES = 3
+    settings.DICOMWEB_WADO_INSTANCE_BATCH_SIZE = 2
+    mocker.patch(
+        "adit.core.utils.dicom_web_connector.DICOMwebClient.search_for_series",
+        return_value=[
+            {
+                "0020000E": {"vr": "UI", "Value": ["1.2.3.1"]},
+                "00201209": {"vr": "IS", "Value": [1]},
+            },
+            {
+                "0020000E": {"vr": "UI", "Value": ["1.2.3.2"]},
+                "00201209": {"vr": "IS", "Value": [3]},
+            },
+        ],
+    )
+    mocker.patch(
+        "adit.core.utils.dicom_web_connector.DICOMwebClient.search_for_instances",
+        return_value=[{"00080018": {"vr": "UI", "Value": [f"1.2.3.2.{i}"]}} for i in range(3)],
+    )
+
+    def create_image(series_uid: str, image_uid: str) -> Dataset:
+        return DicomTestHelper.create_dataset_from_dict(
+            {"SeriesInstanceUID": series_uid, "SOPInstanceUID": image_uid}
+        )
+
+    iter_series_mock = mocker.patch(
+        "adit.core.utils.dicom_web_connector.DICOMwebClient.iter_series",
+        side_effect=lambda study_uid, series_uid: iter([create_image(series_uid, "1.2.3.1.0")]),
+    )
+    retrieve_instance_mock = mocker.patch(
+        "adit.core.utils.dicom_web_connector.DICOMwebClient.retrieve_instance",
+        side_effect=lambda study_uid, series_uid, image_uid: create_image(series_uid, image_uid),
+    )
+    iter_study_mock = mocker.patch("adit.core.utils.dicom_web_connector.DICOMwebClient.iter_study")
+
+    callback_threads = set()
+    fetched_uids = []
+
+    def callback(ds: Dataset) -> None:
+        callback_threads.add(threading.get_ident())
+        fetched_uids.append(ds.SOPInstanceUID)
+
+    dicom_operator = DicomOperator(DicomWebServerFactory.create())
+
+    # Act
+    dicom_operator.fetch_study("1001", "1.2.3", callback)
+
+    # Assert
+    iter_study_mock.assert_not_called()
+    assert iter_series_mock.call_count == 1
+    assert retrieve_instance_mock.call_count == 3
+    assert sorted(fetched_uids) == ["1.2.3.1.0", "1.2.3.2.0", "1.2.3.2.1", "1.2.3.2.2"]
+    assert callback_threads == {threading.get_ident()}
+
+
+@pytest.mark.django_db
+def test_afetch_study_aborts_fetch_when_consumer_stops_early(
+    settings: SettingsWrapper, mocker: MockerFixture
+):
+    # Arrange
+    settings.DICOMWEB_WADO_QUEUE_SIZE = 1
+    dicom_operator = DicomOperator(DicomServerFactory.create())
+
+    passed_images = []
+    fetch_errors = []
+    fetch_finished = threading.Event()
+
+    def fetch_study(patient_id, study_uid, callback):
+        try:
+            for i in range(100):
+                callback(DicomTestHelper.create_dataset_from_dict({"SOPInstanceUID": f"1.2.3.{i}"}))
+                passed_images.append(i)
+        except Exception as err:
+            fetch_errors.append(err)
+            raise
+        finally:
+            fetch_finished.set()
+
+    mocker.patch.object(dicom_operator, "fetch_study", side_effect=fetch_study)
+
+    async def consume_first_image() -> Dataset:
+        images = dicom_operator.afetch_study("1001", "1.2.3")
+        try:
+            return await anext(images)
+        finally:
+            await images.aclose()
+
+    # Act
+    first_image = asyncio.run(consume_first_image())
+
+    # Assert
+    assert first_image.SOPInstanceUID == "1.2.3.0"
+    assert fetch_finished.wait(timeout=10)
+    assert len(fetch_errors) == 1
+    assert "aborted" in str(fetch_errors[0])
+    # The fetching paused as the queue was full
+    assert len(passed_images) <= 2
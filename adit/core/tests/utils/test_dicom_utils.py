@@ -1,4 +1,16 @@
 from datetime import date, datetime, time
+from io import BytesIO
+
+from pydicom import Dataset
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import (
+    CTImageStorage,
+    DeflatedExplicitVRLittleEndian,
+    ExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+    JPEG2000Lossless,
+    RLELossless,
+)
 
 from adit.core.utils.dicom_utils import (
     convert_to_dicom_date,
@@ -6,6 +18,14 @@ from adit.core.utils.dicom_utils import (
     convert_to_dicom_time,
     convert_to_python_date,
     convert_to_python_time,
+    discard_encoded_bytes,
+    get_encoded_bytes,
+    get_metadata,
+    is_convertible_transfer_syntax,
+    read_dataset,
+    read_encoded_dataset,
+    transcode_dataset,
+    write_dataset,
 )
 
 
@@ -51,3 +71,123 @@ def test_convert_to_python_date():
 
 def test_convert_to_python_time():
     assert convert_to_python_time("080000") == time(8, 0, 0)
+
+
+def test_write_dataset_writes_encoded_bytes_of_unmodified_dataset():
+    # Arrange
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.SOPClassUID = CTImageStorage
+    ds.SOPInstanceUID = "1.2.3.4"
+    buffer = BytesIO()
+    write_dataset(ds, buffer)
+    encoded = buffer.getvalue()
+
+    # Act
+    received_ds = read_encoded_dataset(encoded)
+    passthrough_buffer = BytesIO()
+    write_dataset(received_ds, passthrough_buffer)
+
+    discard_encoded_bytes(received_ds)
+    received_ds.SOPInstanceUID = "1.2.3.5"
+    modified_buffer = BytesIO()
+    write_dataset(received_ds, modified_buffer)
+
+    # Assert
+    assert passthrough_buffer.getvalue() == encoded
+    assert get_encoded_bytes(received_ds) is None
+    assert read_dataset(BytesIO(modified_buffer.getvalue())).SOPInstanceUID == "1.2.3.5"
+
+
+def test_write_dataset_does_not_write_encoded_bytes_of_modified_dataset():
+    # Arrange
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.SOPClassUID = CTImageStorage
+    ds.SOPInstanceUID = "1.2.3.4"
+    ds.PatientID = "1001"
+    buffer = BytesIO()
+    write_dataset(ds, buffer)
+    received_ds = read_encoded_dataset(buffer.getvalue())
+
+    # Act
+    received_ds.PatientID = "2002"
+    modified_buffer = BytesIO()
+    write_dataset(received_ds, modified_buffer)
+
+    # Assert
+    assert get_encoded_bytes(received_ds) is None
+    assert read_dataset(BytesIO(modified_buffer.getvalue())).PatientID == "2002"
+
+
+def test_get_metadata_leaves_out_bulk_data():
+    # Arrange
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.SOPClassUID = CTImageStorage
+    ds.SOPInstanceUID = "1.2.3.4"
+    ds.Rows = 2
+    ds.Columns = 2
+    ds.BitsAllocated = 8
+    ds.EncapsulatedDocument = b"\x00" * 8
+    ds.add_new(0x60003000, "OW", b"\x00" * 4)  # Overlay Data
+    block = ds.private_block(0x0009, "ADIT TEST", create=True)
+    block.add_new(0x01, "OB", b"\x01\x02")
+    ds.PixelData = b"\x00" * 4
+    buffer = BytesIO()
+    write_dataset(ds, buffer)
+
+    # Act
+    metadata = get_metadata(read_encoded_dataset(buffer.getvalue()))
+    in_memory_metadata = get_metadata(read_dataset(BytesIO(buffer.getvalue())))
+
+    # Assert
+    for result in [metadata, in_memory_metadata]:
+        assert result.SOPInstanceUID == "1.2.3.4"
+        assert result.Rows == 2
+        assert "PixelData" not in result
+        assert "EncapsulatedDocument" not in result
+        assert 0x60003000 not in result
+        assert result[0x00091001].value == b"\x01\x02"
+    assert get_encoded_bytes(metadata) is None
+
+
+def test_is_convertible_transfer_syntax():
+    assert is_convertible_transfer_syntax(ImplicitVRLittleEndian, ExplicitVRLittleEndian)
+    assert is_convertible_transfer_syntax(ExplicitVRLittleEndian, DeflatedExplicitVRLittleEndian)
+    assert is_convertible_transfer_syntax(JPEG2000Lossless, JPEG2000Lossless)
+    assert not is_convertible_transfer_syntax(JPEG2000Lossless, ExplicitVRLittleEndian)
+    assert not is_convertible_transfer_syntax(ExplicitVRLittleEndian, RLELossless)
+
+
+def test_transcode_dataset_to_rle_lossless_and_back():
+    # Arrange
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+    ds.SOPClassUID = CTImageStorage
+    ds.SOPInstanceUID = "1.2.3.4"
+    ds.Rows = 2
+    ds.Columns = 2
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.PixelData = bytes([1, 0, 2, 0, 3, 0, 4, 0])
+
+    # Act
+    transcode_dataset(ds, RLELossless)
+    compressed = ds.PixelData
+    transcode_dataset(ds, ExplicitVRLittleEndian)
+
+    # Assert
+    assert compressed != bytes([1, 0, 2, 0, 3, 0, 4, 0])
+    assert ds.file_meta.TransferSyntaxUID == ExplicitVRLittleEndian
+    assert ds.pixel_array.tolist() == [[1, 2], [3, 4]]
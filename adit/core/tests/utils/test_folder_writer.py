@@ -0,0 +1,79 @@
+import logging
+import time
+from pathlib import Path
+
+import pytest
+from pydicom import Dataset
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian
+
+from adit.core.utils.dicom_utils import read_dataset
+from adit.core.utils.folder_writer import FolderWriter
+
+
+def create_dataset(instance_number: int) -> Dataset:
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.SOPClassUID = CTImageStorage
+    ds.SOPInstanceUID = f"1.2.3.{instance_number}"
+    return ds
+
+
+def test_folder_writer_writes_all_datasets(tmp_path: Path):
+    # Arrange
+    writer = FolderWriter(tmp_path, workers=2, queue_size=2, fsync_batch_size=3)
+
+    # Act
+    with writer:
+        for i in range(10):
+            writer.write(create_dataset(i), Path(f"series{i % 2}") / f"{i}.dcm")
+
+    # Assert
+    for i in range(10):
+        ds = read_dataset(tmp_path / f"series{i % 2}" / f"{i}.dcm")
+        assert ds.SOPInstanceUID == f"1.2.3.{i}"
+
+
+def test_folder_writer_raises_write_error(tmp_path: Path):
+    # Arrange
+    (tmp_path / "blocked").write_text("not a folder")
+    writer = FolderWriter(tmp_path, workers=1, queue_size=1, fsync_batch_size=0)
+
+    # Act & Assert
+    with pytest.raises(OSError):
+        with writer:
+            for i in range(3):
+                writer.write(create_dataset(i), Path("blocked") / f"{i}.dcm")
+
+
+def test_folder_writer_cancels_queued_writes_on_error(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+):
+    # Arrange
+    written_uids = []
+
+    def slow_stored_callback(ds: Dataset, size: int) -> None:
+        # Keeps the first write running, so that the others are still queued
+        time.sleep(0.2)
+        written_uids.append(ds.SOPInstanceUID)
+
+    writer = FolderWriter(
+        tmp_path,
+        workers=1,
+        queue_size=10,
+        fsync_batch_size=0,
+        stored_callback=slow_stored_callback,
+    )
+
+    # Act
+    with caplog.at_level(logging.ERROR):
+        with pytest.raises(ValueError, match="Fetching failed"):
+            with writer:
+                for i in range(5):
+                    writer.write(create_dataset(i), Path(f"{i}.dcm"))
+                raise ValueError("Fetching failed")
+
+    # Assert
+    assert written_uids == ["1.2.3.0"]
+    assert "exception calling callback" not in caplog.text
@@ -0,0 +1,75 @@
+from unittest.mock import create_autospec
+
+from requests import Response
+
+from adit.core.factories import DicomServerFactory
+from adit.core.utils.dicom_web_connector import DicomWebConnector
+from adit.core.utils.http_pool import RETRIABLE_STATUS_CODES, HttpAdapterPool
+
+
+def test_http_adapter_pool_shares_adapter_per_key():
+    # Arrange
+    pool = HttpAdapterPool()
+
+    # Act
+    adapter = pool.get("server1", pool_size=5, retries=3, backoff_factor=0.5)
+
+    # Assert
+    assert pool.get("server1", pool_size=5, retries=3, backoff_factor=0.5) is adapter
+    assert pool.get("server2", pool_size=5, retries=3, backoff_factor=0.5) is not adapter
+    assert adapter._pool_maxsize == 5
+    assert adapter.max_retries.total == 3
+    assert set(adapter.max_retries.status_forcelist) == RETRIABLE_STATUS_CODES
+    assert "POST" not in adapter.max_retries.allowed_methods
+
+
+def test_http_adapter_pool_creates_new_adapter_after_clear():
+    # Arrange
+    pool = HttpAdapterPool()
+    adapter = pool.get("server", pool_size=5, retries=3, backoff_factor=0.5)
+
+    # Act
+    pool.clear()
+
+    # Assert
+    assert pool.get("server", pool_size=5, retries=3, backoff_factor=0.5) is not adapter
+
+
+def test_abort_only_closes_responses_of_connector():
+    # Arrange
+    server = DicomServerFactory.build()
+    connector = DicomWebConnector(server)
+    other_connector = DicomWebConnector(server)
+    session = connector._create_session()
+    other_session = other_connector._create_session()
+    response = create_autospec(Response)
+    other_response = create_autospec(Response)
+    for hook in session.hooks["response"]:
+        hook(response, stream=True)
+    for hook in other_session.hooks["response"]:
+        hook(other_response, stream=True)
+
+    # Act
+    connector.abort()
+
+    # Assert
+    assert session.get_adapter("https://") is other_session.get_adapter("https://")
+    response.close.assert_called_once()
+    other_response.close.assert_not_called()
+
+
+def test_only_streamed_responses_are_kept():
+    # Arrange
+    server = DicomServerFactory.build()
+    connector = DicomWebConnector(server)
+    session = connector._create_session()
+    streamed_response = create_autospec(Response)
+    read_response = create_autospec(Response)
+
+    # Act
+    for hook in session.hooks["response"]:
+        hook(streamed_response, stream=True)
+        hook(read_response, stream=False)
+
+    # Assert
+    assert connector._responses == [streamed_response]
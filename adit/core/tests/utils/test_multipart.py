@@ -0,0 +1,74 @@
+from typing import AsyncIterator
+
+import pytest
+
+from adit.core.utils.multipart import (
+    MultipartParser,
+    encode_multipart_related,
+    get_boundary,
+    iter_multipart_parts,
+)
+
+
+def test_multipart_parser_returns_parts_as_soon_as_complete():
+    # Arrange
+    body = encode_multipart_related([b"foo", b"bar\r\n--ba"], "abc", "application/dicom")
+    parser = MultipartParser(b"abc")
+
+    # Act
+    parts = [parser.feed(body[i : i + 3]) for i in range(0, len(body), 3)]
+    parser.close()
+
+    # Assert
+    assert [part for chunk_parts in parts for part in chunk_parts] == [b"foo", b"bar\r\n--ba"]
+    # The first part is returned before the whole body was received
+    assert next(i for i, chunk_parts in enumerate(parts) if chunk_parts) < len(parts) - 1
+
+
+def test_multipart_parser_ignores_preamble_and_epilogue():
+    # Arrange
+    body = b"preamble\r\n--abc\r\n\r\nfoo\r\n--abc--\r\nepilogue"
+    parser = MultipartParser(b"abc")
+
+    # Act
+    parts = parser.feed(body)
+    parser.close()
+
+    # Assert
+    assert parts == [b"foo"]
+
+
+def test_multipart_parser_fails_on_incomplete_message():
+    # Arrange
+    body = encode_multipart_related([b"foo", b"bar"], "abc", "application/dicom")
+    parser = MultipartParser(b"abc")
+
+    # Act
+    parts = parser.feed(body[:-10])
+
+    # Assert
+    assert parts == [b"foo"]
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_get_boundary():
+    assert get_boundary('multipart/related; type="application/dicom"; boundary="abc"') == b"abc"
+    assert get_boundary("multipart/related; Boundary=abc") == b"abc"
+    assert get_boundary("application/dicom") is None
+
+
+@pytest.mark.asyncio
+async def test_iter_multipart_parts():
+    # Arrange
+    body = encode_multipart_related([b"foo", b"bar"], "abc", "application/dicom")
+
+    async def chunks() -> AsyncIterator[bytes]:
+        for i in range(len(body)):
+            yield body[i : i + 1]
+
+    # Act
+    parts = [part async for part in iter_multipart_parts(chunks(), b"abc")]
+
+    # Assert
+    assert parts == [b"foo", b"bar"]
@@ -0,0 +1,48 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from adit.core.factories import DicomServerFactory
+from adit.core.utils.dicom_dataset import QueryDataset, ResultDataset
+from adit.core.utils.dicom_operator import DicomOperator
+from adit.core.utils.parallel_queries import ParallelQueryExecutor, merge_results
+from adit.core.utils.testing_helpers import DicomTestHelper
+
+
+def create_study(study_uid: str) -> ResultDataset:
+    return ResultDataset(DicomTestHelper.create_dataset_from_dict({"StudyInstanceUID": study_uid}))
+
+
+@pytest.mark.django_db
+def test_parallel_query_executor_runs_queries_with_own_operators(mocker: MockerFixture, settings):
+    # Arrange
+    settings.PARALLEL_QUERIES_PER_SERVER = 2
+    studies_by_modality = {"CT": ["1.1", "1.2"], "MR": ["1.2", "1.3"], "SR": []}
+
+    def find_studies(query):
+        return iter([create_study(uid) for uid in studies_by_modality[query.ModalitiesInStudy]])
+
+    operator_mocks = []
+
+    def create_operator(server):
+        operator_mock = mocker.create_autospec(DicomOperator)
+        operator_mock.find_studies.side_effect = find_studies
+        operator_mock.get_logs.return_value = []
+        operator_mocks.append(operator_mock)
+        return operator_mock
+
+    mocker.patch("adit.core.utils.parallel_queries.DicomOperator", side_effect=create_operator)
+    executor = ParallelQueryExecutor(DicomServerFactory.create())
+    queries = [QueryDataset.create(ModalitiesInStudy=modality) for modality in ["CT", "MR", "SR"]]
+
+    # Act
+    result_lists = executor.map(lambda operator, query: operator.find_studies(query), queries)
+
+    # Assert
+    assert len(operator_mocks) == 3
+    assert [[study.StudyInstanceUID for study in results] for results in result_lists] == [
+        ["1.1", "1.2"],
+        ["1.2", "1.3"],
+        [],
+    ]
+    merged = merge_results(result_lists, "StudyInstanceUID")
+    assert [study.StudyInstanceUID for study in merged] == ["1.1", "1.2", "1.3"]
@@ -0,0 +1,57 @@
+from functools import partial
+
+from pydicom import Dataset
+from pydicom.dataset import FileMetaDataset
+
+from adit.core.utils.pseudonymization import (
+    PseudonymizationPool,
+    create_anonymizer,
+    modify_dataset,
+)
+
+
+def create_dataset(instance_number: int) -> Dataset:
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.PatientID = "1001"
+    ds.PatientName = "Apple^Peter"
+    ds.StudyDate = "20190923"
+    ds.StudyTime = "080000"
+    ds.StudyInstanceUID = "1.2.840.113845.11.1000000001951524609.20200705182951.2689481"
+    ds.SOPInstanceUID = f"1.2.840.113845.11.1000000001951524609.20200705182951.{instance_number}"
+    return ds
+
+
+def test_modify_dataset():
+    # Arrange
+    ds = create_dataset(1)
+    anonymizer = create_anonymizer([])
+
+    # Act
+    modify_dataset(anonymizer, "Foobar", "trial1", "Some trial", ds)
+
+    # Assert
+    assert ds.PatientID == "Foobar"
+    assert ds.PatientName == "Foobar"
+    assert ds.ClinicalTrialProtocolID == "trial1"
+    assert ds.ClinicalTrialProtocolName == "Some trial"
+    assert ds.PatientComments.startswith("Project:trial1 Subject:Foobar")
+    assert ds.StudyInstanceUID != create_dataset(1).StudyInstanceUID
+
+
+def test_pseudonymization_pool_keeps_order_and_uid_mapping():
+    # Arrange
+    modifier = partial(modify_dataset, create_anonymizer([]), "Foobar", "", "")
+    expected = [create_dataset(i) for i in range(10)]
+    for ds in expected:
+        modifier(ds)
+
+    # Act
+    modified: list[Dataset] = []
+    with PseudonymizationPool(modifier, modified.append, processes=2, max_pending=3) as pool:
+        for i in range(10):
+            pool.submit(create_dataset(i))
+
+    # Assert
+    assert [ds.SOPInstanceUID for ds in modified] == [ds.SOPInstanceUID for ds in expected]
+    assert {ds.StudyInstanceUID for ds in modified} == {expected[0].StudyInstanceUID}
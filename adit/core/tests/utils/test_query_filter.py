@@ -0,0 +1,86 @@
+from datetime import date
+
+from adit.core.utils.dicom_dataset import QueryDataset, ResultDataset
+from adit.core.utils.query_filter import SERVER_FILTERED, QueryFilter
+from adit.core.utils.testing_helpers import DicomTestHelper
+
+
+def create_result(**attributes) -> ResultDataset:
+    return ResultDataset(DicomTestHelper.create_dataset_from_dict(attributes))
+
+
+def test_query_filter_filters_patients():
+    # Arrange
+    query = QueryDataset.from_dict(
+        {"PatientName": "Foo*", "PatientBirthDate": date(1976, 1, 1), "PatientSex": "M"}
+    )
+    query_filter = QueryFilter(query, "PATIENT")
+    results = [
+        create_result(PatientName="foo^bar", PatientBirthDate="19760101", PatientSex="M"),
+        create_result(PatientName="Bar^Baz", PatientBirthDate="19760101", PatientSex="M"),
+        create_result(PatientName="Foo^Baz", PatientBirthDate="19770101", PatientSex="M"),
+        create_result(PatientName="Foo^Baz", PatientBirthDate="", PatientSex="M"),
+        create_result(PatientName="Foo^Qux", PatientBirthDate="19760101", PatientSex="F"),
+    ]
+
+    # Act
+    filtered = list(query_filter.filter(results))
+
+    # Assert
+    assert [str(result.PatientName) for result in filtered] == ["foo^bar"]
+
+
+def test_query_filter_filters_studies_by_any_modality():
+    # Arrange
+    query = QueryDataset.create(ModalitiesInStudy="CT", StudyDescription="*Thorax*")
+    query_filter = QueryFilter(query, "STUDY")
+
+    # Act & Assert
+    assert query_filter.matches(
+        create_result(ModalitiesInStudy=["CT", "SR"], StudyDescription="CT Thorax")
+    )
+    assert not query_filter.matches(
+        create_result(ModalitiesInStudy=["MR"], StudyDescription="MR Thorax")
+    )
+    assert not query_filter.matches(
+        create_result(ModalitiesInStudy="CT", StudyDescription="CT Abdomen")
+    )
+
+
+def test_query_filter_compares_series_numbers_as_integers():
+    # Arrange
+    query_filter = QueryFilter(QueryDataset.create(SeriesNumber="+4"), "SERIES")
+
+    # Act & Assert
+    assert query_filter.matches(create_result(SeriesNumber="4"))
+    assert not query_filter.matches(create_result(SeriesNumber="5"))
+    assert not query_filter.matches(create_result(SeriesNumber=""))
+
+
+def test_query_filter_skips_unneeded_filters():
+    # Arrange
+    query = QueryDataset.create(PatientName="*", SeriesDescription="", Modality="CT")
+
+    # Act
+    patient_filter = QueryFilter(query, "PATIENT")
+    series_filter = QueryFilter(query, "SERIES", server_filtered=["Modality"])
+
+    # Assert
+    assert not patient_filter
+    assert not series_filter
+
+
+def test_query_filter_skips_attributes_matched_by_server():
+    # Arrange
+    query = QueryDataset.create(Modality="CT", SeriesNumber="4")
+
+    # Act
+    c_find_filter = QueryFilter(
+        query, "SERIES", server_filtered=SERVER_FILTERED["C-FIND"]["SERIES"]
+    )
+    qido_filter = QueryFilter(query, "SERIES", server_filtered=SERVER_FILTERED["QIDO-RS"]["SERIES"])
+
+    # Assert
+    assert c_find_filter.matches(create_result(Modality="MR", SeriesNumber="+4"))
+    assert not c_find_filter.matches(create_result(Modality="CT", SeriesNumber="5"))
+    assert not qido_filter
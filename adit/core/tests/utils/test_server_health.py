@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from pydicom import Dataset
+from pytest_django.fixtures import SettingsWrapper
+from pytest_mock import MockerFixture
+
+from adit.core.errors import DicomConnectionError, RetriableDicomError
+from adit.core.factories import DicomServerFactory
+from adit.core.models import DicomServerHealth
+from adit.core.utils.dicom_dataset import QueryDataset
+from adit.core.utils.dicom_operator import DicomOperator
+from adit.core.utils.server_health import (
+    ensure_server_available,
+    get_dimse_timeout,
+    record_failure,
+    record_success,
+)
+from adit.core.utils.testing_helpers import DicomTestHelper, create_association_mock
+
+
+@pytest.mark.django_db
+def test_circuit_opens_after_consecutive_failures(settings: SettingsWrapper):
+    # Arrange
+    settings.DICOM_SERVER_CIRCUIT_BREAKER_THRESHOLD = 3
+    server = DicomServerFactory.create()
+
+    # Act
+    for _ in range(3):
+        ensure_server_available(server)
+        record_failure(server)
+
+    # Assert
+    with pytest.raises(RetriableDicomError):
+        ensure_server_available(server)
+
+
+@pytest.mark.django_db
+def test_circuit_allows_single_probe_after_cooldown(settings: SettingsWrapper):
+    # Arrange
+    settings.DICOM_SERVER_CIRCUIT_BREAKER_COOLDOWN = 60
+    server = DicomServerFactory.create()
+    DicomServerHealth.objects.create(
+        server=server,
+        consecutive_failures=5,
+        circuit_opened_at=timezone.now() - timedelta(seconds=61),
+    )
+
+    # Act
+    ensure_server_available(server)
+
+    # Assert
+    with pytest.raises(RetriableDicomError):
+        ensure_server_available(server)
+    record_success(server, 0.1)
+    ensure_server_available(server)
+    health = DicomServerHealth.objects.get(server=server)
+    assert health.consecutive_failures == 0
+    assert health.circuit_opened_at is None
+
+
+@pytest.mark.django_db
+def test_dimse_timeout_is_derived_from_latencies(settings: SettingsWrapper):
+    # Arrange
+    settings.DIMSE_ADAPTIVE_TIMEOUT_FACTOR = 5
+    settings.DIMSE_ADAPTIVE_TIMEOUT_MIN = 10
+    settings.DIMSE_ADAPTIVE_TIMEOUT_MIN_SAMPLES = 10
+    server = DicomServerFactory.create()
+    default_timeout = get_dimse_timeout(server)
+
+    # Act
+    for i in range(20):
+        record_success(server, 4.0 if i == 0 else 1.0)
+
+    # Assert
+    assert default_timeout == settings.DIMSE_DEFAULT_TIMEOUT
+    assert get_dimse_timeout(server) == 10
+
+
+@pytest.mark.django_db
+def test_open_connection_fails_fast_when_circuit_is_open(mocker: MockerFixture):
+    # Arrange
+    associate_mock = mocker.patch("adit.core.utils.dimse_connector.AE.associate")
+    associate_mock.return_value = create_association_mock()
+    server = DicomServerFactory.create()
+    DicomServerHealth.objects.create(
+        server=server, consecutive_failures=5, circuit_opened_at=timezone.now()
+    )
+    dicom_operator = DicomOperator(server)
+
+    # Act
+    with pytest.raises(RetriableDicomError):
+        list(dicom_operator.find_patients(QueryDataset.create(PatientName="Foo^Bar")))
+
+    # Assert
+    associate_mock.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_only_connection_failures_are_recorded(mocker: MockerFixture):
+    # Arrange
+    associate_mock = mocker.patch("adit.core.utils.dimse_connector.AE.associate")
+    association_mock = create_association_mock()
+    associate_mock.return_value = association_mock
+    failure_status = Dataset()
+    failure_status.Status = 0xC000  # Unable to process
+    association_mock.send_c_find.return_value = [(failure_status, None)]
+    server = DicomServerFactory.create()
+    dicom_operator = DicomOperator(server)
+
+    # Act
+    with pytest.raises(RetriableDicomError):
+        list(dicom_operator.find_patients(QueryDataset.create(PatientName="Foo^Bar")))
+    association_mock.send_c_find.return_value = [(Dataset(), None)]
+    with pytest.raises(DicomConnectionError):
+        list(dicom_operator.find_patients(QueryDataset.create(PatientName="Foo^Bar")))
+
+    # Assert
+    health = DicomServerHealth.objects.get(server=server)
+    assert health.consecutive_failures == 1
+
+
+@pytest.mark.django_db
+def test_retrievals_use_default_dimse_timeout(settings: SettingsWrapper, mocker: MockerFixture):
+    # Arrange
+    settings.DIMSE_ADAPTIVE_TIMEOUT_MIN = 1
+    settings.DIMSE_ADAPTIVE_TIMEOUT_MIN_SAMPLES = 1
+    settings.DICOM_SERVER_LATENCY_BATCH_SIZE = 1
+    associate_mock = mocker.patch("adit.core.utils.dimse_connector.AE.associate")
+    association_mock = create_association_mock()
+    associate_mock.return_value = association_mock
+    association_mock.send_c_move.return_value = DicomTestHelper.create_successful_c_move_response()
+    server = DicomServerFactory.create()
+    record_success(server, 0.1)
+    dicom_operator = DicomOperator(server)
+
+    # Act
+    dicom_operator.dimse_connector.send_c_move(
+        QueryDataset.create(QueryRetrieveLevel="STUDY", StudyInstanceUID="1.2.3"),
+        settings.CALLING_AE_TITLE,
+    )
+
+    # Assert
+    assert get_dimse_timeout(server) == 1
+    assert dicom_operator.dimse_connector.dimse_timeout == settings.DIMSE_DEFAULT_TIMEOUT
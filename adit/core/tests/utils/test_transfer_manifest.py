@@ -0,0 +1,35 @@
+from adit.core.utils.transfer_manifest import TransferManifest
+
+
+def test_transfer_manifest_survives_round_trip():
+    # Arrange
+    manifest = TransferManifest()
+    seed = manifest.anonymization_seed
+    manifest.add_stored("1.2.3.1", 1024)
+    manifest.add_complete_series("1.2.3")
+
+    # Act
+    restored = TransferManifest(manifest.to_dict())
+
+    # Assert
+    assert restored.is_resuming()
+    assert restored.is_stored("1.2.3.1")
+    assert not restored.is_stored("1.2.3.2")
+    assert restored.is_series_complete("1.2.3")
+    assert restored.anonymization_seed == seed
+    assert restored.unsaved_changes == 0
+
+
+def test_transfer_manifest_counts_unsaved_changes():
+    # Arrange
+    manifest = TransferManifest()
+
+    # Act
+    manifest.add_stored("1.2.3.1", None)
+    manifest.add_stored("1.2.3.2", None)
+
+    # Assert
+    assert manifest.unsaved_changes == 2
+    manifest.to_dict()
+    assert manifest.unsaved_changes == 0
+    assert not TransferManifest().is_resuming()
@@ -0,0 +1,170 @@
+import abc
+import logging
+from pathlib import Path
+from types import TracebackType
+from typing import Callable, Literal
+
+import pglock
+import py7zr
+import pyzipper
+
+from ..errors import DicomError
+
+logger = logging.getLogger(__name__)
+
+ArchiveType = Literal["7z", "zip"]
+
+
+class ArchiveWriter(abc.ABC):
+    """Appends files to an encrypted archive.
+
+    The files are buffered in memory and appended in batches (when the buffer gets
+    full and when the writer is closed). Every append holds an advisory lock on the
+    archive, so that multiple tasks (e.g. of the same job) can write to the same
+    archive concurrently. Files that already exist in the archive (e.g. added by a
+    previous attempt of the same task) are skipped. The optional `stored_callback`
+    is called with the name and size of every file once it was appended.
+    """
+
+    def __init__(
+        self,
+        archive_path: Path,
+        password: str,
+        buffer_size: int,
+        initial_files: dict[str, bytes] | None = None,
+        stored_callback: Callable[[str, int], None] | None = None,
+    ) -> None:
+        """
+        Args:
+            archive_path: The path of the archive. It will be created if it doesn't exist.
+            password: The password to encrypt the archive with.
+            buffer_size: The maximum number of bytes to buffer before they get appended.
+            initial_files: Files (name to content) that are only added when the archive
+                gets created (e.g. an index file).
+            stored_callback: Called with the name and size of every appended file.
+        """
+        self.archive_path = archive_path
+        self.password = password
+        self.buffer_size = buffer_size
+        self.initial_files = initial_files or {}
+        self.stored_callback = stored_callback
+
+        self._buffer: list[tuple[str, bytes]] = []
+        self._buffered_bytes = 0
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.flush()
+            return
+
+        # Already fetched files are also added when something went wrong, so that they
+        # don't get lost (the task will add them again when retried). But the original
+        # error must not be replaced by an error of the flush.
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to flush archive %s.", self.archive_path)
+
+    def add(self, arcname: str, data: bytes) -> None:
+        """Adds a file with the given name (path inside the archive) and content."""
+        self._buffer.append((arcname, data))
+        self._buffered_bytes += len(data)
+        if self._buffered_bytes >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Appends all buffered files to the archive."""
+        with pglock.advisory(f"adit_archive_{self.archive_path}"):
+            files = self._buffer
+            if not self.archive_path.is_file():
+                logger.debug("Creating archive at %s", self.archive_path)
+                files = list(self.initial_files.items()) + files
+            elif not files:
+                return
+
+            try:
+                self._append(files)
+            except OSError as err:
+                raise DicomError(
+                    f"Failed to add files to archive {self.archive_path}: {err}"
+                ) from err
+
+        # Only reached when the files were really appended
+        if self.stored_callback:
+            for arcname, data in self._buffer:
+                self.stored_callback(arcname, len(data))
+
+        self._buffer = []
+        self._buffered_bytes = 0
+
+    @abc.abstractmethod
+    def _append(self, files: list[tuple[str, bytes]]) -> None:
+        """Appends the files to the archive (or creates it when it doesn't exist)."""
+        ...
+
+
+class ZipArchiveWriter(ArchiveWriter):
+    """Writes AES encrypted zip archives (the file names are not encrypted)."""
+
+    def _append(self, files: list[tuple[str, bytes]]) -> None:
+        with pyzipper.AESZipFile(
+            self.archive_path,
+            "a",
+            compression=pyzipper.ZIP_DEFLATED,
+            compresslevel=1,
+            encryption=pyzipper.WZ_AES,
+        ) as archive:
+            archive.setpassword(self.password.encode("utf-8"))
+            existing = set(archive.namelist())
+            for arcname, data in files:
+                if arcname not in existing:
+                    archive.writestr(arcname, data)
+
+
+class SevenZipArchiveWriter(ArchiveWriter):
+    """Writes AES encrypted 7z archives (with encrypted file names)."""
+
+    filters = [
+        {"id": py7zr.FILTER_LZMA2, "preset": 1},
+        {"id": py7zr.FILTER_CRYPTO_AES256_SHA256},
+    ]
+
+    def _append(self, files: list[tuple[str, bytes]]) -> None:
+        mode = "a" if self.archive_path.is_file() else "w"
+        with py7zr.SevenZipFile(
+            self.archive_path,
+            mode,
+            password=self.password,
+            header_encryption=True,
+            filters=self.filters,
+        ) as archive:
+            existing = set(archive.getnames()) if mode == "a" else set()
+            for arcname, data in files:
+                if arcname not in existing:
+                    archive.writestr(data, arcname)
+
+
+def create_archive_writer(
+    archive_type: ArchiveType,
+    archive_path: Path,
+    password: str,
+    buffer_size: int,
+    initial_files: dict[str, bytes] | None = None,
+    stored_callback: Callable[[str, int], None] | None = None,
+) -> ArchiveWriter:
+    if archive_type == "7z":
+        writer_class = SevenZipArchiveWriter
+    elif archive_type == "zip":
+        writer_class = ZipArchiveWriter
+    else:
+        raise DicomError(f"Unsupported archive type: {archive_type}")
+
+    return writer_class(archive_path, password, buffer_size, initial_files, stored_callback)
@@ -0,0 +1,115 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Hashable
+
+from pynetdicom.association import Association
+
+logger = logging.getLogger(__name__)
+
+# The server part of the key identifies the server (and its connection settings),
+# the last part is the DIMSE service the association was negotiated for.
+PoolKey = tuple[Hashable, ...]
+
+
+class AssociationPool:
+    """A pool of idle associations (per process) that can be reused by later operations.
+
+    The associations are keyed by the server and the DIMSE service (as the negotiated
+    presentation contexts depend on the service). A borrowed association is exclusively
+    used by the borrower until it is returned. Idle associations that are older than the
+    idle timeout (servers often close idle associations themselves) or that are not
+    alive anymore are never handed out again. At most `max_per_server` idle associations
+    are kept for each server, further returned associations are released.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._idle: dict[PoolKey, list[tuple[Association, float]]] = {}
+
+    def acquire(self, key: PoolKey, idle_timeout: float) -> Association | None:
+        """Borrows an idle association for the key (or returns None if there is none)."""
+        stale: list[Association] = []
+        assoc: Association | None = None
+
+        with self._lock:
+            stale.extend(self._remove_expired(idle_timeout))
+
+            idle = self._idle.get(key, [])
+            while idle:
+                # The most recently returned association is the least likely one that
+                # was closed by the server in the meantime.
+                candidate, _ = idle.pop()
+                if _is_usable(candidate):
+                    assoc = candidate
+                    break
+
+        self._release_all(stale)
+        return assoc
+
+    def release(self, key: PoolKey, assoc: Association, max_per_server: int) -> None:
+        """Returns a borrowed association to the pool (or releases it if the pool is full)."""
+        if not _is_usable(assoc):
+            return
+
+        with self._lock:
+            server_key = key[:-1]
+            idle_count = sum(
+                len(entries) for k, entries in self._idle.items() if k[:-1] == server_key
+            )
+            if idle_count < max_per_server:
+                self._idle.setdefault(key, []).append((assoc, time.monotonic()))
+                return
+
+        self._release_all([assoc])
+
+    def clear(self) -> None:
+        """Releases all idle associations."""
+        with self._lock:
+            idle = [assoc for entries in self._idle.values() for assoc, _ in entries]
+            self._idle = {}
+
+        self._release_all(idle)
+
+    def _remove_expired(self, idle_timeout: float) -> list[Association]:
+        expired: list[Association] = []
+        now = time.monotonic()
+        for key, entries in list(self._idle.items()):
+            keep = []
+            for assoc, returned_at in entries:
+                if now - returned_at > idle_timeout:
+                    expired.append(assoc)
+                else:
+                    keep.append((assoc, returned_at))
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        return expired
+
+    def _release_all(self, associations: list[Association]) -> None:
+        for assoc in associations:
+            if not _is_usable(assoc):
+                continue
+            try:
+                assoc.release()
+            except Exception:
+                logger.exception("Failed to release idle association.")
+
+
+def _is_usable(assoc: Association) -> bool:
+    return bool(assoc.is_established and assoc.is_alive())
+
+
+association_pool = AssociationPool()
+
+# A forked process (e.g. the one a DICOM task is processed in) must not use the
+# associations of its parent, as they share the same sockets.
+os.register_at_fork(after_in_child=association_pool._reset)
+
+atexit.register(association_pool.clear)
@@ -0,0 +1,341 @@
+"""The asyncio variant of the DicomWebConnector (used by the async API views).
+
+The requests are sent with a non-blocking HTTP client and multipart responses are
+parsed while they are streamed, so a running request does not occupy a thread (and
+a retrieved image is handed over as soon as it arrived).
+"""
+
+import asyncio
+import logging
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+from io import BytesIO
+from typing import AsyncIterator, Hashable, Iterable, NoReturn
+
+import httpx
+from channels.db import database_sync_to_async
+from dicomweb_client.uri import parse_query_parameters
+from django.conf import settings
+from pydicom import Dataset
+
+from ..errors import DicomConnectionError, DicomError, RetriableDicomError
+from ..models import DicomServer
+from ..types import DicomLogEntry
+from .concurrency_limits import async_server_lease
+from .dicom_dataset import QueryDataset, ResultDataset
+from .dicom_utils import get_encoded_bytes, read_encoded_dataset, write_dataset
+from .dicom_web_connector import QidoPager, get_qido_page_size
+from .http_pool import CONNECTION_ERROR_STATUS_CODES, RETRIABLE_STATUS_CODES
+from .multipart import (
+    DICOM_MEDIA_TYPE,
+    encode_multipart_related,
+    get_boundary,
+    iter_multipart_parts,
+)
+from .server_health import ensure_server_available, record_failure, record_success
+
+logger = logging.getLogger(__name__)
+
+
+# The HTTP clients (with their pools of kept-alive connections) per event loop and server
+_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[Hashable, httpx.AsyncClient]
+] = weakref.WeakKeyDictionary()
+
+
+def _get_client(server: DicomServer) -> httpx.AsyncClient:
+    # A client (and its connections) can only be used by the event loop it was created in.
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    key = (server.pk, server.dicomweb_root_url, server.dicomweb_authorization_header)
+    client = clients.get(key)
+    if client is None or client.is_closed:
+        headers = {}
+        if server.dicomweb_authorization_header:
+            headers["Authorization"] = server.dicomweb_authorization_header
+
+        client = httpx.AsyncClient(
+            headers=headers,
+            # The number of concurrent connections is only limited by the limits of the server
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=settings.DICOMWEB_CONNECTION_POOL_SIZE,
+            ),
+            # Like the (sync) DICOMweb client we wait as long as the server needs
+            timeout=None,
+            transport=httpx.AsyncHTTPTransport(retries=settings.DICOMWEB_RETRIES),
+        )
+        clients[key] = client
+    return client
+
+
+class AsyncDicomWebConnector:
+    def __init__(self, server: DicomServer) -> None:
+        self.server = server
+
+        # TODO: log warnings
+        self.logs: list[DicomLogEntry] = []
+
+    @asynccontextmanager
+    async def _connect(self, retrieval: bool = False) -> AsyncIterator[httpx.AsyncClient]:
+        """Provides the HTTP client for the server (after waiting for a free slot if the
+        server limits its concurrent connections) and tracks the health of the server."""
+        if not self.server.dicomweb_root_url:
+            raise DicomError("Missing DICOMweb root url.")
+
+        await database_sync_to_async(ensure_server_available)(self.server)
+
+        try:
+            async with async_server_lease(self.server, retrieval):
+                yield _get_client(self.server)
+        except DicomConnectionError:
+            await database_sync_to_async(record_failure)(self.server)
+            raise
+        await database_sync_to_async(record_success)(self.server)
+
+    def _get_url(self, prefix: str, path: str) -> str:
+        url = self.server.dicomweb_root_url.rstrip("/")
+        if prefix:
+            url += f"/{prefix}"
+        return url + path
+
+    async def _send(
+        self,
+        client: httpx.AsyncClient,
+        op: str,
+        request: httpx.Request,
+        stream: bool = False,
+    ) -> httpx.Response:
+        retries = settings.DICOMWEB_RETRIES if request.method == "GET" else 0
+        attempt = 0
+        while True:
+            try:
+                response = await client.send(request, stream=stream)
+            except httpx.TransportError as err:
+                raise DicomConnectionError(f"DICOMweb {op} request failed: {err}") from err
+
+            if not response.is_error:
+                return response
+
+            await response.aclose()
+
+            # Only idempotent requests are retried (like the pooled sync connections do)
+            if response.status_code in RETRIABLE_STATUS_CODES and attempt < retries:
+                await asyncio.sleep(settings.DICOMWEB_RETRY_BACKOFF_FACTOR * 2**attempt)
+                attempt += 1
+                continue
+
+            _handle_dicomweb_error(response, op)
+
+    async def send_qido_rs(
+        self, query: QueryDataset, limit_results: int | None = None
+    ) -> AsyncIterator[ResultDataset]:
+        """Yields the results of the query page by page (see QidoPager)."""
+        logger.debug("Sending QIDO-RS with query: %s", query)
+
+        search_filters, fields = query.get_search_filters_and_fields()
+
+        level = search_filters.pop("QueryRetrieveLevel", "")
+        if not level:
+            raise DicomError("Missing QueryRetrieveLevel.")
+
+        if not self.server.dicomweb_qido_support:
+            raise DicomError("DICOMweb QIDO-RS is not supported by the server.")
+
+        study_uid = search_filters.pop("StudyInstanceUID", None) if level != "STUDY" else None
+        if level == "STUDY":
+            path = "/studies"
+        elif level == "SERIES":
+            path = f"/studies/{study_uid}/series" if study_uid else "/series"
+        elif level == "IMAGE":
+            series_uid = search_filters.pop("SeriesInstanceUID", None)
+            if study_uid and series_uid:
+                path = f"/studies/{study_uid}/series/{series_uid}/instances"
+            elif study_uid:
+                path = f"/studies/{study_uid}/instances"
+            else:
+                path = "/instances"
+        else:
+            raise ValueError(f"Invalid QueryRetrieveLevel: {level}")
+
+        url = self._get_url(self.server.dicomweb_qido_prefix, path)
+        pager = QidoPager(get_qido_page_size(self.server), limit_results)
+
+        async with self._connect() as client:
+            while (page := pager.next_page()) is not None:
+                limit, offset = page
+                request = client.build_request(
+                    "GET",
+                    url,
+                    params=parse_query_parameters(
+                        limit=limit, offset=offset, fields=fields, search_filters=search_filters
+                    ),
+                    headers={"Accept": "application/dicom+json, application/json"},
+                )
+                response = await self._send(client, "QIDO-RS", request)
+
+                results = response.json() if response.content else []
+                # Some servers send a single dataset instead of an array of datasets
+                if isinstance(results, dict):
+                    results = [results]
+
+                for result in pager.add_results(results):
+                    yield ResultDataset(Dataset.from_json(result))
+
+    async def send_wado_rs(self, query: QueryDataset) -> AsyncIterator[Dataset]:
+        logger.debug("Sending WADO-RS with query: %s", query)
+
+        path = self._get_wado_path(query)
+
+        async with self._connect(retrieval=True) as client:
+            request = client.build_request(
+                "GET",
+                self._get_url(self.server.dicomweb_wado_prefix, path),
+                headers={"Accept": f'multipart/related; type="{DICOM_MEDIA_TYPE}"'},
+            )
+            response = await self._send(client, "WADO-RS", request, stream=True)
+            try:
+                async for ds in self._iter_datasets(response):
+                    yield ds
+            except httpx.TransportError as err:
+                raise DicomConnectionError(f"DICOMweb WADO-RS request failed: {err}") from err
+            finally:
+                await response.aclose()
+
+    async def send_wado_rs_metadata(self, query: QueryDataset) -> AsyncIterator[Dataset]:
+        """Yields the metadata of the images (without the bulk data the server only
+        references by URIs)."""
+        logger.debug("Sending WADO-RS metadata request with query: %s", query)
+
+        path = self._get_wado_path(query) + "/metadata"
+
+        # Metadata is small, so the request does not count as a retrieval
+        async with self._connect() as client:
+            request = client.build_request(
+                "GET",
+                self._get_url(self.server.dicomweb_wado_prefix, path),
+                headers={"Accept": "application/dicom+json, application/json"},
+            )
+            response = await self._send(client, "WADO-RS", request)
+
+            results = response.json() if response.content else []
+            # Some servers send the metadata of a single image not as an array
+            if isinstance(results, dict):
+                results = [results]
+
+        for result in results:
+            # The bulk data (only referenced by URIs of the server) is left out
+            yield Dataset.from_json(result, bulk_data_uri_handler=lambda uri: None)
+
+    def _get_wado_path(self, query: QueryDataset) -> str:
+        query_dict = query.dictify()
+
+        level = query_dict.pop("QueryRetrieveLevel", "")
+        if not level:
+            raise DicomError("Missing QueryRetrieveLevel.")
+
+        if level not in ("STUDY", "SERIES", "IMAGE"):
+            raise DicomError(f"Invalid QueryRetrieveLevel: {level}")
+
+        if not self.server.dicomweb_wado_support:
+            raise DicomError("DICOMweb WADO-RS is not supported by the server.")
+
+        study_uid = query_dict.pop("StudyInstanceUID", "")
+        if not study_uid:
+            raise DicomError(f"Missing StudyInstanceUID for WADO-RS on {level.lower()} level.")
+        path = f"/studies/{study_uid}"
+
+        if level in ("SERIES", "IMAGE"):
+            series_uid = query_dict.pop("SeriesInstanceUID", "")
+            if not series_uid:
+                raise DicomError(f"Missing SeriesInstanceUID for WADO-RS on {level.lower()} level.")
+            path += f"/series/{series_uid}"
+
+        if level == "IMAGE":
+            sop_instance_uid = query_dict.pop("SOPInstanceUID", "")
+            if not sop_instance_uid:
+                raise DicomError("Missing SOPInstanceUID for WADO-RS on image level.")
+            path += f"/instances/{sop_instance_uid}"
+
+        return path
+
+    async def _iter_datasets(self, response: httpx.Response) -> AsyncIterator[Dataset]:
+        content_type = response.headers.get("Content-Type", "")
+        boundary = get_boundary(content_type)
+
+        if boundary is None:
+            # Some servers send a single image without encapsulating it in a multipart message
+            if not content_type.lower().startswith((DICOM_MEDIA_TYPE, "multipart/related")):
+                raise DicomError(f"Unexpected WADO-RS response of type: {content_type}")
+            yield read_encoded_dataset(await response.aread())
+            return
+
+        try:
+            async for part in iter_multipart_parts(response.aiter_bytes(), boundary):
+                yield read_encoded_dataset(part)
+        except ValueError as err:
+            raise DicomError(f"Invalid WADO-RS response: {err}") from err
+
+    async def send_stow_rs(self, datasets: Iterable[Dataset]) -> None:
+        if not self.server.dicomweb_stow_support:
+            raise DicomError("DICOMweb STOW-RS is not supported by the server.")
+
+        logger.debug("Sending STOW of datasets.")
+
+        retriable_failures: list[str] = []
+
+        async with self._connect() as client:
+            url = self._get_url(self.server.dicomweb_stow_prefix, "/studies")
+
+            for ds in datasets:
+                logger.debug("Sending STOW of SOP instance %s.", str(ds.SOPInstanceUID))
+
+                boundary = uuid.uuid4().hex
+                request = client.build_request(
+                    "POST",
+                    url,
+                    content=encode_multipart_related([_encode(ds)], boundary, DICOM_MEDIA_TYPE),
+                    headers={
+                        "Content-Type": (
+                            f'multipart/related; type="{DICOM_MEDIA_TYPE}"; boundary={boundary}'
+                        ),
+                        "Accept": "application/dicom+json, application/json",
+                    },
+                )
+
+                try:
+                    await self._send(client, "STOW-RS", request)
+                except RetriableDicomError:
+                    retriable_failures.append(ds.SOPInstanceUID)
+
+            if retriable_failures:
+                plural = len(retriable_failures) > 1
+                raise RetriableDicomError(
+                    f"{len(retriable_failures)} STOW-RS operation{'s' if plural else ''} failed."
+                )
+
+
+def _encode(ds: Dataset) -> bytes:
+    # Send the unmodified dataset as it was received without encoding it again
+    encoded = get_encoded_bytes(ds)
+    if encoded is not None:
+        return encoded
+
+    with BytesIO() as buffer:
+        write_dataset(ds, buffer)
+        return buffer.getvalue()
+
+
+def _handle_dicomweb_error(response: httpx.Response, op: str) -> NoReturn:
+    status_code = response.status_code
+    status_phrase = HTTPStatus(status_code).phrase
+    if status_code in CONNECTION_ERROR_STATUS_CODES:
+        raise DicomConnectionError(
+            f"DICOMweb {op} request failed: {status_phrase} [{status_code}]."
+        )
+    elif status_code in RETRIABLE_STATUS_CODES:
+        raise RetriableDicomError(f"DICOMweb {op} request failed: {status_phrase} [{status_code}].")
+    else:
+        logger.error(f"DICOMweb {op} request failed critically: {status_phrase} [{status_code}].")
+        raise DicomError(f"DICOMweb {op} request failed: {status_phrase} [{status_code}].")
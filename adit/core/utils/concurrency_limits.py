@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Literal
+
+from django.db import connection
+
+from ..models import DicomServer
+
+logger = logging.getLogger(__name__)
+
+LimitKind = Literal["associations", "retrievals"]
+
+# The (second) advisory lock key of the lock that lets the waiting callers queue up
+QUEUE_SLOT = -1
+
+# The slots currently held by the database session (connection) of a thread
+_local = threading.local()
+
+
+def _get_held_keys() -> set[tuple[int, int]]:
+    if not hasattr(_local, "held_keys"):
+        _local.held_keys = set()
+    return _local.held_keys
+
+
+def _get_namespace(server: DicomServer, kind: LimitKind) -> int:
+    # Advisory lock keys are signed 32 bit integers (when using the two keys variant)
+    checksum = zlib.crc32(f"adit_dicom_server_{server.pk}_{kind}".encode())
+    return checksum - 2**32 if checksum >= 2**31 else checksum
+
+
+class ServerLease:
+    """Slots (of the concurrency limits of a server) held by the current thread.
+
+    The slots are Postgres advisory locks of the database session of the thread that
+    acquired them, so they can only be released by that thread (or get released when
+    its database connection is closed).
+    """
+
+    def __init__(self, keys: list[tuple[int, int]]) -> None:
+        self._keys = keys
+        self._thread_id = threading.get_ident()
+
+    def release(self) -> bool:
+        """Releases the slots. Returns False if called by another thread than the one
+        that acquired them (then nothing is released)."""
+        if threading.get_ident() != self._thread_id:
+            return False
+
+        held_keys = _get_held_keys()
+        with connection.cursor() as cursor:
+            while self._keys:
+                key = self._keys.pop()
+                cursor.execute("SELECT pg_advisory_unlock(%s, %s)", key)
+                held_keys.discard(key)
+        return True
+
+
+def acquire_server_lease(server: DicomServer, retrieval: bool = False) -> ServerLease | None:
+    """Waits for a free slot of each concurrency limit of the server that applies.
+
+    Every connection counts against the `max_concurrent_associations` of the server,
+    retrievals (C-GET, C-MOVE, WADO-RS) also against `max_concurrent_retrievals`. The
+    limits apply cluster wide (for all workers and web replicas using the same database).
+    Returns None if the server has no limits.
+    """
+    limits = _get_limits(server, retrieval)
+    if not limits:
+        return None
+
+    lease = ServerLease([])
+    try:
+        for kind, limit in limits:
+            key = _acquire_slot(_get_namespace(server, kind), limit, server, kind)
+            if key:
+                lease._keys.append(key)
+    except BaseException:
+        lease.release()
+        raise
+
+    return lease
+
+
+@contextmanager
+def server_lease(server: DicomServer, retrieval: bool = False) -> Iterator[None]:
+    lease = acquire_server_lease(server, retrieval)
+    try:
+        yield
+    finally:
+        if lease and not lease.release():
+            logger.warning("Slots of %s were not released by the acquiring thread.", server)
+
+
+@asynccontextmanager
+async def async_server_lease(server: DicomServer, retrieval: bool = False) -> AsyncIterator[None]:
+    """The asyncio variant of server_lease.
+
+    As the slots belong to the database session of the acquiring thread, they are
+    acquired and released in a dedicated thread (only if the server has limits at all).
+    """
+    if not _get_limits(server, retrieval):
+        yield
+        return
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="server_lease")
+    acquiring = executor.submit(acquire_server_lease, server, retrieval)
+    try:
+        await asyncio.wrap_future(acquiring)
+        yield
+    finally:
+        # The executor has only one thread, so the release always runs after the
+        # acquisition finished (even if waiting for it was cancelled).
+        releasing = executor.submit(_release_acquired_lease, acquiring, server)
+        executor.shutdown(wait=False)
+        await asyncio.wrap_future(releasing)
+
+
+def _release_acquired_lease(acquiring: Future[ServerLease | None], server: DicomServer) -> None:
+    try:
+        lease = None if acquiring.cancelled() or acquiring.exception() else acquiring.result()
+        if lease and not lease.release():
+            logger.warning("Slots of %s were not released by the acquiring thread.", server)
+    finally:
+        connection.close()
+
+
+def _get_limits(server: DicomServer, retrieval: bool) -> list[tuple[LimitKind, int]]:
+    limits: list[tuple[LimitKind, int]] = []
+    # Retrieval slots are always acquired first (and so in the same order by every caller)
+    if retrieval and server.max_concurrent_retrievals:
+        limits.append(("retrievals", server.max_concurrent_retrievals))
+    if server.max_concurrent_associations:
+        limits.append(("associations", server.max_concurrent_associations))
+    return limits
+
+
+def _acquire_slot(
+    namespace: int, limit: int, server: DicomServer, kind: LimitKind
+) -> tuple[int, int] | None:
+    held_keys = _get_held_keys()
+
+    # A thread that already holds a slot (e.g. when it runs a query while iterating the
+    # results of another one) does not need another one. Otherwise it would wait for
+    # itself if the limit is reached.
+    if any(held_namespace == namespace for held_namespace, _ in held_keys):
+        return None
+
+    with connection.cursor() as cursor:
+        # Only one caller at a time looks for a free slot, the others wait in line for
+        # this lock (Postgres grants the lock in the order it was requested).
+        cursor.execute("SELECT pg_advisory_lock(%s, %s)", [namespace, QUEUE_SLOT])
+        try:
+            delay = 0.05
+            waiting_logged = False
+            while True:
+                for slot in range(limit):
+                    key = (namespace, slot)
+                    cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", key)
+                    if cursor.fetchone()[0]:
+                        held_keys.add(key)
+                        return key
+
+                if not waiting_logged:
+                    logger.info("Waiting for free %s slot of %s.", kind, server)
+                    waiting_logged = True
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s, %s)", [namespace, QUEUE_SLOT])
@@ -12,13 +12,17 @@ in the Patient Root Query/Retrieve Information Model
 import asyncio
 import errno
 import logging
+import queue
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from functools import partial
 from os import PathLike
-from typing import Callable, Iterable, Iterator
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
 
 from aiofiles import os as async_os
+from asgiref.sync import sync_to_async
+from django import db
 from django.conf import settings
 from pydicom import Dataset
 from pynetdicom.events import Event
@@ -26,48 +30,123 @@ from pynetdicom.events import Event
 from ..errors import DicomError, RetriableDicomError
 from ..models import DicomServer
 from ..types import DicomLogEntry
+from .async_dicom_web_connector import AsyncDicomWebConnector
 from .dicom_dataset import QueryDataset, ResultDataset
 from .dicom_utils import (
-    convert_to_python_regex,
+    get_metadata,
     has_wildcards,
-    read_dataset,
+    read_encoded_dataset,
 )
 from .dicom_web_connector import DicomWebConnector
 from .dimse_connector import DimseConnector
 from .file_transmit import FileTransmitClient, Metadata
+from .query_filter import SERVER_FILTERED, FilterLevel, QueryFilter, QueryProtocol
 
 logger = logging.getLogger(__name__)
 
+# The additional attributes that are requested by an image level query when the metadata
+# of images can't be retrieved by WADO-RS (which attributes are returned depends on the
+# server, most servers only return some of them).
+METADATA_RETURN_KEYS = (
+    "PatientName",
+    "PatientBirthDate",
+    "PatientSex",
+    "StudyDate",
+    "StudyTime",
+    "StudyDescription",
+    "AccessionNumber",
+    "SeriesNumber",
+    "SeriesDescription",
+    "Modality",
+    "SOPClassUID",
+    "InstanceNumber",
+    "ImageType",
+    "Rows",
+    "Columns",
+    "NumberOfFrames",
+    "SamplesPerPixel",
+    "PhotometricInterpretation",
+    "BitsAllocated",
+    "BitsStored",
+    "HighBit",
+    "PixelRepresentation",
+    "PixelSpacing",
+    "SliceThickness",
+    "SliceLocation",
+    "ImagePositionPatient",
+    "ImageOrientationPatient",
+    "FrameOfReferenceUID",
+    "WindowCenter",
+    "WindowWidth",
+    "RescaleIntercept",
+    "RescaleSlope",
+)
+
 
 class DicomOperator:
     def __init__(
         self,
         server: DicomServer,
         connection_retries: int = 2,
-        dimse_timeout: int | None = 60,
+        dimse_timeout: int | None = None,
     ):
+        """
+        Args:
+            server: The server to communicate with.
+            connection_retries: How often to retry to connect to the server.
+            dimse_timeout: The DIMSE timeout in seconds. If not set it is derived from
+                the observed response latencies of the server.
+        """
         self.server = server
         self.dimse_connector = DimseConnector(
             server,
             connection_retries=connection_retries,
             dimse_timeout=dimse_timeout,
+            adaptive_timeouts=dimse_timeout is None,
         )
         # TODO: also make retries and timeouts possible in DicomWebConnector
         self.dicom_web_connector = DicomWebConnector(server)
+        self.async_dicom_web_connector = AsyncDicomWebConnector(server)
+
+        # The connectors of the running concurrent WADO-RS requests (so they can be aborted)
+        self._wado_connectors: list[DicomWebConnector] = []
+        self._wado_connectors_lock = threading.Lock()
 
         self.logs: list[DicomLogEntry] = []
 
     def get_logs(self) -> list[DicomLogEntry]:
-        return self.dimse_connector.logs + self.dicom_web_connector.logs + self.logs
+        return (
+            self.dimse_connector.logs
+            + self.dicom_web_connector.logs
+            + self.async_dicom_web_connector.logs
+            + self.logs
+        )
 
     def abort(self) -> None:
         self.dimse_connector.abort_connection()
         self.dicom_web_connector.abort()
+        with self._wado_connectors_lock:
+            for connector in self._wado_connectors:
+                connector.abort()
+
+    def create_query_filter(self, query: QueryDataset, level: FilterLevel) -> QueryFilter:
+        """Compiles the filter of the query for the results of this server.
+
+        Leaves out the attributes the server already matches itself (depending on whether it
+        is queried by C-FIND or QIDO-RS).
+        """
+        protocol: QueryProtocol
+        if self.server.patient_root_find_support or self.server.study_root_find_support:
+            protocol = "C-FIND"
+        else:
+            protocol = "QIDO-RS"
+        return QueryFilter(query, level, server_filtered=SERVER_FILTERED[protocol][level])
 
     def find_patients(
         self,
         query: QueryDataset,
         limit_results: int | None = None,
+        query_filter: QueryFilter | None = None,
     ) -> Iterator[ResultDataset]:
         """Find patients for given query and return a list of patient datasets.
 
@@ -88,6 +167,7 @@ class DicomOperator:
         Args:
             query: The query dataset.
             limit_results: The maximum number of results to return.
+            query_filter: The (already compiled) filter of the query to reuse.
         """
         query.ensure_elements(
             "PatientID",
@@ -97,6 +177,9 @@ class DicomOperator:
             "NumberOfPatientRelatedStudies",
         )
 
+        if query_filter is None:
+            query_filter = self.create_query_filter(query, "PATIENT")
+
         if self.server.patient_root_find_support or self.server.study_root_find_support:
             if self.server.patient_root_find_support:
                 query.QueryRetrieveLevel = "PATIENT"
@@ -105,49 +188,36 @@ class DicomOperator:
                 query.QueryRetrieveLevel = "STUDY"
 
             results = self.dimse_connector.send_c_find(query, limit_results=limit_results)
-            yield from self._handle_found_patients(query, results)
+            yield from self._handle_found_patients(query_filter, results)
 
         elif self.server.dicomweb_qido_support:
             query.QueryRetrieveLevel = "STUDY"
 
             results = self.dicom_web_connector.send_qido_rs(query, limit_results=limit_results)
-            yield from self._handle_found_patients(query, results)
+            yield from self._handle_found_patients(query_filter, results)
 
         else:
             raise DicomError("No supported method to find patients available.")
 
     def _handle_found_patients(
-        self, query: QueryDataset, results: Iterable[ResultDataset]
+        self, query_filter: QueryFilter, results: Iterable[ResultDataset]
     ) -> Iterator[ResultDataset]:
         # When querying on study level we have to make patients unique since it then
         # returns all studies for one patient, resulting in duplicate patients
         seen: set[str] = set()
 
-        for result in results:
+        for result in query_filter.filter(results):
             if result.PatientID in seen:
                 continue
             seen.add(result.PatientID)
 
-            # Currently we don't allow a range filter for PatientBirthDate
-            if query.has("PatientBirthDate"):
-                if query.PatientBirthDate != result.PatientBirthDate:
-                    continue
-
-            if query.has("PatientName"):
-                patient_name_pattern = convert_to_python_regex(query.PatientName)
-                if not patient_name_pattern.search(result.PatientName):
-                    continue
-
-            if query.has("PatientSex"):
-                if query.PatientSex != result.PatientSex:
-                    continue
-
             yield result
 
     def find_studies(
         self,
         query: QueryDataset,
         limit_results: int | None = None,
+        query_filter: QueryFilter | None = None,
     ) -> Iterator[ResultDataset]:
         """Find studies for given query and return a list of study datasets.
 
@@ -164,60 +234,26 @@ class DicomOperator:
         Args:
             query: The query dataset.
             limit_results: The maximum number of results to return.
+            query_filter: The (already compiled) filter of the query to reuse.
         """
-        query.ensure_elements(
-            "PatientID",
-            "PatientName",
-            "PatientBirthDate",
-            "StudyInstanceUID",
-            "AccessionNumber",
-            "StudyDate",
-            "StudyTime",
-            "StudyDescription",
-            "ModalitiesInStudy",
-            "NumberOfStudyRelatedSeries",
-            "NumberOfStudyRelatedInstances",
-        )
+        self._prepare_studies_query(query)
 
-        query.QueryRetrieveLevel = "STUDY"
+        if query_filter is None:
+            query_filter = self.create_query_filter(query, "STUDY")
 
         if self.server.patient_root_find_support or self.server.study_root_find_support:
             results = self.dimse_connector.send_c_find(query, limit_results=limit_results)
-            yield from self._handle_found_studies(query, results)
+            yield from query_filter.filter(results)
         elif self.server.dicomweb_qido_support:
             results = self.dicom_web_connector.send_qido_rs(query, limit_results=limit_results)
-            yield from self._handle_found_studies(query, results)
+            yield from query_filter.filter(results)
         else:
             raise DicomError("No supported method to find studies available.")
 
-    def _handle_found_studies(
-        self,
-        query: QueryDataset,
-        results: Iterable[ResultDataset],
-    ) -> Iterator[ResultDataset]:
-        for result in results:
-            # Optionally filter by its study description, if the server doesn't support it
-            if query.has("StudyDescription"):
-                study_description_pattern = convert_to_python_regex(query.StudyDescription)
-                if not study_description_pattern.search(result.StudyDescription):
-                    continue
-
-            # TODO: I guess this won't work as we are in the middle of a C-FIND request (we
-            # are using generators now) and we can't do another C-FIND request here.
-            # But we could use a new Connector instance for this. Fix this later.
-            # if "ModalitiesInStudy" not in result:
-            #     result.ModalitiesInStudy = self._fetch_study_modalities(
-            #         result.PatientID, result.StudyInstanceUID
-            #     )
-
-            if query.has("ModalitiesInStudy"):
-                modalities = result.ModalitiesInStudy
-                # It's ok if any of the searched modalities is in this study
-                if not any(modality in modalities for modality in query.ModalitiesInStudy):
-                    continue
-
-            yield result
-
+    # TODO: When ModalitiesInStudy is missing in a found study we could fetch the modalities
+    # of its series. But this won't work as we are in the middle of a C-FIND request (we are
+    # using generators now) and we can't do another C-FIND request there. But we could use a
+    # new Connector instance for this. Fix this later.
     def _fetch_study_modalities(self, patient_id: str, study_uid: str) -> list[str]:
         series_list = list(
             self.find_series(
@@ -236,6 +272,7 @@ class DicomOperator:
         self,
         query: QueryDataset,
         limit_results=None,
+        query_filter: QueryFilter | None = None,
     ) -> Iterator[ResultDataset]:
         """Find series for given query and return a list of series datasets.
 
@@ -249,22 +286,12 @@ class DicomOperator:
         Args:
             query: The query dataset.
             limit_results: The maximum number of results to return.
+            query_filter: The (already compiled) filter of the query to reuse.
         """
-        query.ensure_elements(
-            "PatientID",
-            "StudyInstanceUID",
-            "SeriesInstanceUID",
-            "SeriesDescription",
-            "SeriesNumber",
-            "Modality",
-            "NumberOfSeriesRelatedInstances",
-        )
-
-        study_uid = query.get("StudyInstanceUID")
-        if not study_uid or has_wildcards(study_uid):
-            raise DicomError("A valid StudyInstanceUID is required for querying series.")
+        self._prepare_series_query(query)
 
-        query.QueryRetrieveLevel = "SERIES"
+        if query_filter is None:
+            query_filter = self.create_query_filter(query, "SERIES")
 
         if self.server.patient_root_find_support or self.server.study_root_find_support:
             if not self.server.study_root_find_support:
@@ -276,38 +303,10 @@ class DicomOperator:
                     )
 
             results = self.dimse_connector.send_c_find(query, limit_results=limit_results)
-            yield from self._handle_found_series(query, results)
+            yield from query_filter.filter(results)
         else:
             results = self.dicom_web_connector.send_qido_rs(query, limit_results=limit_results)
-            yield from self._handle_found_series(query, results)
-
-    def _handle_found_series(
-        self,
-        query: QueryDataset,
-        results: Iterable[ResultDataset],
-    ) -> Iterator[ResultDataset]:
-        for result in results:
-            # It's also better to filter Series Number programmatically, because it's of
-            # VR Integer String and with just a C-Find it's not guaranteed that e.g.
-            # "4" is the same as "+4"
-            # https://groups.google.com/g/comp.protocols.dicom/c/JNsg7upVJ08
-            if query.has("SeriesNumber"):
-                series_number_query = query.SeriesNumber
-                if series_number_query != result.SeriesNumber:
-                    continue
-
-            # Optionally filter by modality, if the server doesn't support it
-            if query.has("Modality"):
-                if query.Modality != result.Modality:
-                    continue
-
-            # Optionally filter by series description, if the server doesn't support it
-            if query.has("SeriesDescription"):
-                series_description_pattern = convert_to_python_regex(query.SeriesDescription)
-                if not series_description_pattern.search(result.SeriesDescription):
-                    continue
-
-            yield result
+            yield from query_filter.filter(results)
 
     def find_images(
         self, query: QueryDataset, limit_results: int | None = None
@@ -325,6 +324,58 @@ class DicomOperator:
             query: The query dataset.
             limit_results: The maximum number of results to return.
         """
+        self._prepare_images_query(query)
+
+        if self.server.patient_root_find_support or self.server.study_root_find_support:
+            if not self.server.study_root_find_support:
+                patient_id = query.get("PatientID")
+                if not patient_id or has_wildcards(patient_id):
+                    raise DicomError(
+                        "PatientID is required for querying images with "
+                        "Patient Root Query/Retrieve Information Model."
+                    )
+
+            yield from self.dimse_connector.send_c_find(query, limit_results=limit_results)
+        elif self.server.dicomweb_qido_support:
+            yield from self.dicom_web_connector.send_qido_rs(query, limit_results=limit_results)
+        else:
+            raise DicomError("No supported method to find images available.")
+
+    def _prepare_studies_query(self, query: QueryDataset) -> None:
+        query.ensure_elements(
+            "PatientID",
+            "PatientName",
+            "PatientBirthDate",
+            "StudyInstanceUID",
+            "AccessionNumber",
+            "StudyDate",
+            "StudyTime",
+            "StudyDescription",
+            "ModalitiesInStudy",
+            "NumberOfStudyRelatedSeries",
+            "NumberOfStudyRelatedInstances",
+        )
+
+        query.QueryRetrieveLevel = "STUDY"
+
+    def _prepare_series_query(self, query: QueryDataset) -> None:
+        query.ensure_elements(
+            "PatientID",
+            "StudyInstanceUID",
+            "SeriesInstanceUID",
+            "SeriesDescription",
+            "SeriesNumber",
+            "Modality",
+            "NumberOfSeriesRelatedInstances",
+        )
+
+        study_uid = query.get("StudyInstanceUID")
+        if not study_uid or has_wildcards(study_uid):
+            raise DicomError("A valid StudyInstanceUID is required for querying series.")
+
+        query.QueryRetrieveLevel = "SERIES"
+
+    def _prepare_images_query(self, query: QueryDataset) -> None:
         query.ensure_elements(
             "PatientID",
             "StudyInstanceUID",
@@ -343,21 +394,6 @@ class DicomOperator:
 
         query.QueryRetrieveLevel = "IMAGE"
 
-        if self.server.patient_root_find_support or self.server.study_root_find_support:
-            if not self.server.study_root_find_support:
-                patient_id = query.get("PatientID")
-                if not patient_id or has_wildcards(patient_id):
-                    raise DicomError(
-                        "PatientID is required for querying images with "
-                        "Patient Root Query/Retrieve Information Model."
-                    )
-
-            yield from self.dimse_connector.send_c_find(query, limit_results=limit_results)
-        elif self.server.dicomweb_qido_support:
-            yield from self.dicom_web_connector.send_qido_rs(query, limit_results=limit_results)
-        else:
-            raise DicomError("No supported method to find images available.")
-
     def fetch_study(
         self,
         patient_id: str,
@@ -378,7 +414,10 @@ class DicomOperator:
         )
 
         if self.server.dicomweb_wado_support:
-            self._fetch_images_with_wado_rs(query, callback)
+            if settings.DICOMWEB_PARALLEL_WADO_FETCHES > 1 and self.server.dicomweb_qido_support:
+                self._fetch_study_with_parallel_wado_rs(query, callback)
+            else:
+                self._fetch_images_with_wado_rs(query, callback)
         elif self.server.patient_root_get_support or self.server.study_root_get_support:
             self._fetch_images_with_c_get(query, callback)
         elif self.server.patient_root_move_support or self.server.study_root_move_support:
@@ -457,13 +496,237 @@ class DicomOperator:
         else:
             raise DicomError("No supported method to fetch an image available.")
 
-    def upload_images(self, resource: PathLike | list[Dataset]) -> None:
-        """Upload images from a specified folder or list of images in memory"""
+    def upload_images(
+        self,
+        resource: PathLike | Iterable[Dataset],
+        stored_callback: Callable[[Dataset], None] | None = None,
+    ) -> None:
+        """Upload images from a specified folder or an iterable of images in memory.
+
+        The iterable may also be a stream of images (e.g. a generator) that are
+        uploaded as soon as they arrive. The optional stored callback is called with
+        every image that was successfully stored by the server.
+        """
+
+        if self.server.store_scp_support:
+            self.dimse_connector.send_c_store(
+                resource,
+                stored_callback=stored_callback,
+                associations=settings.DIMSE_STORE_ASSOCIATIONS,
+            )
+        elif self.server.dicomweb_stow_support:
+            self.dicom_web_connector.send_stow_rs(resource, stored_callback=stored_callback)
+        else:
+            raise DicomError("No supported method to upload images available.")
+
+    # The async variants of the above methods (used by the async API views). Servers that
+    # are accessed by DICOMweb are accessed without blocking a thread, the DIMSE operations
+    # are run in a worker thread.
+
+    async def afind_studies(
+        self, query: QueryDataset, limit_results: int | None = None
+    ) -> AsyncIterator[ResultDataset]:
+        """The async variant of find_studies."""
+        if not self._uses_qido_rs():
+            async for result in _aiterate_in_thread(
+                partial(_pass_results, self.find_studies, query, limit_results)
+            ):
+                yield result
+            return
+
+        self._prepare_studies_query(query)
+        query_filter = self.create_query_filter(query, "STUDY")
+        async for result in self.async_dicom_web_connector.send_qido_rs(query, limit_results):
+            if query_filter.matches(result):
+                yield result
+
+    async def afind_series(
+        self, query: QueryDataset, limit_results: int | None = None
+    ) -> AsyncIterator[ResultDataset]:
+        """The async variant of find_series."""
+        if not self._uses_qido_rs():
+            async for result in _aiterate_in_thread(
+                partial(_pass_results, self.find_series, query, limit_results)
+            ):
+                yield result
+            return
+
+        self._prepare_series_query(query)
+        query_filter = self.create_query_filter(query, "SERIES")
+        async for result in self.async_dicom_web_connector.send_qido_rs(query, limit_results):
+            if query_filter.matches(result):
+                yield result
+
+    async def afind_images(
+        self, query: QueryDataset, limit_results: int | None = None
+    ) -> AsyncIterator[ResultDataset]:
+        """The async variant of find_images."""
+        if not self._uses_qido_rs():
+            async for result in _aiterate_in_thread(
+                partial(_pass_results, self.find_images, query, limit_results)
+            ):
+                yield result
+            return
+
+        self._prepare_images_query(query)
+        async for result in self.async_dicom_web_connector.send_qido_rs(query, limit_results):
+            yield result
+
+    def _uses_qido_rs(self) -> bool:
+        # We prefer C-FIND over QIDO-RS (like the sync variants do)
+        return self.server.dicomweb_qido_support and not (
+            self.server.patient_root_find_support or self.server.study_root_find_support
+        )
+
+    def afetch_study(self, patient_id: str, study_uid: str) -> AsyncIterator[Dataset]:
+        """The async variant of fetch_study (the images are yielded instead of passed
+        to a callback)."""
+        query = QueryDataset.create(
+            QueryRetrieveLevel="STUDY",
+            PatientID=patient_id,
+            StudyInstanceUID=study_uid,
+        )
+        return self._afetch_images(query, self.fetch_study, patient_id, study_uid)
+
+    def afetch_series(
+        self, patient_id: str, study_uid: str, series_uid: str
+    ) -> AsyncIterator[Dataset]:
+        """The async variant of fetch_series (the images are yielded instead of passed
+        to a callback)."""
+        query = QueryDataset.create(
+            QueryRetrieveLevel="SERIES",
+            PatientID=patient_id,
+            StudyInstanceUID=study_uid,
+            SeriesInstanceUID=series_uid,
+        )
+        return self._afetch_images(query, self.fetch_series, patient_id, study_uid, series_uid)
+
+    def afetch_image(
+        self, patient_id: str, study_uid: str, series_uid: str, image_uid: str
+    ) -> AsyncIterator[Dataset]:
+        """The async variant of fetch_image (the image is yielded instead of passed
+        to a callback)."""
+        query = QueryDataset.create(
+            QueryRetrieveLevel="IMAGE",
+            PatientID=patient_id,
+            StudyInstanceUID=study_uid,
+            SeriesInstanceUID=series_uid,
+            SOPInstanceUID=image_uid,
+        )
+        return self._afetch_images(
+            query, self.fetch_image, patient_id, study_uid, series_uid, image_uid
+        )
+
+    async def _afetch_images(
+        self, query: QueryDataset, fetch: Callable[..., None], *args: str
+    ) -> AsyncIterator[Dataset]:
+        # We prefer WADO-RS (like the sync variants do)
+        if self.server.dicomweb_wado_support:
+            async for ds in self.async_dicom_web_connector.send_wado_rs(query):
+                yield ds
+            return
+
+        async for ds in _aiterate_in_thread(partial(fetch, *args)):
+            yield ds
+
+    def afetch_study_metadata(self, patient_id: str, study_uid: str) -> AsyncIterator[Dataset]:
+        """Yields the metadata of the images of a study (see _afetch_metadata)."""
+        query = QueryDataset.create(
+            QueryRetrieveLevel="STUDY",
+            PatientID=patient_id,
+            StudyInstanceUID=study_uid,
+        )
+        return self._afetch_metadata(query, partial(self.afetch_study, patient_id, study_uid))
+
+    def afetch_series_metadata(
+        self, patient_id: str, study_uid: str, series_uid: str
+    ) -> AsyncIterator[Dataset]:
+        """Yields the metadata of the images of a series (see _afetch_metadata)."""
+        query = QueryDataset.create(
+            QueryRetrieveLevel="SERIES",
+            PatientID=patient_id,
+            StudyInstanceUID=study_uid,
+            SeriesInstanceUID=series_uid,
+        )
+        return self._afetch_metadata(
+            query, partial(self.afetch_series, patient_id, study_uid, series_uid)
+        )
+
+    def afetch_image_metadata(
+        self, patient_id: str, study_uid: str, series_uid: str, image_uid: str
+    ) -> AsyncIterator[Dataset]:
+        """Yields the metadata of an image (see _afetch_metadata)."""
+        query = QueryDataset.create(
+            QueryRetrieveLevel="IMAGE",
+            PatientID=patient_id,
+            StudyInstanceUID=study_uid,
+            SeriesInstanceUID=series_uid,
+            SOPInstanceUID=image_uid,
+        )
+        return self._afetch_metadata(
+            query, partial(self.afetch_image, patient_id, study_uid, series_uid, image_uid)
+        )
+
+    async def _afetch_metadata(
+        self, query: QueryDataset, afetch: Callable[[], AsyncIterator[Dataset]]
+    ) -> AsyncIterator[Dataset]:
+        """Yields the metadata of images without fetching their pixel data if possible.
+
+        We prefer the WADO-RS metadata of the server over an image level query (with
+        additional return keys). Only if the server supports neither, the images are
+        fetched (and their pixel data and other bulk data left out).
+        """
+        if self.server.dicomweb_wado_support:
+            images = self.async_dicom_web_connector.send_wado_rs_metadata(query)
+        elif (
+            self.server.patient_root_find_support
+            or self.server.study_root_find_support
+            or self.server.dicomweb_qido_support
+        ):
+            images = self._afind_images_metadata(query)
+        else:
+            images = afetch()
+
+        async for ds in images:
+            yield get_metadata(ds)
 
+    async def _afind_images_metadata(self, query: QueryDataset) -> AsyncIterator[Dataset]:
+        if query.has("SeriesInstanceUID"):
+            series_uids = [query.SeriesInstanceUID]
+        else:
+            series_query = QueryDataset.create(
+                PatientID=query.PatientID,
+                StudyInstanceUID=query.StudyInstanceUID,
+            )
+            series_uids = [
+                series.SeriesInstanceUID async for series in self.afind_series(series_query)
+            ]
+
+        for series_uid in series_uids:
+            images_query = QueryDataset.create(
+                PatientID=query.PatientID,
+                StudyInstanceUID=query.StudyInstanceUID,
+                SeriesInstanceUID=series_uid,
+                SOPInstanceUID=query.get("SOPInstanceUID", ""),
+            )
+            # Set as empty values (with None instead of an empty string, which is not
+            # a valid value for the numeric VRs of some of those attributes)
+            for keyword in METADATA_RETURN_KEYS:
+                if keyword not in images_query.dataset:
+                    setattr(images_query.dataset, keyword, None)
+
+            async for image in self.afind_images(images_query):
+                ds = image.dataset
+                if "QueryRetrieveLevel" in ds:
+                    del ds.QueryRetrieveLevel
+                yield ds
+
+    async def aupload_images(self, datasets: Iterable[Dataset]) -> None:
+        """The async variant of upload_images (only for images in memory)."""
         if self.server.store_scp_support:
-            self.dimse_connector.send_c_store(resource)
+            await sync_to_async(self.upload_images, thread_sensitive=False)(datasets)
         elif self.server.dicomweb_stow_support:
-            self.dicom_web_connector.send_stow_rs(resource)
+            await self.async_dicom_web_connector.send_stow_rs(datasets)
         else:
             raise DicomError("No supported method to upload images available.")
 
@@ -472,19 +735,21 @@ class DicomOperator:
         patient_id: str,
         study_uid: str,
         dest_aet: str,
-    ) -> None:
+    ) -> int | None:
         """Move a study to another DICOM server.
 
         Args:
             patient_id: The patient ID.
             study_uid: The study instance UID.
             dest_aet: The destination AE title.
-            modality: The modality of the series to move.
+
+        Returns:
+            The number of completed sub-operations (if reported by the server).
         """
         if not self.server.patient_root_move_support and not self.server.study_root_move_support:
             raise DicomError("The server does not support moving a study.")
 
-        self.dimse_connector.send_c_move(
+        return self.dimse_connector.send_c_move(
             QueryDataset.create(
                 QueryRetrieveLevel="STUDY",
                 PatientID=patient_id,
@@ -493,7 +758,9 @@ class DicomOperator:
             dest_aet,
         )
 
-    def move_series(self, patient_id: str, study_uid: str, series_uid: str, dest_aet: str) -> None:
+    def move_series(
+        self, patient_id: str, study_uid: str, series_uid: str, dest_aet: str
+    ) -> int | None:
         """Move a series to another DICOM server.
 
         Args:
@@ -501,11 +768,14 @@ class DicomOperator:
             study_uid: The study instance UID.
             series_uid: The series instance UID.
             dest_aet: The destination AE title.
+
+        Returns:
+            The number of completed sub-operations (if reported by the server).
         """
         if not self.server.patient_root_move_support and not self.server.study_root_move_support:
             raise DicomError("The server does not support moving a series.")
 
-        self.dimse_connector.send_c_move(
+        return self.dimse_connector.send_c_move(
             QueryDataset.create(
                 QueryRetrieveLevel="SERIES",
                 PatientID=patient_id,
@@ -522,12 +792,143 @@ class DicomOperator:
         for ds in images:
             self._handle_fetched_image(ds, callback)
 
+    def _fetch_study_with_parallel_wado_rs(
+        self, query: QueryDataset, callback: Callable[[Dataset], None]
+    ) -> None:
+        """Fetches a study with multiple concurrent WADO-RS requests.
+
+        Each series (or batch of images of a large series) is fetched by its own thread
+        over its own connection (see DICOMWEB_PARALLEL_WADO_FETCHES). The fetched images
+        are handed over to this thread by a bounded queue, so that the callback is still
+        only called by one thread at a time.
+        """
+        parts = self._split_study_for_wado_rs(query)
+        max_workers = min(settings.DICOMWEB_PARALLEL_WADO_FETCHES, len(parts))
+        if max_workers <= 1:
+            self._fetch_images_with_wado_rs(query, callback)
+            return
+
+        fetched: queue.Queue[Dataset | None] = queue.Queue(settings.DICOMWEB_WADO_QUEUE_SIZE)
+        stopped = threading.Event()
+        errors: list[Exception] = []
+
+        def enqueue(ds: Dataset | None) -> bool:
+            while not stopped.is_set():
+                try:
+                    fetched.put(ds, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            # The fetching was stopped (because of an error), so nobody consumes the queue
+            return False
+
+        def fetch(queries: list[QueryDataset]) -> None:
+            connector = DicomWebConnector(self.server)
+            with self._wado_connectors_lock:
+                self._wado_connectors.append(connector)
+            try:
+                for part_query in queries:
+                    for ds in connector.send_wado_rs(part_query):
+                        if not enqueue(ds):
+                            return
+            except Exception as err:
+                with self._wado_connectors_lock:
+                    errors.append(err)
+                stopped.set()
+            finally:
+                with self._wado_connectors_lock:
+                    self._wado_connectors.remove(connector)
+                    self.dicom_web_connector.logs.extend(connector.logs)
+                # The thread may have opened its own database connection (e.g. for the
+                # health tracking of the server) that would otherwise be leaked.
+                db.connection.close()
+                enqueue(None)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch, queries) for queries in parts]
+            try:
+                remaining = len(futures)
+                while remaining and not stopped.is_set():
+                    try:
+                        ds = fetched.get(timeout=1)
+                    except queue.Empty:
+                        continue
+                    if ds is None:
+                        remaining -= 1
+                    else:
+                        self._handle_fetched_image(ds, callback)
+            finally:
+                stopped.set()
+                for future in futures:
+                    future.cancel()
+                # Don't wait for the running requests when the fetching stopped early
+                with self._wado_connectors_lock:
+                    for connector in self._wado_connectors:
+                        connector.abort()
+
+        # The first error stopped the fetching (the others may be caused by the abort)
+        if errors:
+            raise errors[0]
+
+    def _split_study_for_wado_rs(self, query: QueryDataset) -> list[list[QueryDataset]]:
+        """Splits a study into the WADO-RS queries that can be fetched concurrently.
+
+        Each part is fetched by one request for the whole series or, for series with
+        more images than DICOMWEB_WADO_INSTANCE_BATCH_SIZE, by one request per image of
+        a batch of the series.
+        """
+        batch_size = settings.DICOMWEB_WADO_INSTANCE_BATCH_SIZE
+        series_list = list(
+            self.find_series(
+                QueryDataset.create(
+                    PatientID=query.PatientID,
+                    StudyInstanceUID=query.StudyInstanceUID,
+                )
+            )
+        )
+
+        parts: list[list[QueryDataset]] = []
+        for series in series_list:
+            series_query = QueryDataset.create(
+                QueryRetrieveLevel="SERIES",
+                PatientID=query.PatientID,
+                StudyInstanceUID=query.StudyInstanceUID,
+                SeriesInstanceUID=series.SeriesInstanceUID,
+            )
+
+            number_of_images = series.get("NumberOfSeriesRelatedInstances")
+            if not batch_size or not number_of_images or int(number_of_images) <= batch_size:
+                parts.append([series_query])
+                continue
+
+            image_queries = [
+                QueryDataset.create(
+                    QueryRetrieveLevel="IMAGE",
+                    PatientID=query.PatientID,
+                    StudyInstanceUID=query.StudyInstanceUID,
+                    SeriesInstanceUID=series.SeriesInstanceUID,
+                    SOPInstanceUID=image.SOPInstanceUID,
+                )
+                for image in self.find_images(
+                    QueryDataset.create(
+                        PatientID=query.PatientID,
+                        StudyInstanceUID=query.StudyInstanceUID,
+                        SeriesInstanceUID=series.SeriesInstanceUID,
+                    )
+                )
+            ]
+            for i in range(0, len(image_queries), batch_size):
+                parts.append(image_queries[i : i + batch_size])
+
+        return parts
+
     def _fetch_images_with_c_get(
         self, query: QueryDataset, callback: Callable[[Dataset], None]
     ) -> None:
         def store_handler(event: Event, store_errors: list[Exception]) -> int:
-            ds = event.dataset
-            ds.file_meta = event.file_meta
+            # Keep the dataset as received, so that it must not be encoded again
+            # if it is not modified.
+            ds = read_encoded_dataset(event.encoded_dataset())
 
             try:
                 self._handle_fetched_image(ds, callback)
@@ -662,7 +1063,8 @@ class DicomOperator:
                     )
 
             def read_and_handle_image(filename: str):
-                ds = read_dataset(filename)
+                with open(filename, "rb") as f:
+                    ds = read_encoded_dataset(f.read())
                 self._handle_fetched_image(ds, callback)
 
             async def handle_received_file(filename: str, metadata: Metadata):
@@ -732,3 +1134,78 @@ class DicomOperator:
             else:
                 # Unknown error
                 raise DicomError(f"Failed to handle image '{ds.SOPInstanceUID}'.") from err
+
+
+def _pass_results(
+    find: Callable[[QueryDataset, int | None], Iterator[ResultDataset]],
+    query: QueryDataset,
+    limit_results: int | None,
+    callback: Callable[[ResultDataset], None],
+) -> None:
+    for result in find(query, limit_results):
+        callback(result)
+
+
+async def _aiterate_in_thread(run: Callable[..., None]) -> AsyncIterator[Any]:
+    """Runs a sync operation in a worker thread and yields what it passes to its
+    callback (as soon as it was passed).
+
+    The worker thread waits when DICOMWEB_WADO_QUEUE_SIZE items are not consumed yet.
+    When the consumer stops early, the callback raises so that the operation is aborted
+    (and its association released)."""
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue[Any] = asyncio.Queue(settings.DICOMWEB_WADO_QUEUE_SIZE)
+    stopped = threading.Event()
+    abort_message = "Operation aborted as its results are no longer consumed."
+
+    def callback(item: Any) -> None:
+        if stopped.is_set():
+            raise DicomError(abort_message)
+
+        put_future = asyncio.run_coroutine_threadsafe(items.put(item), loop)
+        while True:
+            try:
+                put_future.result(timeout=1)
+                return
+            except TimeoutError:
+                if stopped.is_set():
+                    put_future.cancel()
+                    raise DicomError(abort_message)
+            except CancelledError:
+                # The event loop was shut down in the meantime
+                raise DicomError(abort_message)
+
+    run_task = asyncio.create_task(sync_to_async(run, thread_sensitive=False)(callback=callback))
+    queue_get_task: asyncio.Task[Any] | None = None
+
+    try:
+        while True:
+            queue_get_task = asyncio.create_task(items.get())
+            done, _ = await asyncio.wait(
+                [run_task, queue_get_task], return_when=asyncio.FIRST_COMPLETED
+            )
+
+            finished = False
+            for task in done:
+                if task == queue_get_task:
+                    yield queue_get_task.result()
+                if task == run_task:
+                    finished = True
+
+            if finished:
+                queue_get_task.cancel()
+                break
+
+        # Items that were queued right before the operation finished
+        while not items.empty():
+            yield items.get_nowait()
+
+        await asyncio.wait([run_task, queue_get_task])
+        run_task.result()  # Raises the error of the operation (if any)
+    finally:
+        stopped.set()
+        if queue_get_task:
+            queue_get_task.cancel()
+        if not run_task.done():
+            # The consumer stopped early, so nobody is interested in the (abort) error
+            run_task.add_done_callback(lambda task: task.cancelled() or task.exception())
@@ -1,10 +1,15 @@
 import datetime
 import logging
 import re
+from io import BytesIO
 from os import PathLike
 from typing import Any, BinaryIO
 
 from pydicom import Dataset, dcmread, dcmwrite, valuerep
+from pydicom.tag import BaseTag, Tag
+from pydicom.uid import UID
+
+from ..errors import DicomError
 
 logger = logging.getLogger(__name__)
 
@@ -13,14 +18,53 @@ TimeRange = tuple[datetime.time | None, datetime.time | None]
 DateTimeRange = tuple[datetime.datetime | None, datetime.datetime | None]
 
 
+# The name of the attribute of a dataset that keeps the encoded bytes the dataset
+# was read from (see read_encoded_dataset)
+ENCODED_BYTES_ATTRIBUTE = "_adit_encoded_bytes"
+
+# The attributes that must be unchanged to use the encoded bytes of a dataset (a cheap
+# check that catches a modification, e.g. a pseudonymization, that forgot to discard them)
+ENCODED_BYTES_CHECKED_KEYWORDS = (
+    "PatientID",
+    "StudyInstanceUID",
+    "SeriesInstanceUID",
+    "SOPInstanceUID",
+)
+
+# The bulk data that is left out of the metadata of an image (like WADO-RS only references
+# it in its metadata responses). Other binary values (e.g. of private tags) are kept.
+BULK_DATA_TAGS = frozenset(
+    Tag(keyword)
+    for keyword in [
+        "PixelData",
+        "FloatPixelData",
+        "DoubleFloatPixelData",
+        "WaveformData",
+        "EncapsulatedDocument",
+        "SpectroscopyData",
+    ]
+)
+
+
 def write_dataset(
     ds: Dataset, fn: str | bytes | PathLike | BinaryIO, write_like_original=False
 ) -> None:
     """Write a DICOM dataset to a file or buffer.
 
     This function is a wrapper around pydicom's dcmwrite function to make sure
-    that the dataset is written in a consistent way.
+    that the dataset is written in a consistent way. If the dataset still has the
+    encoded bytes it was read from (see read_encoded_dataset), those are written as
+    they are without encoding the dataset again.
     """
+    encoded = get_encoded_bytes(ds)
+    if encoded is not None:
+        if isinstance(fn, (str, bytes, PathLike)):
+            with open(fn, "wb") as f:
+                f.write(encoded)
+        else:
+            fn.write(encoded)
+        return
+
     dcmwrite(fn, ds, write_like_original)
 
 
@@ -33,6 +77,123 @@ def read_dataset(fp: str | bytes | PathLike | BinaryIO) -> Dataset:
     return dcmread(fp, force=True)
 
 
+def read_encoded_dataset(data: bytes) -> Dataset:
+    """Read a DICOM dataset from its encoded bytes (in the DICOM File Format) and keep
+    those bytes with the dataset.
+
+    Pydicom only decodes the value of an element when it is accessed, so peeking at
+    the header (e.g. the UIDs) is cheap. As long as the dataset is not modified, it
+    can be written or sent with the kept bytes (see get_encoded_bytes). Whoever
+    modifies the dataset must discard the bytes before (see discard_encoded_bytes).
+    """
+    ds = dcmread(BytesIO(data), force=True)
+    setattr(ds, ENCODED_BYTES_ATTRIBUTE, (data, _get_encoded_bytes_check(ds)))
+    return ds
+
+
+def get_encoded_bytes(ds: Dataset) -> bytes | None:
+    """Returns the encoded bytes (in the DICOM File Format) the dataset was read from.
+
+    Returns None (and discards the bytes) if the identifying attributes or the transfer
+    syntax of the dataset don't match those bytes anymore.
+    """
+    kept = ds.__dict__.get(ENCODED_BYTES_ATTRIBUTE)
+    if kept is None:
+        return None
+
+    data, check = kept
+    if _get_encoded_bytes_check(ds) != check:
+        logger.debug("Discarding the encoded bytes of the modified dataset %s.", ds.SOPInstanceUID)
+        discard_encoded_bytes(ds)
+        return None
+
+    return data
+
+
+def _get_encoded_bytes_check(ds: Dataset) -> tuple[str, ...]:
+    file_meta = getattr(ds, "file_meta", None)
+    transfer_syntax = file_meta.get("TransferSyntaxUID") if file_meta is not None else None
+    values = [transfer_syntax] + [ds.get(keyword) for keyword in ENCODED_BYTES_CHECKED_KEYWORDS]
+    return tuple(str(value) for value in values)
+
+
+def discard_encoded_bytes(ds: Dataset) -> None:
+    """Discards the encoded bytes of a dataset, which must be done before modifying it."""
+    ds.__dict__.pop(ENCODED_BYTES_ATTRIBUTE, None)
+
+
+def get_metadata(ds: Dataset) -> Dataset:
+    """Returns the metadata of an image (the dataset without its pixel data and other
+    bulk data).
+
+    A dataset that still has the encoded bytes it was read from is read again but only
+    up to its pixel data (which is then never decoded and its bytes can be released).
+    Otherwise the bulk data is removed from the dataset itself.
+    """
+    encoded = get_encoded_bytes(ds)
+    if encoded is not None:
+        ds = dcmread(BytesIO(encoded), force=True, stop_before_pixels=True)
+    elif "PixelData" in ds:
+        del ds.PixelData
+
+    _remove_bulk_data(ds)
+    return ds
+
+
+def _remove_bulk_data(ds: Dataset) -> None:
+    for elem in list(ds):
+        if elem.tag in BULK_DATA_TAGS or _is_overlay_data(elem.tag):
+            del ds[elem.tag]
+        elif elem.VR == "SQ":
+            for item in elem.value:
+                _remove_bulk_data(item)
+
+
+def _is_overlay_data(tag: BaseTag) -> bool:
+    # Overlay Data is a repeating group (60xx,3000)
+    return tag.group & 0xFF01 == 0x6000 and tag.element == 0x3000
+
+
+def is_convertible_transfer_syntax(source: str, target: str) -> bool:
+    """Checks if a dataset in the source transfer syntax can be sent in the target
+    transfer syntax without transcoding its pixel data (what is the case for all
+    uncompressed syntaxes of the same endianness, including the deflated one)."""
+    source_uid, target_uid = UID(source), UID(target)
+    if source_uid == target_uid:
+        return True
+    if source_uid.is_compressed or target_uid.is_compressed:
+        return False
+    return source_uid.is_little_endian == target_uid.is_little_endian
+
+
+def transcode_dataset(ds: Dataset, transfer_syntax: str) -> None:
+    """Transcodes the dataset (in place) to another transfer syntax.
+
+    Compressed pixel data is decompressed (what requires an installed pixel data
+    handler for its syntax). Compressing is limited to the syntaxes pydicom can encode
+    (RLE Lossless).
+    """
+    target = UID(transfer_syntax)
+    current = UID(ds.file_meta.get("TransferSyntaxUID", ""))
+    if current == target:
+        return
+
+    discard_encoded_bytes(ds)
+
+    try:
+        if "PixelData" in ds and current.is_compressed:
+            ds.decompress()
+        if "PixelData" in ds and target.is_compressed:
+            ds.compress(target)
+    except (NotImplementedError, RuntimeError, ValueError) as err:
+        raise DicomError(f"Transcoding to {target.name} failed: {err}") from err
+
+    # Datasets without pixel data are encoded the same in every (little endian) syntax
+    ds.file_meta.TransferSyntaxUID = target
+    ds.is_implicit_VR = target.is_implicit_VR
+    ds.is_little_endian = target.is_little_endian
+
+
 def has_wildcards(value: str) -> bool:
     """Checks if a string has wildcards (according to the DICOM standard).
 
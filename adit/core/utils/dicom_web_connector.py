@@ -1,31 +1,53 @@
 import inspect
 import logging
-from functools import wraps
+import threading
+import uuid
+from dataclasses import dataclass, field
+from functools import partial, wraps
 from http import HTTPStatus
+from io import BytesIO
 from os import PathLike
 from pathlib import Path
-from typing import Callable, Iterator, NoReturn
+from typing import Callable, Iterable, Iterator, NoReturn
 
 from dicomweb_client import DICOMwebClient
+from django.conf import settings
 from pydicom import Dataset
 from pydicom.errors import InvalidDicomError
-from requests import HTTPError
+from requests import HTTPError, Response, Session
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import Timeout
 
-from ..errors import DicomError, RetriableDicomError
+from ..errors import DicomConnectionError, DicomError, RetriableDicomError
 from ..models import DicomServer
 from ..types import DicomLogEntry
+from ..utils.concurrency_limits import server_lease
 from ..utils.dicom_dataset import QueryDataset, ResultDataset
-from ..utils.dicom_utils import read_dataset
+from ..utils.dicom_utils import (
+    discard_encoded_bytes,
+    get_encoded_bytes,
+    read_encoded_dataset,
+    write_dataset,
+)
+from ..utils.http_pool import (
+    CONNECTION_ERROR_STATUS_CODES,
+    RETRIABLE_STATUS_CODES,
+    http_adapter_pool,
+)
+from ..utils.multipart import DICOM_MEDIA_TYPE, encode_multipart_related
+from ..utils.server_health import ensure_server_available, record_failure, record_success
 
 logger = logging.getLogger(__name__)
 
 Modifier = Callable[[Dataset], None]
 
 
-def connect_to_server():
+def connect_to_server(retrieval: bool = False):
     """
     Creates a DICOMwebClient instance and makes it available as
-    `self.dicomweb_client` in the decorated method.
+    `self.dicomweb_client` in the decorated method. Its session uses the pooled
+    (kept-alive) connections to the server. Waits for a free slot if the server
+    limits its concurrent connections (or retrievals).
     """
 
     def decorator(func):
@@ -39,8 +61,10 @@ def connect_to_server():
             if self.server.dicomweb_authorization_header:
                 headers["Authorization"] = self.server.dicomweb_authorization_header
 
+            self._session = self._create_session()
             self.dicomweb_client = DICOMwebClient(
                 url=self.server.dicomweb_root_url,
+                session=self._session,
                 qido_url_prefix=(
                     self.server.dicomweb_qido_prefix if self.server.dicomweb_qido_prefix else None
                 ),
@@ -53,17 +77,54 @@ def connect_to_server():
                 headers=headers,
             )
 
+        def teardown_dicomweb_client(self: "DicomWebConnector") -> None:
+            # The session is not closed as this would close the pooled connections
+            # (only the responses of the finished operation are released).
+            self._close_responses()
+            self.dicomweb_client = None
+            self._session = None
+
         @wraps(func)
         def gen_wrapper(self: "DicomWebConnector", *args, **kwargs):
+            ensure_server_available(self.server)
             setup_dicomweb_client(self)
-            yield from func(self, *args, **kwargs)
-            self.dicomweb_client = None
+            try:
+                with server_lease(self.server, retrieval):
+                    yield from func(self, *args, **kwargs)
+            except (RequestsConnectionError, Timeout) as err:
+                if self._aborted:
+                    raise
+                record_failure(self.server)
+                raise DicomConnectionError(
+                    f"Could not connect to DICOMweb server {self.server}."
+                ) from err
+            except DicomConnectionError:
+                record_failure(self.server)
+                raise
+            finally:
+                teardown_dicomweb_client(self)
+            record_success(self.server)
 
         @wraps(func)
         def func_wrapper(self: "DicomWebConnector", *args, **kwargs):
+            ensure_server_available(self.server)
             setup_dicomweb_client(self)
-            result = func(self, *args, **kwargs)
-            self.dicomweb_client = None
+            try:
+                with server_lease(self.server, retrieval):
+                    result = func(self, *args, **kwargs)
+            except (RequestsConnectionError, Timeout) as err:
+                if self._aborted:
+                    raise
+                record_failure(self.server)
+                raise DicomConnectionError(
+                    f"Could not connect to DICOMweb server {self.server}."
+                ) from err
+            except DicomConnectionError:
+                record_failure(self.server)
+                raise
+            finally:
+                teardown_dicomweb_client(self)
+            record_success(self.server)
             return result
 
         return gen_wrapper if inspect.isgeneratorfunction(func) else func_wrapper
@@ -80,20 +141,75 @@ class DicomWebConnector:
     ) -> None:
         self.server = server
 
+        self._session: Session | None = None
+        self._responses_lock = threading.Lock()
+        self._responses: list[Response] = []
+        self._aborted = False
+
         # TODO: log warnings
         self.logs: list[DicomLogEntry] = []
 
     def abort(self) -> None:
         """
-        Abort all running DICOMweb operations.
+        Abort all running DICOMweb operations (of this connector).
+
+        Only the connections of the running requests are closed, the other pooled
+        connections to the server are not affected.
         """
-        if self.dicomweb_client and self.dicomweb_client._session:
-            self.dicomweb_client._session.close()
+        with self._responses_lock:
+            self._aborted = True
+        self._close_responses()
+
+    def _create_session(self) -> Session:
+        adapter = http_adapter_pool.get(
+            (self.server.pk, self.server.dicomweb_root_url),
+            pool_size=settings.DICOMWEB_CONNECTION_POOL_SIZE,
+            retries=settings.DICOMWEB_RETRIES,
+            backoff_factor=settings.DICOMWEB_RETRY_BACKOFF_FACTOR,
+        )
+
+        session = Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.hooks["response"].append(self._track_response)
+
+        with self._responses_lock:
+            self._aborted = False
+
+        return session
+
+    def _track_response(
+        self, response: Response, *args, stream: bool = False, **kwargs
+    ) -> Response:
+        # Only streamed responses (e.g. of WADO-RS) keep their connection until they are
+        # consumed, the others (e.g. a page of QIDO-RS) are read at once and release it
+        # themselves (so they must not be kept until the operation is finished).
+        with self._responses_lock:
+            aborted = self._aborted
+            if not aborted and stream:
+                self._responses.append(response)
+
+        if aborted:
+            # The operation was aborted while the request was sent
+            response.close()
+
+        return response
+
+    def _close_responses(self) -> None:
+        with self._responses_lock:
+            responses = self._responses
+            self._responses = []
+
+        for response in responses:
+            # Closes the connection of a response whose content was not consumed yet
+            # and releases the others back to the pool.
+            response.close()
 
     @connect_to_server()
     def send_qido_rs(
         self, query: QueryDataset, limit_results: int | None = None
-    ) -> list[ResultDataset]:
+    ) -> Iterator[ResultDataset]:
+        """Yields the results of the query page by page (see QidoPager)."""
         logger.debug("Sending QIDO-RS with query: %s", query)
 
         search_filters, fields = query.get_search_filters_and_fields()
@@ -107,34 +223,32 @@ class DicomWebConnector:
 
         assert self.dicomweb_client
 
-        try:
-            if level == "STUDY":
-                results = self.dicomweb_client.search_for_studies(
-                    fields=fields, search_filters=search_filters, limit=limit_results
-                )
-            elif level == "SERIES":
-                study_uid = search_filters.pop("StudyInstanceUID", None)
-                results = self.dicomweb_client.search_for_series(
-                    study_uid, fields=fields, search_filters=search_filters, limit=limit_results
-                )
-            elif level == "IMAGE":
-                study_uid = search_filters.pop("StudyInstanceUID", None)
-                series_uid = search_filters.pop("SeriesInstanceUID", None)
-                results = self.dicomweb_client.search_for_instances(
-                    study_uid,
-                    series_uid,
-                    fields=fields,
-                    search_filters=search_filters,
-                    limit=limit_results,
+        if level == "STUDY":
+            search = self.dicomweb_client.search_for_studies
+        elif level == "SERIES":
+            study_uid = search_filters.pop("StudyInstanceUID", None)
+            search = partial(self.dicomweb_client.search_for_series, study_uid)
+        elif level == "IMAGE":
+            study_uid = search_filters.pop("StudyInstanceUID", None)
+            series_uid = search_filters.pop("SeriesInstanceUID", None)
+            search = partial(self.dicomweb_client.search_for_instances, study_uid, series_uid)
+        else:
+            raise ValueError(f"Invalid QueryRetrieveLevel: {level}")
+
+        pager = QidoPager(get_qido_page_size(self.server), limit_results)
+        while (page := pager.next_page()) is not None:
+            limit, offset = page
+            try:
+                results = search(
+                    fields=fields, search_filters=search_filters, limit=limit, offset=offset
                 )
-            else:
-                raise ValueError(f"Invalid QueryRetrieveLevel: {level}")
+            except HTTPError as err:
+                _handle_dicomweb_error(err, "QIDO-RS")
 
-            return [ResultDataset(Dataset.from_json(result)) for result in results]
-        except HTTPError as err:
-            _handle_dicomweb_error(err, "QIDO-RS")
+            for result in pager.add_results(results):
+                yield ResultDataset(Dataset.from_json(result))
 
-    @connect_to_server()
+    @connect_to_server(retrieval=True)
     def send_wado_rs(self, query: QueryDataset) -> Iterator[Dataset]:
         logger.debug("Sending WADO-RS with query: %s", query)
 
@@ -184,38 +298,50 @@ class DicomWebConnector:
     @connect_to_server()
     def send_stow_rs(
         self,
-        resource: PathLike | list[Dataset],
+        resource: PathLike | Iterable[Dataset],
         modifier: Modifier | None = None,
+        stored_callback: Callable[[Dataset], None] | None = None,
     ):
-        retriable_failures: list[str] = []
+        """Uploads the images of a folder or an iterable (e.g. a stream) of images.
+
+        Multiple images are sent in one request (up to `DICOMWEB_STOW_BATCH_MAX_INSTANCES`
+        images and `DICOMWEB_STOW_BATCH_MAX_BYTES` bytes). Images of a batch that failed
+        (according to the FailedSOPSequence of the response, or all of them if the response
+        does not tell) are sent again individually.
+        """
+        if not self.server.dicomweb_stow_support:
+            raise DicomError("DICOMweb STOW-RS is not supported by the server.")
+
+        report = _StowReport()
+        batch: list[tuple[Dataset, bytes]] = []
+        batch_bytes = 0
+
+        def _add_dataset(ds: Dataset) -> None:
+            nonlocal batch_bytes
 
-        def _send_dataset(ds: Dataset) -> None:
             # Allow to manipulate the dataset by an optional modifier function
             if modifier:
+                discard_encoded_bytes(ds)
                 modifier(ds)
 
-            assert self.dicomweb_client
+            encoded = _encode_dataset(ds)
+            if batch and (
+                len(batch) >= settings.DICOMWEB_STOW_BATCH_MAX_INSTANCES
+                or batch_bytes + len(encoded) > settings.DICOMWEB_STOW_BATCH_MAX_BYTES
+            ):
+                _send_batch()
 
-            try:
-                self.dicomweb_client.store_instances([ds])
-            except HTTPError as err:
-                assert err.response is not None
-                status_code = err.response.status_code
-                if _is_retriable_error(status_code):
-                    retriable_failures.append(ds.SOPInstanceUID)
-                else:
-                    _handle_dicomweb_error(err, "STOW-RS")
-
-        if not self.server.dicomweb_stow_support:
-            raise DicomError("DICOMweb STOW-RS is not supported by the server.")
+            batch.append((ds, encoded))
+            batch_bytes += len(encoded)
 
-        if isinstance(resource, list):  # resource is a list of datasets
-            logger.debug("Sending STOW of %d datasets.", len(resource))
+        def _send_batch() -> None:
+            nonlocal batch_bytes
+            if batch:
+                self._store_batch(batch, report, stored_callback)
+            batch.clear()
+            batch_bytes = 0
 
-            for ds in resource:
-                logger.debug("Sending C-STORE of SOP instance %s.", str(ds.SOPInstanceUID))
-                _send_dataset(ds)
-        else:  # resource is a path to a folder
+        if isinstance(resource, PathLike):  # resource is a path to a folder
             folder = Path(resource)
             if not folder.is_dir():
                 raise DicomError(f"Resource is not a valid folder: {resource}")
@@ -228,37 +354,234 @@ class DicomWebConnector:
                     continue
 
                 try:
-                    ds = read_dataset(path)
+                    ds = read_encoded_dataset(path.read_bytes())
                 except InvalidDicomError as err:
                     logger.error("Failed to read DICOM file %s: %s", path, err)
                     invalid_dicoms.append(path)
                     continue  # We try to handle the rest of the images and raise the error later
 
-                _send_dataset(ds)
+                _add_dataset(ds)
+
+            _send_batch()
 
             if invalid_dicoms:
                 raise DicomError(
                     f"{len(invalid_dicoms)} DICOM file{'s' if len(invalid_dicoms) > 1 else ''} "
                     " could not be read for STOW-RS."
                 )
+        else:  # resource is an iterable of datasets (e.g. a list or a stream)
+            logger.debug("Sending STOW of datasets.")
+
+            for ds in resource:
+                logger.debug("Sending STOW of SOP instance %s.", str(ds.SOPInstanceUID))
+                _add_dataset(ds)
 
-        if retriable_failures:
-            plural = len(retriable_failures) > 1
+            _send_batch()
+
+        if report.failures:
+            plural = len(report.failures) > 1
+            raise DicomError(
+                f"{len(report.failures)} STOW-RS operation{'s' if plural else ''} failed."
+            )
+
+        if report.retriable_failures:
+            plural = len(report.retriable_failures) > 1
             raise RetriableDicomError(
-                f"{len(retriable_failures)} STOW-RS operation{'s' if plural else ''} failed."
+                f"{len(report.retriable_failures)} STOW-RS operation{'s' if plural else ''} failed."
+            )
+
+    def _store_batch(
+        self,
+        batch: list[tuple[Dataset, bytes]],
+        report: "_StowReport",
+        stored_callback: Callable[[Dataset], None] | None,
+    ) -> None:
+        if len(batch) == 1:
+            ds, encoded = batch[0]
+            self._store_instance(ds, encoded, report, stored_callback)
+            return
+
+        logger.debug("Sending STOW of %d SOP instances.", len(batch))
+
+        try:
+            result = self._post_instances([encoded for _, encoded in batch])
+        except HTTPError as err:
+            assert err.response is not None
+            result = _parse_stow_response(err.response)
+            if result is None or "FailedSOPSequence" not in result:
+                # We don't know which instances failed, so we retry all of them
+                logger.warning(
+                    "STOW-RS of %d instances failed (%s), retrying them individually.",
+                    len(batch),
+                    err.response.status_code,
+                )
+                result = None
+
+        failed_uids: set[str] | None = None
+        if result is not None:
+            failed_uids = {
+                str(item.get("ReferencedSOPInstanceUID", ""))
+                for item in result.get("FailedSOPSequence", [])
+            }
+
+        for ds, encoded in batch:
+            if failed_uids is None or ds.SOPInstanceUID in failed_uids:
+                self._store_instance(ds, encoded, report, stored_callback)
+            elif stored_callback:
+                stored_callback(ds)
+
+    def _store_instance(
+        self,
+        ds: Dataset,
+        encoded: bytes,
+        report: "_StowReport",
+        stored_callback: Callable[[Dataset], None] | None,
+    ) -> None:
+        try:
+            result = self._post_instances([encoded])
+        except HTTPError as err:
+            assert err.response is not None
+            status_code = err.response.status_code
+            if _is_retriable_error(status_code):
+                report.retriable_failures.append(ds.SOPInstanceUID)
+                return
+            else:
+                _handle_dicomweb_error(err, "STOW-RS")
+
+        for item in result.get("FailedSOPSequence", []):
+            failure_reason = item.get("FailureReason")
+            logger.error(
+                "STOW-RS of SOP instance %s failed (failure reason %s).",
+                ds.SOPInstanceUID,
+                f"{failure_reason:04X}" if failure_reason is not None else "unknown",
             )
+            # Out of resources (A7xx) may work later
+            if failure_reason is not None and 0xA700 <= failure_reason <= 0xA7FF:
+                report.retriable_failures.append(ds.SOPInstanceUID)
+            else:
+                report.failures.append(ds.SOPInstanceUID)
+            return
+
+        if stored_callback:
+            stored_callback(ds)
+
+    def _post_instances(self, encoded_instances: list[bytes]) -> Dataset:
+        # The datasets are sent as they are without encoding them again (what the
+        # store_instances of the DICOMweb client would do).
+        assert self._session
+        url = self.server.dicomweb_root_url.rstrip("/")
+        if self.server.dicomweb_stow_prefix:
+            url += f"/{self.server.dicomweb_stow_prefix}"
+
+        boundary = uuid.uuid4().hex
+        response = self._session.post(
+            f"{url}/studies",
+            data=encode_multipart_related(encoded_instances, boundary, DICOM_MEDIA_TYPE),
+            headers={
+                "Content-Type": (
+                    f'multipart/related; type="{DICOM_MEDIA_TYPE}"; boundary={boundary}'
+                ),
+                "Accept": "application/dicom+json, application/json",
+            },
+        )
+        response.raise_for_status()
+        return _parse_stow_response(response) or Dataset()
+
+
+def get_qido_page_size(server: DicomServer) -> int:
+    if server.dicomweb_qido_page_size is not None:
+        return server.dicomweb_qido_page_size
+    return settings.DICOMWEB_QIDO_PAGE_SIZE
+
+
+class QidoPager:
+    """Splits the results of a QIDO-RS query into pages (requested with limit and offset).
+
+    Results are yielded as soon as a page arrives (with bounded memory for queries with
+    many results). A page with less results than requested is the last one. Some servers
+    ignore the offset and return the first page again, then no further pages are requested.
+    """
+
+    def __init__(self, page_size: int, limit_results: int | None = None) -> None:
+        self._page_size = page_size
+        self._limit_results = limit_results
+        self._offset = 0
+        self._last_limit: int | None = None
+        self._first_result: dict | None = None
+        self._done = False
+
+    def next_page(self) -> tuple[int | None, int | None] | None:
+        """Returns the limit and offset of the next page (or None if there is none)."""
+        if self._done:
+            return None
+
+        limit = self._page_size or None
+        if self._limit_results is not None:
+            remaining = self._limit_results - self._offset
+            if remaining <= 0:
+                return None
+            limit = min(limit, remaining) if limit else remaining
+
+        self._last_limit = limit
+        # The first page is requested without an offset (for servers that don't support it)
+        return limit, self._offset or None
+
+    def add_results(self, results: list[dict]) -> list[dict]:
+        """Adds the results of the requested page and returns the ones to yield."""
+        if self._offset and results and results[0] == self._first_result:
+            logger.warning("DICOMweb server ignores the QIDO-RS offset, stopping pagination.")
+            self._done = True
+            return []
+
+        if self._offset == 0 and results:
+            self._first_result = results[0]
+
+        self._offset += len(results)
+        if not self._page_size or self._last_limit is None or len(results) < self._last_limit:
+            self._done = True
+
+        return results
+
+
+@dataclass
+class _StowReport:
+    failures: list[str] = field(default_factory=list)
+    retriable_failures: list[str] = field(default_factory=list)
+
+
+def _encode_dataset(ds: Dataset) -> bytes:
+    encoded = get_encoded_bytes(ds)
+    if encoded is not None:
+        return encoded
+
+    with BytesIO() as buffer:
+        write_dataset(ds, buffer)
+        return buffer.getvalue()
+
+
+def _parse_stow_response(response: Response) -> Dataset | None:
+    """Parses the (JSON) body of a STOW-RS response (e.g. of a failed request)."""
+    if not response.content:
+        return None
+    try:
+        return Dataset.from_json(response.json())
+    except ValueError:
+        return None
 
 
 def _is_retriable_error(status_code: int) -> bool:
-    retriable_status_codes = [408, 409, 429, 500, 503, 504]
-    return status_code in retriable_status_codes
+    return status_code in RETRIABLE_STATUS_CODES
 
 
 def _handle_dicomweb_error(err: HTTPError, op: str) -> NoReturn:
     assert err.response is not None
     status_code = err.response.status_code
     status_phrase = HTTPStatus(status_code).phrase
-    if _is_retriable_error(status_code):
+    if status_code in CONNECTION_ERROR_STATUS_CODES:
+        raise DicomConnectionError(
+            f"DICOMweb {op} request failed: {status_phrase} [{status_code}]."
+        ) from err
+    elif _is_retriable_error(status_code):
         raise RetriableDicomError(
             f"DICOMweb {op} request failed: {status_phrase} [{status_code}]."
         ) from err
@@ -1,12 +1,18 @@
 import inspect
 import logging
+import queue
+import threading
 import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from functools import wraps
 from os import PathLike
 from pathlib import Path
-from typing import Callable, Iterator, Literal
+from typing import Callable, Iterable, Iterator, Literal
 
+from django import db
 from django.conf import settings
+from django.utils import timezone
 from pydicom import Dataset
 from pydicom.errors import InvalidDicomError
 from pynetdicom import debug_logger
@@ -30,12 +36,30 @@ from pynetdicom.sop_class import (
 )
 from pynetdicom.status import code_to_category
 
-from ..errors import DicomError, RetriableDicomError
+from ..errors import DicomConnectionError, DicomError, RetriableDicomError
 from ..models import DicomServer
 from ..types import DicomLogEntry
+from ..utils.association_pool import PoolKey, association_pool
+from ..utils.concurrency_limits import ServerLease, acquire_server_lease
 from ..utils.dicom_dataset import QueryDataset, ResultDataset
-from ..utils.dicom_utils import has_wildcards, read_dataset
-from ..utils.presentation_contexts import StoragePresentationContexts
+from ..utils.dicom_utils import (
+    discard_encoded_bytes,
+    has_wildcards,
+    is_convertible_transfer_syntax,
+    read_dataset,
+    transcode_dataset,
+)
+from ..utils.presentation_contexts import (
+    StoragePresentationContexts,
+    build_storage_contexts,
+    get_transfer_syntaxes,
+)
+from ..utils.server_health import (
+    ensure_server_available,
+    get_dimse_timeout,
+    record_failure,
+    record_success,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -60,16 +84,36 @@ def connect_to_server(service: DimseService):
                 self.open_connection(service)
                 opened_connection = True
 
+            start = time.monotonic()
+            latency: float | None = None
+
             try:
-                yield from func(self, *args, **kwargs)
+                for result in func(self, *args, **kwargs):
+                    if latency is None:
+                        latency = time.monotonic() - start
+                    yield result
+            except GeneratorExit:
+                # The generator was closed before it was exhausted, so there may be still
+                # pending responses and the association can't be reused.
+                self.abort_connection()
+                raise
             except Exception as err:
                 self.abort_connection()
+                if isinstance(err, DicomConnectionError):
+                    record_failure(self.server)
                 raise err
 
+            if latency is None:
+                latency = time.monotonic() - start
+
             if opened_connection and self.auto_connect:
                 self.close_connection()
                 opened_connection = False
 
+            # The time until the first response (or the final one if there were no results),
+            # only the one of C-FIND is used to derive its timeout.
+            record_success(self.server, latency if service == "C-FIND" else None)
+
         @wraps(func)
         def func_wrapper(self: "DimseConnector", *args, **kwargs):
             opened_connection = False
@@ -83,12 +127,15 @@ def connect_to_server(service: DimseService):
                 result = func(self, *args, **kwargs)
             except Exception as err:
                 self.abort_connection()
+                if isinstance(err, DicomConnectionError):
+                    record_failure(self.server)
                 raise err
 
             if opened_connection and self.auto_connect:
                 self.close_connection()
                 opened_connection = False
 
+            record_success(self.server)
             return result
 
         return gen_wrapper if inspect.isgeneratorfunction(func) else func_wrapper
@@ -109,6 +156,7 @@ class DimseConnector:
         connection_timeout: int | None = None,
         dimse_timeout: int | None = 60,
         network_timeout: int | None = 120,
+        adaptive_timeouts: bool = False,
     ) -> None:
         self.server = server
         self.auto_connect = auto_connect
@@ -118,22 +166,69 @@ class DimseConnector:
         self.connection_timeout = connection_timeout
         self.dimse_timeout = dimse_timeout
         self.network_timeout = network_timeout
+        # Derive the DIMSE timeout from the observed response latencies of the server
+        self.adaptive_timeouts = adaptive_timeouts
         self.logs: list[DicomLogEntry] = []
+        self._service: DimseService | None = None
+        self._lease: ServerLease | None = None
 
         if settings.ENABLE_DICOM_DEBUG_LOGGER:
             debug_logger()  # Debug mode of pynetdicom
 
     def open_connection(self, service: DimseService):
         if self.assoc:
-            raise AssertionError("A former connection was not closed properly.")
+            if self.assoc.is_alive():
+                raise AssertionError("A former connection was not closed properly.")
+            self.assoc = None
+
+        self._service = service
+
+        # Fails fast if the server is known to be unavailable at the moment
+        ensure_server_available(self.server)
+
+        if self.adaptive_timeouts:
+            # Only C-FIND responses follow each other quickly, between the responses of
+            # retrievals and uploads there are long gaps even with a fast server.
+            if service == "C-FIND":
+                self.dimse_timeout = get_dimse_timeout(self.server)
+            else:
+                self.dimse_timeout = settings.DIMSE_DEFAULT_TIMEOUT
+
+        # Blocks until the concurrency limits of the server (if any) allow another connection
+        self._release_lease()
+        self._lease = acquire_server_lease(self.server, retrieval=service in ("C-GET", "C-MOVE"))
+
+        try:
+            self._connect(service)
+        except BaseException:
+            self._release_lease()
+            raise
+
+    def _connect(self, service: DimseService):
+        if self._use_pool():
+            assoc = association_pool.acquire(
+                self._get_pool_key(service), settings.DIMSE_ASSOCIATION_POOL_IDLE_TIMEOUT
+            )
+            if assoc:
+                logger.debug("Reusing connection to DICOM server %s.", self.server.ae_title)
+                self._apply_timeouts(assoc)
+                self.assoc = assoc
+                return
 
         logger.debug("Opening connection to DICOM server %s.", self.server.ae_title)
 
         for i in range(self.connection_retries + 1):
+            if i > 0:
+                # Other workers may have given up on the server in the meantime
+                ensure_server_available(self.server)
+
             try:
                 self._associate(service)
-                break
+            except DicomConnectionError:
+                record_failure(self.server)
+                raise
             except ConnectionError as err:
+                record_failure(self.server)
                 logger.exception("Could not connect to %s.", self.server)
                 if i < self.connection_retries:
                     logger.info(
@@ -143,8 +238,11 @@ class DimseConnector:
                     time.sleep(self.retry_timeout)
                 else:
                     raise err
+            else:
+                record_success(self.server)
+                break
 
-    def _associate(self, service: DimseService):
+    def _associate(self, service: DimseService, use_accepted_contexts: bool = True):
         ae = AE(settings.CALLING_AE_TITLE)
 
         # Speed up by reducing the number of required DIMSE messages
@@ -165,6 +263,8 @@ class DimseConnector:
         # Setup the contexts
         # (inspired by https://github.com/pydicom/pynetdicom/blob/master/pynetdicom/apps)
         ext_neg = []
+        storage_syntaxes: list[str] = []
+        accepted_storage_syntaxes: list[str] = []
         if service == "C-FIND":
             ae.requested_contexts = (
                 QueryRetrievePresentationContexts
@@ -175,16 +275,27 @@ class DimseConnector:
             # The maximum requested contexts is 128. StoragePresentationContexts currently
             # contains 120 storage contexts. So even with the query/retrieve contexts added we
             # should have no problem.
+            # If the server already accepted only some of them before, we only propose
+            # those (what makes the association negotiation faster).
             ae.add_requested_context(PatientRootQueryRetrieveInformationModelGet)
             ae.add_requested_context(StudyRootQueryRetrieveInformationModelGet)
-            for cx in StoragePresentationContexts:
-                assert cx.abstract_syntax is not None
-                ae.add_requested_context(cx.abstract_syntax)
-                ext_neg.append(build_role(cx.abstract_syntax, scp_role=True))
+            if use_accepted_contexts:
+                accepted_storage_syntaxes = self._get_accepted_storage_syntaxes()
+            if accepted_storage_syntaxes:
+                storage_syntaxes = accepted_storage_syntaxes
+            else:
+                for cx in StoragePresentationContexts:
+                    assert cx.abstract_syntax is not None
+                    storage_syntaxes.append(cx.abstract_syntax)
+            # The server should send the images in the preferred transfer syntax (if set)
+            transfer_syntaxes = get_transfer_syntaxes(self.server.preferred_transfer_syntax)
+            for abstract_syntax in storage_syntaxes:
+                ae.add_requested_context(abstract_syntax, transfer_syntaxes)
+                ext_neg.append(build_role(abstract_syntax, scp_role=True))
         elif service == "C-MOVE":
             ae.requested_contexts = QueryRetrievePresentationContexts
         elif service == "C-STORE":
-            ae.requested_contexts = StoragePresentationContexts
+            ae.requested_contexts = build_storage_contexts(self.server.preferred_transfer_syntax)
         else:
             raise DicomError(f"Invalid DIMSE service: {service}")
 
@@ -196,19 +307,126 @@ class DimseConnector:
         )
 
         if not self.assoc.is_established:
-            raise RetriableDicomError(f"Could not connect to {self.server}.")
+            if accepted_storage_syntaxes:
+                logger.warning(
+                    "Association with formerly accepted contexts rejected by %s, "
+                    "retrying with all contexts.",
+                    self.server,
+                )
+                self.assoc = None
+                self._associate(service, use_accepted_contexts=False)
+                return
 
-    def close_connection(self):
-        logger.debug("Closing connection to DICOM server %s.", self.server.ae_title)
+            raise DicomConnectionError(f"Could not connect to {self.server}.")
+
+        if storage_syntaxes:
+            self._update_accepted_storage_contexts(storage_syntaxes)
+
+    def _get_accepted_storage_syntaxes(self) -> list[str]:
+        """Returns the storage abstract syntaxes the server accepted for C-GET before
+        (or an empty list if they are unknown or outdated)."""
+        updated = self.server.accepted_storage_contexts_updated
+        if not updated or not self.server.accepted_storage_contexts:
+            return []
 
+        max_age = settings.DIMSE_ACCEPTED_CONTEXTS_MAX_AGE
+        if (timezone.now() - updated).total_seconds() > max_age:
+            return []
+
+        return list(self.server.accepted_storage_contexts.keys())
+
+    def _update_accepted_storage_contexts(self, proposed_syntaxes: list[str]) -> None:
+        """Remembers which of the proposed storage contexts (and with which transfer
+        syntax) the server accepted."""
         assert self.assoc
-        self.assoc.release()
+        proposed = set(proposed_syntaxes)
+        accepted: dict[str, str] = {}
+        for cx in self.assoc.accepted_contexts:
+            if cx.abstract_syntax in proposed and cx.transfer_syntax:
+                accepted[cx.abstract_syntax] = cx.transfer_syntax[0]
+
+        if not accepted or accepted == self.server.accepted_storage_contexts:
+            return
+
+        self.server.accepted_storage_contexts = accepted
+        self.server.accepted_storage_contexts_updated = timezone.now()
+        if self.server.pk is not None:
+            DicomServer.objects.filter(pk=self.server.pk).update(
+                accepted_storage_contexts=accepted,
+                accepted_storage_contexts_updated=self.server.accepted_storage_contexts_updated,
+            )
+
+    def _use_pool(self) -> bool:
+        # Idle pooled associations would count against the limit of concurrent associations
+        # of the server (as far as the server is concerned), so they are not pooled then.
+        return (
+            settings.DIMSE_ASSOCIATION_POOL_SIZE > 0 and not self.server.max_concurrent_associations
+        )
+
+    def _release_lease(self) -> None:
+        if self._lease:
+            if self._lease.release():
+                self._lease = None
+            else:
+                logger.warning(
+                    "Connection slots of %s must be released by the thread that acquired them.",
+                    self.server,
+                )
+
+    def _get_pool_key(self, service: DimseService) -> PoolKey:
+        server = self.server
+        return (
+            server.pk,
+            server.ae_title,
+            server.host,
+            server.port,
+            server.preferred_transfer_syntax,
+            service,
+        )
+
+    def _apply_timeouts(self, assoc: Association) -> None:
+        # The timeouts of a reused association may differ from the ones of this connector
+        if self.acse_timeout is not None:
+            assoc.acse_timeout = self.acse_timeout
+        if self.dimse_timeout is not None:
+            assoc.dimse_timeout = self.dimse_timeout
+        if self.network_timeout is not None:
+            assoc.network_timeout = self.network_timeout
+
+    def close_connection(self):
+        assoc = self.assoc
+        if not assoc:
+            # Already aborted (e.g. after the result limit of a C-FIND was reached)
+            self._release_lease()
+            return
+
         self.assoc = None
 
+        try:
+            if self._use_pool() and self._service and assoc.is_alive():
+                logger.debug("Returning connection to DICOM server %s.", self.server.ae_title)
+                association_pool.release(
+                    self._get_pool_key(self._service),
+                    assoc,
+                    max_per_server=settings.DIMSE_ASSOCIATION_POOL_SIZE,
+                )
+            else:
+                logger.debug("Closing connection to DICOM server %s.", self.server.ae_title)
+                assoc.release()
+        finally:
+            self._release_lease()
+
     def abort_connection(self):
-        if self.assoc:
+        assoc = self.assoc
+        if assoc:
             logger.debug("Aborting connection to DICOM server %s.", self.server.ae_title)
-            self.assoc.abort()
+            self.assoc = None
+            try:
+                assoc.abort()
+            finally:
+                self._release_lease()
+        else:
+            self._release_lease()
 
     @connect_to_server("C-FIND")
     def send_c_find(
@@ -236,7 +454,7 @@ class DimseConnector:
         result_counter = 0
         for status, identifier in responses:
             if not status:
-                raise RetriableDicomError(
+                raise DicomConnectionError(
                     "Connection timed out, was aborted or received invalid response."
                 )
 
@@ -286,15 +504,21 @@ class DimseConnector:
                 "No valid Query/Retrieve Information Model for C-GET could be selected."
             )
 
-        assert self.assoc and self.assoc.is_alive()
-        self.assoc.bind(EVT_C_STORE, store_handler, [store_errors])
+        assoc = self.assoc
+        assert assoc and assoc.is_alive()
+        assoc.bind(EVT_C_STORE, store_handler, [store_errors])
 
-        responses = self.assoc.send_c_get(query.dataset, query_model, msg_id)
-
-        self._handle_get_and_move_responses(responses, "C-GET")
+        try:
+            responses = assoc.send_c_get(query.dataset, query_model, msg_id)
+            self._handle_get_and_move_responses(responses, "C-GET")
+        finally:
+            # The association may be reused by another operation (see AssociationPool)
+            assoc.unbind(EVT_C_STORE, store_handler)
 
     @connect_to_server("C-MOVE")
-    def send_c_move(self, query: QueryDataset, dest_aet: str, msg_id: int = 1) -> None:
+    def send_c_move(self, query: QueryDataset, dest_aet: str, msg_id: int = 1) -> int | None:
+        """Sends a C-MOVE request and returns the number of completed sub-operations
+        (if reported by the server)."""
         logger.debug("Sending C-MOVE with query:\n%s", query)
 
         # Transfer of only one study at a time is supported by ADIT
@@ -315,88 +539,249 @@ class DimseConnector:
         assert self.assoc and self.assoc.is_alive()
         responses = self.assoc.send_c_move(query.dataset, dest_aet, query_model, msg_id)
 
-        self._handle_get_and_move_responses(responses, "C-MOVE")
+        return self._handle_get_and_move_responses(responses, "C-MOVE")
 
-    @connect_to_server("C-STORE")
     def send_c_store(
-        self, resource: PathLike | list[Dataset], modifier: Modifier | None = None, msg_id: int = 1
+        self,
+        resource: PathLike | Iterable[Dataset],
+        modifier: Modifier | None = None,
+        msg_id: int = 1,
+        stored_callback: Callable[[Dataset], None] | None = None,
+        associations: int = 1,
     ) -> None:
-        warnings: list[str] = []
-        failures: list[str] = []
+        """Stores the images of a folder (or an iterable of datasets) on the server.
+
+        With multiple associations the images are sent concurrently over that many
+        associations (what helps when the upload is bound by the round trip time of
+        each C-STORE). The modifier and the stored callback are always called in the
+        thread of the caller. The associations are opened by the sending methods (each
+        sending thread opens its own one), unless a connection was already opened
+        manually, then only that one is used.
+        """
+        if not self.server.store_scp_support:
+            raise DicomError("C-STORE operation not supported by server.")
+
+        if isinstance(resource, PathLike) and not Path(resource).is_dir():
+            raise DicomError(f"Resource is not a valid folder: {resource}.")
+
+        invalid_dicoms: list[Path] = []
+        datasets = self._iter_store_datasets(resource, modifier, invalid_dicoms)
+        report = _StoreReport()
+
+        if isinstance(resource, (list, tuple)):
+            associations = min(associations, len(resource))
+        if self.server.max_concurrent_associations:
+            associations = min(associations, self.server.max_concurrent_associations)
 
-        def _send_dataset(ds: Dataset) -> None:
+        if associations > 1 and not self.assoc:
+            self._send_c_store_parallel(datasets, report, associations, stored_callback)
+        else:
+            self._send_c_store(datasets, report, msg_id, stored_callback)
+
+        if invalid_dicoms:
+            raise DicomError(
+                f"{len(invalid_dicoms)} DICOM file{'s' if len(invalid_dicoms) > 1 else ''} "
+                " could not be read for C-STORE."
+            )
+
+        self._handle_store_report(report)
+
+    def _iter_store_datasets(
+        self,
+        resource: PathLike | Iterable[Dataset],
+        modifier: Modifier | None,
+        invalid_dicoms: list[Path],
+    ) -> Iterator[Dataset]:
+        if isinstance(resource, PathLike):  # resource is a folder
+            folder = Path(resource)
+            logger.debug("Sending C-STORE of folder: %s", folder.absolute())
+            datasets = _read_datasets(folder, invalid_dicoms)
+        else:  # resource is an iterable of datasets (e.g. a list or a stream)
+            logger.debug("Sending C-STORE of datasets.")
+            datasets = resource
+
+        for ds in datasets:
             # Allow to manipulate the dataset by an optional modifier function
             if modifier:
+                discard_encoded_bytes(ds)
                 modifier(ds)
+            yield ds
+
+    @connect_to_server("C-STORE")
+    def _send_c_store(
+        self,
+        datasets: Iterable[Dataset],
+        report: "_StoreReport",
+        msg_id: int = 1,
+        stored_callback: Callable[[Dataset], None] | None = None,
+    ) -> None:
+        for ds in datasets:
+            logger.debug("Sending C-STORE of SOP instance %s.", str(ds.SOPInstanceUID))
 
             assert self.assoc and self.assoc.is_alive()
+
+            if settings.ENABLE_TRANSCODING:
+                self._transcode_if_not_accepted(ds)
+
+            # If the dataset was not modified, pydicom writes the (still undecoded) raw
+            # elements as they were received.
             status = self.assoc.send_c_store(ds, msg_id)
+            # Every message of an association should have its own ID (an unsigned short)
+            msg_id = msg_id % 0xFFFF + 1
 
             if not status:
-                raise RetriableDicomError(
+                raise DicomConnectionError(
                     "Connection timed out, was aborted or received invalid response."
                 )
-            else:
-                status_category = code_to_category(status.Status)
-                if status_category == STATUS_WARNING:
-                    warnings.append(ds.StudyInstanceUID)
-                    logger.warning(f"Warning during C-STORE [{status_category}]:\n{status}")
-                elif status_category != STATUS_SUCCESS:
-                    failures.append(ds.StudyInstanceUID)
-                    logger.error(f"Unexpected error during C-STORE [{status_category}]:\n{status}")
-
-        if not self.server.store_scp_support:
-            raise DicomError("C-STORE operation not supported by server.")
-
-        if isinstance(resource, list):  # resource is a list of datasets
-            logger.debug("Sending C-STORE of %d datasets.", len(resource))
-
-            for ds in resource:
-                logger.debug("Sending C-STORE of SOP instance %s.", str(ds.SOPInstanceUID))
-                _send_dataset(ds)
-        else:  # resource is a folder
-            folder = Path(resource)
-            if not folder.is_dir():
-                raise DicomError(f"Resource is not a valid folder: {resource}.")
 
-            logger.debug("Sending C-STORE of folder: %s", folder.absolute())
-
-            invalid_dicoms: list[PathLike] = []
-            for path in folder.rglob("*"):
-                if not path.is_file():
-                    continue
+            status_category = code_to_category(status.Status)
+            if status_category == STATUS_WARNING:
+                report.add_warning(status.Status)
+                logger.debug(f"Warning during C-STORE [{status_category}]:\n{status}")
+            elif status_category != STATUS_SUCCESS:
+                report.add_failure(status.Status)
+                logger.debug(f"Unexpected error during C-STORE [{status_category}]:\n{status}")
+                continue
+
+            if stored_callback:
+                stored_callback(ds)
+
+    def _transcode_if_not_accepted(self, ds: Dataset) -> None:
+        """Transcodes the dataset if the server accepted none of the contexts for its SOP
+        class with a transfer syntax the dataset can be sent in."""
+        assert self.assoc
+        transfer_syntax = ds.file_meta.get("TransferSyntaxUID")
+        if not transfer_syntax:
+            return
+
+        accepted_syntaxes = [
+            cx.transfer_syntax[0]
+            for cx in self.assoc.accepted_contexts
+            if cx.abstract_syntax == ds.SOPClassUID and cx.transfer_syntax
+        ]
+        if not accepted_syntaxes or any(
+            is_convertible_transfer_syntax(transfer_syntax, accepted_syntax)
+            for accepted_syntax in accepted_syntaxes
+        ):
+            return
+
+        logger.debug(
+            "Transcoding SOP instance %s from %s to %s.",
+            ds.SOPInstanceUID,
+            transfer_syntax,
+            accepted_syntaxes[0],
+        )
+        transcode_dataset(ds, accepted_syntaxes[0])
 
+    def _send_c_store_parallel(
+        self,
+        datasets: Iterable[Dataset],
+        report: "_StoreReport",
+        associations: int,
+        stored_callback: Callable[[Dataset], None] | None,
+    ) -> None:
+        # The datasets are read (and modified) in this thread and then distributed over
+        # the sending threads (each with its own association) by a bounded queue.
+        pending: queue.Queue[Dataset | None] = queue.Queue(associations * 2)
+        stored: queue.Queue[Dataset] = queue.Queue()
+        logs_lock = threading.Lock()
+
+        def iter_pending() -> Iterator[Dataset]:
+            while (ds := pending.get()) is not None:
+                yield ds
+
+        def send() -> None:
+            connector = self._create_sibling()
+            try:
+                connector._send_c_store(iter_pending(), report, stored_callback=stored.put)
+            finally:
+                with logs_lock:
+                    self.logs.extend(connector.logs)
+                # The thread may have opened its own database connection (e.g. for the
+                # health tracking of the server) that would otherwise be leaked.
+                db.connection.close()
+
+        def notify_stored() -> None:
+            while True:
                 try:
-                    ds = read_dataset(path)
-                except InvalidDicomError as err:
-                    logger.error("Failed to read DICOM file %s: %s", path, err)
-                    invalid_dicoms.append(path)
-                    continue  # We try to handle the rest of the images and raise the error later
-
-                _send_dataset(ds)
-
-            if invalid_dicoms:
-                raise DicomError(
-                    f"{len(invalid_dicoms)} DICOM file{'s' if len(invalid_dicoms) > 1 else ''} "
-                    " could not be read for C-STORE."
-                )
+                    ds = stored.get_nowait()
+                except queue.Empty:
+                    return
+                if stored_callback:
+                    stored_callback(ds)
+
+        with ThreadPoolExecutor(max_workers=associations) as executor:
+            futures = [executor.submit(send) for _ in range(associations)]
+
+            def enqueue(ds: Dataset | None) -> bool:
+                while not all(future.done() for future in futures):
+                    try:
+                        pending.put(ds, timeout=1)
+                        return True
+                    except queue.Full:
+                        notify_stored()
+                # All senders stopped early (most probably because of errors)
+                return False
 
-        if warnings:
-            # TODO: Maybe raise a warning or somehow else inform that the task has warnings
-            pass
+            try:
+                for ds in datasets:
+                    if not enqueue(ds):
+                        break
+                    notify_stored()
+            finally:
+                for _ in futures:
+                    enqueue(None)
+
+            for future in as_completed(futures):
+                notify_stored()
+
+        notify_stored()
+
+        for future in futures:
+            if error := future.exception():
+                raise error
+
+    def _create_sibling(self) -> "DimseConnector":
+        return DimseConnector(
+            self.server,
+            connection_retries=self.connection_retries,
+            retry_timeout=self.retry_timeout,
+            acse_timeout=self.acse_timeout,
+            connection_timeout=self.connection_timeout,
+            dimse_timeout=self.dimse_timeout,
+            network_timeout=self.network_timeout,
+            adaptive_timeouts=self.adaptive_timeouts,
+        )
 
-        if failures:
-            plural = len(failures) > 1
+    def _handle_store_report(self, report: "_StoreReport") -> None:
+        if report.warnings:
+            count = sum(report.warnings.values())
+            message = (
+                f"{count} image{'s' if count > 1 else ''} stored with warnings "
+                f"(status {_format_status_counts(report.warnings)})."
+            )
+            logger.warning(message)
+            self.logs.append({"level": "Warning", "title": "C-STORE warnings", "message": message})
+
+        if report.failures:
+            count = sum(report.failures.values())
+            logger.error(
+                "%d C-STORE operations failed (status %s).",
+                count,
+                _format_status_counts(report.failures),
+            )
             raise RetriableDicomError(
-                f"{len(failures)} C-STORE operation{'s' if plural else ''} failed."
+                f"{count} C-STORE operation{'s' if count > 1 else ''} failed."
             )
 
     def _handle_get_and_move_responses(
         self, responses: Iterator[tuple[Dataset, Dataset | None]], op: Literal["C-GET", "C-MOVE"]
-    ) -> None:
+    ) -> int | None:
+        completed_suboperations: int | None = None
+
         for status, identifier in responses:
             if not status:
-                raise RetriableDicomError(
+                raise DicomConnectionError(
                     "Connection timed out, was aborted or received invalid response."
                 )
 
@@ -408,7 +793,7 @@ class DimseConnector:
                 # Optional operation primitive parameters
                 # https://pydicom.github.io/pynetdicom/dev/reference/generated/pynetdicom.dimse_primitives.C_GET.html
                 # https://pydicom.github.io/pynetdicom/dev/reference/generated/pynetdicom.dimse_primitives.C_MOVE.html
-                completed_suboperations: int | None = status.get("NumberOfCompletedSuboperations")
+                completed_suboperations = status.get("NumberOfCompletedSuboperations")
                 failed_suboperations: int | None = status.get("NumberOfFailedSuboperations")
                 warning_suboperations: int | None = status.get("NumberOfWarningSuboperations")
 
@@ -468,3 +853,54 @@ class DimseConnector:
                 raise RetriableDicomError(
                     f"Unexpected error during {op} [{status_category}]:\n{status}"
                 )
+
+        return completed_suboperations
+
+
+class _StoreReport:
+    """The (thread-safe) aggregated status counts of C-STORE operations."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.warnings: Counter[int] = Counter()
+        self.failures: Counter[int] = Counter()
+
+    def add_warning(self, status: int) -> None:
+        with self._lock:
+            self.warnings[status] += 1
+
+    def add_failure(self, status: int) -> None:
+        with self._lock:
+            self.failures[status] += 1
+
+
+def _format_status_counts(counts: Counter[int]) -> str:
+    return ", ".join(f"0x{status:04X}: {count}" for status, count in counts.most_common())
+
+
+def _read_datasets(folder: Path, invalid_dicoms: list[Path]) -> Iterator[Dataset]:
+    """Reads the DICOM files of a folder while prefetching the next ones in background
+    threads (so that they are already loaded when the current one was sent)."""
+    prefetch = max(1, settings.DIMSE_STORE_PREFETCH)
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        reads: deque[tuple[Path, Future[Dataset]]] = deque()
+        paths = (path for path in folder.rglob("*") if path.is_file())
+
+        for path in paths:
+            reads.append((path, executor.submit(read_dataset, path)))
+            if len(reads) > prefetch:
+                yield from _take_read(reads, invalid_dicoms)
+
+        while reads:
+            yield from _take_read(reads, invalid_dicoms)
+
+
+def _take_read(
+    reads: deque[tuple[Path, Future[Dataset]]], invalid_dicoms: list[Path]
+) -> Iterator[Dataset]:
+    path, future = reads.popleft()
+    try:
+        yield future.result()
+    except InvalidDicomError as err:
+        logger.error("Failed to read DICOM file %s: %s", path, err)
+        invalid_dicoms.append(path)  # We try to handle the rest of the images
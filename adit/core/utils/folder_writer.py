@@ -0,0 +1,148 @@
+import errno
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import Callable
+
+from pydicom import Dataset
+
+from ..errors import DicomError
+from .dicom_utils import write_dataset
+
+logger = logging.getLogger(__name__)
+
+
+class FolderWriter:
+    """Writes datasets to a folder in the background (write-behind).
+
+    The datasets are written by a small pool of threads, so that a slow destination
+    (e.g. a network share) does not slow down the fetching of the images. When
+    `queue_size` datasets are waiting to be written, `write` blocks until one of them
+    is finished (backpressure). The written files are synced to disk in batches of
+    `fsync_batch_size` files (and when the writer is closed). The optional
+    `stored_callback` is called (from a writer thread) with every dataset and its
+    file size after it was written.
+    """
+
+    def __init__(
+        self,
+        folder: Path,
+        workers: int,
+        queue_size: int,
+        fsync_batch_size: int,
+        stored_callback: Callable[[Dataset, int], None] | None = None,
+    ) -> None:
+        self.folder = folder
+        self.fsync_batch_size = fsync_batch_size
+        self.stored_callback = stored_callback
+
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(max(1, queue_size))
+        self._lock = threading.Lock()
+        self._created_folders: set[Path] = set()
+        self._unsynced_files: list[Path] = []
+        self._error: BaseException | None = None
+
+    def __enter__(self) -> "FolderWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Just wait for the running writes, the original error is propagated
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def write(self, ds: Dataset, file_path: Path) -> None:
+        """Queues the dataset to be written to the given path (relative to the folder)."""
+        self._raise_error()
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, ds, self.folder / file_path)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._on_written)
+
+    def close(self) -> None:
+        """Waits until all datasets are written and synced to disk."""
+        self._executor.shutdown(wait=True)
+        self._raise_error()
+
+        try:
+            self._sync(self._unsynced_files)
+        except OSError as err:
+            self._error = err
+            self._raise_error()
+        self._unsynced_files = []
+
+    def _on_written(self, future: Future[None]) -> None:
+        self._slots.release()
+        # Queued writes are cancelled when the writer is left because of an error
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error:
+            with self._lock:
+                if not self._error:
+                    self._error = error
+
+    def _write(self, ds: Dataset, path: Path) -> None:
+        folder = path.parent
+        # Creating folders on network shares is slow, so we remember the created ones
+        with self._lock:
+            folder_created = folder in self._created_folders
+        if not folder_created:
+            folder.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                self._created_folders.add(folder)
+
+        write_dataset(ds, path)
+
+        files_to_sync: list[Path] = []
+        with self._lock:
+            self._unsynced_files.append(path)
+            if self.fsync_batch_size and len(self._unsynced_files) >= self.fsync_batch_size:
+                files_to_sync = self._unsynced_files
+                self._unsynced_files = []
+
+        self._sync(files_to_sync)
+
+        if self.stored_callback:
+            self.stored_callback(ds, path.stat().st_size)
+
+    def _sync(self, files: list[Path]) -> None:
+        if not self.fsync_batch_size:
+            return
+
+        for path in files:
+            _fsync(path)
+        for folder in {path.parent for path in files}:
+            _fsync(folder)
+
+    def _raise_error(self) -> None:
+        err = self._error
+        if not err:
+            return
+
+        if isinstance(err, OSError) and err.errno == errno.ENOSPC:
+            # No space left on destination
+            raise DicomError(f"Out of disk space while trying to save '{err.filename}'.") from err
+        raise err
+
+
+def _fsync(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,84 @@
+import atexit
+import logging
+import os
+import threading
+from typing import Hashable
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# The status codes of DICOMweb responses that are worth to retry (the request may succeed
+# later) in contrast to those that will fail again.
+RETRIABLE_STATUS_CODES = frozenset([408, 409, 429, 500, 503, 504])
+
+# The retriable status codes that tell that the server itself has a problem (in contrast
+# to a conflict or rate limit of a single request) and so count as a connection error.
+CONNECTION_ERROR_STATUS_CODES = frozenset([408, 500, 503, 504])
+
+
+class HttpAdapterPool:
+    """The HTTP adapters (per process) that keep the connections to the DICOMweb servers.
+
+    Each adapter holds a pool of kept-alive connections (so TCP and TLS handshakes are only
+    done once per connection) and retries failed idempotent requests with an exponential
+    backoff. The adapters are shared by all threads of the process, a connector mounts
+    the adapter of its server on its own session (so that it has its own headers and hooks
+    and can abort its own requests without affecting others).
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._adapters: dict[Hashable, HTTPAdapter] = {}
+
+    def get(
+        self,
+        key: Hashable,
+        pool_size: int,
+        retries: int,
+        backoff_factor: float,
+    ) -> HTTPAdapter:
+        """Returns the adapter for the key (and creates it if there is none yet)."""
+        with self._lock:
+            adapter = self._adapters.get(key)
+            if adapter is None:
+                logger.debug("Creating HTTP adapter for %s.", key)
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=pool_size,
+                    max_retries=Retry(
+                        total=retries,
+                        backoff_factor=backoff_factor,
+                        status_forcelist=RETRIABLE_STATUS_CODES,
+                        # The last response is returned (and then handled by the connector)
+                        # when the retries are exhausted.
+                        raise_on_status=False,
+                    ),
+                )
+                self._adapters[key] = adapter
+            return adapter
+
+    def clear(self) -> None:
+        """Closes the connections of all adapters."""
+        with self._lock:
+            adapters = list(self._adapters.values())
+            self._adapters = {}
+
+        for adapter in adapters:
+            try:
+                adapter.close()
+            except Exception:
+                logger.exception("Failed to close HTTP adapter.")
+
+
+http_adapter_pool = HttpAdapterPool()
+
+# A forked process (e.g. the one a DICOM task is processed in) must not use the
+# connections of its parent, as they share the same sockets.
+os.register_at_fork(after_in_child=http_adapter_pool._reset)
+
+atexit.register(http_adapter_pool.clear)
@@ -0,0 +1,106 @@
+from typing import AsyncIterable, AsyncIterator, Iterable
+
+DICOM_MEDIA_TYPE = "application/dicom"
+
+
+class MultipartParser:
+    """Incrementally splits the body of a multipart message (e.g. of a WADO-RS response)
+    into the contents of its parts.
+
+    The body can be fed in chunks of any size (as they are received), every part is
+    returned as soon as it is complete, so only the part that is currently received
+    is buffered (and not the whole message).
+    """
+
+    def __init__(self, boundary: bytes) -> None:
+        self._delimiter = b"\r\n--" + boundary
+        # The first boundary may directly start the body (without a preceding line break)
+        self._buffer = bytearray(b"\r\n")
+        self._search_start = 0
+        self._in_preamble = True
+        self.is_complete = False
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        """Feeds the next chunk of the body and returns the parts that got complete."""
+        if self.is_complete:
+            return []  # The epilogue is ignored
+
+        self._buffer += chunk
+        parts: list[bytes] = []
+
+        while True:
+            index = self._buffer.find(self._delimiter, self._search_start)
+            if index < 0:
+                # The delimiter may start at the end of the buffer and be completed by the
+                # next chunk, otherwise we don't need to look at the data again.
+                self._search_start = max(0, len(self._buffer) - len(self._delimiter) + 1)
+                break
+
+            end = index + len(self._delimiter)
+            if len(self._buffer) < end + 2:
+                # We don't know yet if it is the closing delimiter (followed by "--")
+                self._search_start = index
+                break
+
+            segment = bytes(self._buffer[:index])
+            is_closing = self._buffer[end : end + 2] == b"--"
+            del self._buffer[:end]
+            self._search_start = 0
+
+            if self._in_preamble:
+                self._in_preamble = False
+            else:
+                parts.append(_extract_content(segment))
+
+            if is_closing:
+                self.is_complete = True
+                self._buffer.clear()
+                break
+
+        return parts
+
+    def close(self) -> None:
+        """Must be called after the last chunk was fed to make sure the message was
+        complete (raises a ValueError otherwise)."""
+        if not self.is_complete:
+            raise ValueError("Incomplete multipart message.")
+
+
+def _extract_content(segment: bytes) -> bytes:
+    # The segment starts with the rest of the boundary line (usually just a line break),
+    # followed by the (optional) header fields of the part and an empty line.
+    header_end = segment.find(b"\r\n\r\n")
+    if header_end < 0:
+        raise ValueError("Multipart message part without header delimiter.")
+    return segment[header_end + 4 :]
+
+
+def get_boundary(content_type: str) -> bytes | None:
+    """Extracts the boundary from the value of a multipart Content-Type header."""
+    _, *parameters = [item.strip() for item in content_type.split(";")]
+    for parameter in parameters:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "boundary":
+            return value.strip().strip('"').encode("utf-8")
+    return None
+
+
+async def iter_multipart_parts(
+    chunks: AsyncIterable[bytes], boundary: bytes
+) -> AsyncIterator[bytes]:
+    """Yields the contents of the parts of a multipart body while it is received."""
+    parser = MultipartParser(boundary)
+    async for chunk in chunks:
+        for part in parser.feed(chunk):
+            yield part
+    parser.close()
+
+
+def encode_multipart_related(parts: Iterable[bytes], boundary: str, content_type: str) -> bytes:
+    """Encodes the body of a multipart/related message (e.g. of a STOW-RS request)."""
+    body = bytearray()
+    for part in parts:
+        body += f"\r\n--{boundary}\r\nContent-Type: {content_type}\r\n\r\n".encode("utf-8")
+        body += part
+    body += f"\r\n--{boundary}--".encode("utf-8")
+    return bytes(body)
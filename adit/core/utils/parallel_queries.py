@@ -0,0 +1,90 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from django import db
+from django.conf import settings
+
+from ..models import DicomServer
+from ..types import DicomLogEntry
+from .dicom_dataset import QueryDataset, ResultDataset
+from .dicom_operator import DicomOperator
+
+logger = logging.getLogger(__name__)
+
+QueryFunc = Callable[[DicomOperator, QueryDataset], Iterable[ResultDataset]]
+
+_server_slots: dict[int, threading.BoundedSemaphore] = {}
+_server_slots_lock = threading.Lock()
+
+
+def _get_server_slots(server: DicomServer) -> threading.BoundedSemaphore:
+    with _server_slots_lock:
+        slots = _server_slots.get(server.pk)
+        if slots is None:
+            slots = threading.BoundedSemaphore(max(1, settings.PARALLEL_QUERIES_PER_SERVER))
+            _server_slots[server.pk] = slots
+        return slots
+
+
+class ParallelQueryExecutor:
+    """Runs independent queries (C-FIND or QIDO-RS) against the same server concurrently.
+
+    Every query runs with its own operator (and so over its own association). How many
+    queries run at the same time against a server is limited (in each process) by the
+    PARALLEL_QUERIES_PER_SERVER setting.
+    """
+
+    def __init__(self, server: DicomServer) -> None:
+        self.server = server
+        self.logs: list[DicomLogEntry] = []
+        self._lock = threading.Lock()
+
+    def map(self, query_func: QueryFunc, queries: list[QueryDataset]) -> list[list[ResultDataset]]:
+        """Runs the queries and returns their results (in the same order as the queries).
+
+        Args:
+            query_func: Queries with the given operator (e.g. by calling its find_studies).
+            queries: The queries to run.
+        """
+        max_workers = min(settings.PARALLEL_QUERIES_PER_SERVER, len(queries))
+        if max_workers <= 1:
+            return [self._query(query_func, query) for query in queries]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(lambda query: self._query_in_thread(query_func, query), queries)
+            )
+
+    def _query_in_thread(self, query_func: QueryFunc, query: QueryDataset) -> list[ResultDataset]:
+        try:
+            return self._query(query_func, query)
+        finally:
+            # The worker thread may have opened its own database connection (e.g. for the
+            # concurrency limits of the server) that would otherwise be leaked.
+            db.connection.close()
+
+    def _query(self, query_func: QueryFunc, query: QueryDataset) -> list[ResultDataset]:
+        operator = DicomOperator(self.server)
+        try:
+            with _get_server_slots(self.server):
+                return list(query_func(operator, query))
+        finally:
+            with self._lock:
+                self.logs.extend(operator.get_logs())
+
+
+def merge_results(result_lists: list[list[ResultDataset]], unique_key: str) -> list[ResultDataset]:
+    """Merges the results of multiple queries and removes the duplicates (identified by
+    the given attribute, e.g. StudyInstanceUID)."""
+    seen: set[str] = set()
+    results: list[ResultDataset] = []
+    for result_list in result_lists:
+        for result in result_list:
+            key = result.get(unique_key)
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append(result)
+    return results
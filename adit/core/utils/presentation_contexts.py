@@ -1,4 +1,6 @@
+from pynetdicom import DEFAULT_TRANSFER_SYNTAXES
 from pynetdicom.presentation import (
+    PresentationContext,
     build_context,
 )
 
@@ -130,3 +132,23 @@ assert len(_storage) <= 120
 
 StoragePresentationContexts = [build_context(uid) for uid in sorted(_storage)]
 """Pre-built presentation contexts for :dcm:`Storage<part04/chapter_B.html>` containing 120 selected SOP Classes."""  # noqa: E501
+
+
+def get_transfer_syntaxes(preferred_transfer_syntax: str = "") -> list[str]:
+    """The transfer syntaxes to propose in a presentation context (in the order of
+    preference), the default (uncompressed) ones are always proposed as a fallback."""
+    if not preferred_transfer_syntax:
+        return list(DEFAULT_TRANSFER_SYNTAXES)
+    return [preferred_transfer_syntax] + [
+        syntax for syntax in DEFAULT_TRANSFER_SYNTAXES if syntax != preferred_transfer_syntax
+    ]
+
+
+def build_storage_contexts(preferred_transfer_syntax: str = "") -> list[PresentationContext]:
+    """The storage presentation contexts with the preferred transfer syntax (if any)."""
+    if not preferred_transfer_syntax:
+        return StoragePresentationContexts
+    transfer_syntaxes = get_transfer_syntaxes(preferred_transfer_syntax)
+    return [
+        build_context(cx.abstract_syntax, transfer_syntaxes) for cx in StoragePresentationContexts
+    ]
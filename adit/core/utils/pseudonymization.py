@@ -0,0 +1,142 @@
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from types import TracebackType
+from typing import Callable
+
+from dicognito.anonymizer import Anonymizer
+from dicognito.value_keeper import ValueKeeper
+from pydicom import Dataset
+
+from .dicom_utils import discard_encoded_bytes
+
+logger = logging.getLogger(__name__)
+
+Modifier = Callable[[Dataset], None]
+
+# This module must not import anything Django related as it is also imported by the
+# (spawned) worker processes of the pseudonymization pool.
+
+
+def create_anonymizer(skip_elements: list[str], seed: str | None = None) -> Anonymizer:
+    """Creates an anonymizer that keeps the values of the given elements.
+
+    Anonymizers with the same seed map the same input (e.g. a Study Instance UID)
+    to the same output.
+    """
+    anonymizer = Anonymizer(seed=seed)
+    for element in skip_elements:
+        anonymizer.add_element_handler(ValueKeeper(element))
+    return anonymizer
+
+
+def modify_dataset(
+    anonymizer: Anonymizer,
+    pseudonym: str | None,
+    trial_protocol_id: str,
+    trial_protocol_name: str,
+    ds: Dataset,
+) -> None:
+    """Optionally pseudonymize a dataset with the given pseudonym
+    and add the trial ID and name to the DICOM header if specified."""
+    if not (pseudonym or trial_protocol_id or trial_protocol_name):
+        return
+
+    # The bytes the dataset was read from are outdated after the modification
+    discard_encoded_bytes(ds)
+
+    if pseudonym:
+        anonymizer.anonymize(ds)
+
+        ds.PatientID = pseudonym
+        ds.PatientName = pseudonym
+
+    if trial_protocol_id:
+        ds.ClinicalTrialProtocolID = trial_protocol_id
+
+    if trial_protocol_name:
+        ds.ClinicalTrialProtocolName = trial_protocol_name
+
+    if pseudonym and trial_protocol_id:
+        session_id = f"{ds.StudyDate}-{ds.StudyTime}"
+        ds.PatientComments = (
+            f"Project:{trial_protocol_id} Subject:{pseudonym} Session:{pseudonym}_{session_id}"
+        )
+
+
+_worker_modifier: Modifier | None = None
+
+
+def _init_worker(modifier: Modifier) -> None:
+    global _worker_modifier
+    _worker_modifier = modifier
+
+
+def _modify_in_worker(ds: Dataset) -> Dataset:
+    assert _worker_modifier
+    _worker_modifier(ds)
+    return ds
+
+
+class PseudonymizationPool:
+    """Modifies datasets in a pool of processes.
+
+    Every worker process gets its own copy of the (picklable) modifier. So when the
+    modifier uses a seeded anonymizer all workers map the same UIDs to the same
+    pseudonymized UIDs. The modified datasets are passed to the callback in the
+    same order as they were submitted. When more than `max_pending` datasets are
+    in progress, submitting blocks until the oldest one is finished.
+    """
+
+    def __init__(
+        self,
+        modifier: Modifier,
+        callback: Callable[[Dataset], None],
+        processes: int,
+        max_pending: int,
+    ) -> None:
+        self.callback = callback
+        self.max_pending = max(1, max_pending)
+
+        # The workers are spawned (and not forked) as the forking process may already
+        # run other threads (e.g. the upload to a destination server).
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(modifier,),
+        )
+        self._pending: deque[Future[Dataset]] = deque()
+
+    def __enter__(self) -> "PseudonymizationPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, ds: Dataset) -> None:
+        # No need to send the (soon outdated) encoded bytes to the worker
+        discard_encoded_bytes(ds)
+        self._pending.append(self._executor.submit(_modify_in_worker, ds))
+        self._deliver(flush=False)
+
+    def flush(self) -> None:
+        """Waits for all pending datasets and passes them to the callback."""
+        self._deliver(flush=True)
+
+    def _deliver(self, flush: bool) -> None:
+        while self._pending and (
+            flush or len(self._pending) > self.max_pending or self._pending[0].done()
+        ):
+            future = self._pending.popleft()
+            self.callback(future.result())
@@ -0,0 +1,160 @@
+import logging
+from datetime import date
+from typing import Callable, Iterable, Iterator, Literal
+
+from .dicom_dataset import QueryDataset, ResultDataset
+from .dicom_utils import convert_to_python_date, convert_to_python_regex
+
+logger = logging.getLogger(__name__)
+
+FilterLevel = Literal["PATIENT", "STUDY", "SERIES"]
+
+QueryProtocol = Literal["C-FIND", "QIDO-RS"]
+
+Check = Callable[[ResultDataset], bool]
+
+
+class QueryFilter:
+    """A query compiled into a predicate over the results of a C-FIND or QIDO-RS.
+
+    Some servers don't support filtering by some attributes (or not in the same way),
+    so we filter the results additionally in a programmatic way. The query is only
+    analyzed once (wildcard patterns are compiled to regexes and the values are
+    converted to their types), so matching a result only looks at the result itself.
+    Attributes the server is known to filter by itself can be skipped. A filter can be
+    reused for the results of multiple queries with the same filter attributes.
+    """
+
+    def __init__(
+        self,
+        query: QueryDataset,
+        level: FilterLevel,
+        server_filtered: Iterable[str] = (),
+    ) -> None:
+        skipped = set(server_filtered)
+        self._checks: list[Check] = []
+
+        for keyword, compile_check in _COMPILERS[level].items():
+            if keyword in skipped or not query.has(keyword):
+                continue
+
+            check = compile_check(query)
+            if check:
+                self._checks.append(check)
+
+    def __bool__(self) -> bool:
+        """Returns False if the filter would let pass every result."""
+        return bool(self._checks)
+
+    def matches(self, result: ResultDataset) -> bool:
+        return all(check(result) for check in self._checks)
+
+    def filter(self, results: Iterable[ResultDataset]) -> Iterator[ResultDataset]:
+        if not self._checks:
+            yield from results
+            return
+
+        for result in results:
+            if self.matches(result):
+                yield result
+
+
+def _compile_pattern(keyword: str, value: str) -> Check | None:
+    if not value.strip("*"):
+        # Matches everything
+        return None
+
+    pattern = convert_to_python_regex(value)
+    return lambda result: pattern.search(str(result.get(keyword, ""))) is not None
+
+
+def _compile_equal(keyword: str, value: str) -> Check:
+    return lambda result: str(result.get(keyword, "")) == value
+
+
+def _compile_patient_birth_date(query: QueryDataset) -> Check:
+    # Currently we don't allow a range filter for PatientBirthDate
+    birth_date = query.PatientBirthDate
+    return lambda result: _get_date(result, "PatientBirthDate") == birth_date
+
+
+def _compile_modalities_in_study(query: QueryDataset) -> Check:
+    modalities = frozenset(query.ModalitiesInStudy)
+
+    def check(result: ResultDataset) -> bool:
+        # It's ok if any of the searched modalities is in the study
+        return "ModalitiesInStudy" in result and not modalities.isdisjoint(result.ModalitiesInStudy)
+
+    return check
+
+
+def _compile_series_number(query: QueryDataset) -> Check:
+    # SeriesNumber is of VR Integer String and with just a C-FIND it's not guaranteed
+    # that e.g. "4" is the same as "+4" (so we compare the integer values)
+    # https://groups.google.com/g/comp.protocols.dicom/c/JNsg7upVJ08
+    series_number = query.SeriesNumber
+
+    def check(result: ResultDataset) -> bool:
+        value = result.get("SeriesNumber")
+        try:
+            return value is not None and value != "" and int(value) == series_number
+        except ValueError:
+            return False
+
+    return check
+
+
+def _get_date(result: ResultDataset, keyword: str) -> date | None:
+    value = result.get(keyword)
+    if not value:
+        return None
+    try:
+        return convert_to_python_date(value)
+    except Exception:
+        logger.debug("Invalid %s in result: %s", keyword, value)
+        return None
+
+
+# The attributes a server must match itself (the required matching keys of C-FIND and the
+# required matching attributes of QIDO-RS), so those don't have to be filtered again.
+# We never request fuzzy matching of person names (by an extended negotiation or the
+# fuzzymatching parameter), so PatientName is always matched by its wildcards. The
+# descriptions (and the birth date and sex of the patient) are only optional keys, not
+# all servers match them. ModalitiesInStudy may be matched differently with multiple
+# modalities and the integer values of SeriesNumber are only compared by QIDO-RS (with
+# C-FIND it's a string).
+# https://dicom.nema.org/medical/dicom/current/output/html/part04.html#sect_C.6.1.1
+# https://dicom.nema.org/medical/dicom/current/output/html/part18.html#table_10.6.1-5
+SERVER_FILTERED: dict[QueryProtocol, dict[FilterLevel, frozenset[str]]] = {
+    "C-FIND": {
+        "PATIENT": frozenset(["PatientName"]),
+        "STUDY": frozenset(),
+        "SERIES": frozenset(["Modality"]),
+    },
+    "QIDO-RS": {
+        "PATIENT": frozenset(["PatientName"]),
+        "STUDY": frozenset(),
+        "SERIES": frozenset(["Modality", "SeriesNumber"]),
+    },
+}
+
+_COMPILERS: dict[FilterLevel, dict[str, Callable[[QueryDataset], Check | None]]] = {
+    "PATIENT": {
+        "PatientBirthDate": _compile_patient_birth_date,
+        "PatientName": lambda query: _compile_pattern("PatientName", query.PatientName),
+        "PatientSex": lambda query: _compile_equal("PatientSex", query.PatientSex),
+    },
+    "STUDY": {
+        "StudyDescription": lambda query: _compile_pattern(
+            "StudyDescription", query.StudyDescription
+        ),
+        "ModalitiesInStudy": _compile_modalities_in_study,
+    },
+    "SERIES": {
+        "SeriesNumber": _compile_series_number,
+        "Modality": lambda query: _compile_equal("Modality", query.Modality),
+        "SeriesDescription": lambda query: _compile_pattern(
+            "SeriesDescription", query.SeriesDescription
+        ),
+    },
+}
@@ -0,0 +1,167 @@
+"""Tracks the health of DICOM servers (shared by all workers through the database).
+
+Only connection-level failures are recorded (see DicomConnectionError), data-level errors
+(like a rejected image) say nothing about the availability of the server. After too many
+consecutive failures the circuit of the server opens, i.e. further operations fail fast
+with a RetriableDicomError (so that the task is retried later instead of blocking a
+worker). After a cooldown a single operation is allowed to probe the server again, its
+success closes the circuit, its failure opens it again.
+
+Successful operations don't touch the database as long as the server is healthy. The
+response latencies of C-FIND operations are collected per process and written in
+batches (without locking), they are used to derive the C-FIND timeout of the server.
+"""
+
+import logging
+import math
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..errors import RetriableDicomError
+from ..models import DicomServer, DicomServerHealth
+
+logger = logging.getLogger(__name__)
+
+
+# The servers this process saw failing (so a success must reset their health) and the
+# latencies that were not written yet (both by the primary key of the server).
+_failing_servers: set[int] = set()
+_pending_latencies: dict[int, list[float]] = {}
+_lock = threading.Lock()
+
+
+def _is_tracked(server: DicomServer) -> bool:
+    return server.pk is not None
+
+
+def ensure_server_available(server: DicomServer) -> None:
+    """Raises a RetriableDicomError if the circuit of the server is open."""
+    if not _is_tracked(server) or settings.DICOM_SERVER_CIRCUIT_BREAKER_THRESHOLD <= 0:
+        return
+
+    health = DicomServerHealth.objects.filter(server_id=server.pk).first()
+    if not health:
+        return
+
+    if health.consecutive_failures:
+        with _lock:
+            _failing_servers.add(server.pk)
+
+    if not health.circuit_opened_at:
+        return
+
+    now = timezone.now()
+    cooldown = timedelta(seconds=settings.DICOM_SERVER_CIRCUIT_BREAKER_COOLDOWN)
+    if now - health.circuit_opened_at >= cooldown:
+        # Half open, only the caller that manages to restart the cooldown may probe the server
+        claimed = DicomServerHealth.objects.filter(
+            pk=health.pk, circuit_opened_at=health.circuit_opened_at
+        ).update(circuit_opened_at=now)
+        if claimed:
+            logger.info("Probing if %s is available again.", server)
+            return
+
+    raise RetriableDicomError(
+        f"{server} is currently unavailable ({health.consecutive_failures} failed "
+        "operations in a row), will be retried later."
+    )
+
+
+def record_success(server: DicomServer, latency: float | None = None) -> None:
+    """Records a successful operation (and optionally the latency of the response)."""
+    if not _is_tracked(server):
+        return
+
+    with _lock:
+        was_failing = server.pk in _failing_servers
+        _failing_servers.discard(server.pk)
+
+        latencies: list[float] = []
+        if latency is not None:
+            pending = _pending_latencies.setdefault(server.pk, [])
+            pending.append(round(latency, 3))
+            if len(pending) >= settings.DICOM_SERVER_LATENCY_BATCH_SIZE:
+                latencies = _pending_latencies.pop(server.pk)
+
+    if was_failing:
+        reset = (
+            DicomServerHealth.objects.filter(server_id=server.pk)
+            .exclude(consecutive_failures=0, circuit_opened_at=None)
+            .update(consecutive_failures=0, circuit_opened_at=None)
+        )
+        if reset:
+            logger.info("%s is available again.", server)
+
+    if latencies:
+        _write_latencies(server, latencies)
+
+
+def _write_latencies(server: DicomServer, latencies: list[float]) -> None:
+    # Without a lock concurrent writers may overwrite each other's latencies, what is
+    # fine for a sample of them.
+    health, _ = DicomServerHealth.objects.get_or_create(server_id=server.pk)
+    samples = (health.samples + [[True, latency] for latency in latencies])[
+        -settings.DICOM_SERVER_HEALTH_WINDOW :
+    ]
+    DicomServerHealth.objects.filter(pk=health.pk).update(samples=samples)
+
+
+def record_failure(server: DicomServer) -> None:
+    """Records a connection-level failure (e.g. a connection that could not be established)."""
+    if not _is_tracked(server):
+        return
+
+    with _lock:
+        _failing_servers.add(server.pk)
+
+    with transaction.atomic():
+        health, _ = DicomServerHealth.objects.select_for_update().get_or_create(server_id=server.pk)
+
+        health.consecutive_failures += 1
+        threshold = settings.DICOM_SERVER_CIRCUIT_BREAKER_THRESHOLD
+        if threshold > 0 and health.consecutive_failures >= threshold:
+            if not health.circuit_opened_at:
+                logger.warning(
+                    "%s failed %d times in a row, pausing operations with it.",
+                    server,
+                    health.consecutive_failures,
+                )
+            health.circuit_opened_at = timezone.now()
+
+        health.save()
+
+
+def get_latency_percentile(health: DicomServerHealth, percentile: float) -> float | None:
+    """The percentile (0 to 100) of the tracked response latencies (None if none tracked)."""
+    latencies = sorted(latency for _, latency in health.samples if latency is not None)
+    if not latencies:
+        return None
+    index = max(0, math.ceil(percentile / 100 * len(latencies)) - 1)
+    return latencies[index]
+
+
+def get_dimse_timeout(server: DicomServer) -> int:
+    """Derives the DIMSE timeout of C-FIND operations from the observed response latencies
+    of the server (the retrievals and uploads use the default timeout)."""
+    default_timeout = settings.DIMSE_DEFAULT_TIMEOUT
+    if not _is_tracked(server):
+        return default_timeout
+
+    health = DicomServerHealth.objects.filter(server_id=server.pk).first()
+    if not health:
+        return default_timeout
+
+    latency_count = sum(1 for _, latency in health.samples if latency is not None)
+    if latency_count < settings.DIMSE_ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+        return default_timeout
+
+    p95 = get_latency_percentile(health, 95)
+    assert p95 is not None
+    timeout = math.ceil(p95 * settings.DIMSE_ADAPTIVE_TIMEOUT_FACTOR)
+    return min(
+        max(timeout, settings.DIMSE_ADAPTIVE_TIMEOUT_MIN), settings.DIMSE_ADAPTIVE_TIMEOUT_MAX
+    )
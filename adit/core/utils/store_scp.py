@@ -12,8 +12,6 @@ from pynetdicom.ae import ApplicationEntity as AE
 from pynetdicom.events import Event
 from pynetdicom.presentation import AllStoragePresentationContexts
 
-from .dicom_utils import write_dataset
-
 logger = logging.getLogger(__name__)
 
 FileReceivedHandler = Callable[[str], None]
@@ -119,12 +117,9 @@ class StoreScp:
             with NamedTemporaryFile(
                 prefix=file_prefix, suffix=".dcm", dir=self._folder, delete=False
             ) as file:
-                # There are two ways to save the file. We use the first one and prefer
-                # reliability over speed. (See file history for second method.)
+                # We write the dataset as it was received without decoding and encoding it.
                 # https://pydicom.github.io/pynetdicom/stable/examples/storage.html#storage-scp
-                ds = event.dataset
-                ds.file_meta = event.file_meta
-                write_dataset(ds, file.name)
+                file.write(event.encoded_dataset())
         except Exception as err:
             if isinstance(err, OSError) and err.errno == errno.ENOSPC:
                 logger.error("Out of disc space while saving received file.")
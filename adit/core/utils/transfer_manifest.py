@@ -0,0 +1,65 @@
+import secrets
+import threading
+from typing import Any
+
+
+class TransferManifest:
+    """Keeps track of the images of a transfer task that already reached the destination.
+
+    The manifest is persisted with the transfer task, so that a retry of a failed task
+    only has to transfer the missing images. Images are identified by their original
+    SOPInstanceUID (as on the source server). It also holds the seed of the anonymizer,
+    so that a retry pseudonymizes the UIDs the same way.
+    """
+
+    def __init__(self, data: dict[str, Any] | None = None) -> None:
+        data = data or {}
+        self._instances: dict[str, int | None] = dict(data.get("instances", {}))
+        self._complete_series: set[str] = set(data.get("complete_series", []))
+        self._anonymization_seed: str | None = data.get("anonymization_seed")
+        self._lock = threading.Lock()
+        self.unsaved_changes = 0
+
+    @property
+    def anonymization_seed(self) -> str:
+        with self._lock:
+            if self._anonymization_seed is None:
+                self._anonymization_seed = secrets.token_hex(16)
+                self.unsaved_changes += 1
+            return self._anonymization_seed
+
+    def is_resuming(self) -> bool:
+        """Returns if some images were already stored by a previous attempt."""
+        with self._lock:
+            return bool(self._instances or self._complete_series)
+
+    def is_stored(self, image_uid: str) -> bool:
+        with self._lock:
+            return image_uid in self._instances
+
+    def is_series_complete(self, series_uid: str) -> bool:
+        with self._lock:
+            return series_uid in self._complete_series
+
+    def add_stored(self, image_uid: str, size: int | None) -> None:
+        """Adds an image (with its size in bytes if known) that reached the destination."""
+        with self._lock:
+            self._instances[image_uid] = size
+            self.unsaved_changes += 1
+
+    def add_complete_series(self, series_uid: str) -> None:
+        with self._lock:
+            self._complete_series.add(series_uid)
+            self.unsaved_changes += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns the data to persist (and resets the number of unsaved changes)."""
+        with self._lock:
+            self.unsaved_changes = 0
+            data: dict[str, Any] = {
+                "instances": dict(self._instances),
+                "complete_series": sorted(self._complete_series),
+            }
+            if self._anonymization_seed is not None:
+                data["anonymization_seed"] = self._anonymization_seed
+            return data
@@ -5,6 +5,7 @@ from typing import AsyncIterator
 from pydicom import Dataset
 from rest_framework.renderers import BaseRenderer
 
+from adit.core.utils.dicom_dataset import ResultDataset
 from adit.core.utils.dicom_utils import write_dataset
 
 
@@ -15,6 +16,20 @@ class QidoApplicationDicomJsonRenderer(BaseRenderer):
     def render(self, data, accepted_media_type=None, renderer_context=None):
         return json.dumps(data)
 
+    async def render_stream(self, results: AsyncIterator[ResultDataset]) -> AsyncIterator[bytes]:
+        """Renders the results as a JSON array, each result as soon as it arrives.
+
+        An error in the middle of the stream can't be turned into an error response
+        anymore. It aborts the response instead, so that the client receives an incomplete
+        (and so invalid) JSON array that can't be mistaken for the complete results.
+        """
+        yield b"["
+        separator = b""
+        async for result in results:
+            yield separator + json.dumps(result.dataset.to_json_dict()).encode("utf-8")
+            separator = b","
+        yield b"]"
+
 
 class DicomWebWadoRenderer(BaseRenderer):
     media_type: str
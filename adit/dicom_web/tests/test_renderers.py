@@ -0,0 +1,43 @@
+import json
+from typing import AsyncIterator
+
+import pytest
+from pydicom import Dataset
+
+from adit.core.utils.dicom_dataset import ResultDataset
+from adit.dicom_web.renderers import QidoApplicationDicomJsonRenderer
+
+
+async def create_results(study_uids: list[str]) -> AsyncIterator[ResultDataset]:
+    for study_uid in study_uids:
+        ds = Dataset()
+        ds.StudyInstanceUID = study_uid
+        yield ResultDataset(ds)
+
+
+@pytest.mark.asyncio
+async def test_qido_renderer_streams_json_array():
+    # Arrange
+    renderer = QidoApplicationDicomJsonRenderer()
+
+    # Act
+    chunks = [chunk async for chunk in renderer.render_stream(create_results(["1.2.1", "1.2.2"]))]
+
+    # Assert
+    assert len(chunks) == 4
+    assert json.loads(b"".join(chunks)) == [
+        {"0020000D": {"vr": "UI", "Value": ["1.2.1"]}},
+        {"0020000D": {"vr": "UI", "Value": ["1.2.2"]}},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_qido_renderer_streams_empty_json_array():
+    # Arrange
+    renderer = QidoApplicationDicomJsonRenderer()
+
+    # Act
+    chunks = [chunk async for chunk in renderer.render_stream(create_results([]))]
+
+    # Assert
+    assert json.loads(b"".join(chunks)) == []
@@ -1,7 +1,5 @@
 import logging
-from typing import Literal
-
-from adrf.views import sync_to_async
+from typing import AsyncIterator, Literal
 
 from adit.core.errors import DicomError, RetriableDicomError
 from adit.core.models import DicomServer
@@ -18,35 +16,30 @@ async def qido_find(
     query_ds: QueryDataset,
     limit_results: int | None,
     level: Literal["STUDY", "SERIES", "IMAGE"],
-) -> list[ResultDataset]:
+) -> AsyncIterator[ResultDataset]:
+    """QIDO find helper.
+
+    Yields the results as they arrive from the server and converts the errors of the
+    operator to API errors.
+    """
     operator = DicomOperator(source_server)
 
     try:
         if level == "STUDY":
-            results: list[ResultDataset] = list(
-                await sync_to_async(operator.find_studies, thread_sensitive=False)(
-                    query_ds, limit_results
-                )
-            )
+            results = operator.afind_studies(query_ds, limit_results)
         elif level == "SERIES":
-            results: list[ResultDataset] = list(
-                await sync_to_async(operator.find_series, thread_sensitive=False)(
-                    query_ds, limit_results
-                )
-            )
+            results = operator.afind_series(query_ds, limit_results)
         elif level == "IMAGE":
-            results: list[ResultDataset] = list(
-                await sync_to_async(operator.find_images, thread_sensitive=False)(
-                    query_ds, limit_results
-                )
-            )
+            results = operator.afind_images(query_ds, limit_results)
         else:
             raise ValueError(f"Invalid QIDO-RS level: {level}.")
+
+        async for result in results:
+            yield result
+
     except RetriableDicomError as err:
         logger.exception(err)
         raise ServiceUnavailableApiError(str(err))
     except DicomError as err:
         logger.exception(err)
         raise BadGatewayApiError(str(err))
-
-    return results
@@ -1,8 +1,6 @@
-import asyncio
 import logging
 from typing import AsyncIterator, Literal
 
-from adrf.views import sync_to_async
 from pydicom import Dataset
 
 from adit.core.errors import DicomError, RetriableDicomError
@@ -22,67 +20,81 @@ async def wado_retrieve(
 ) -> AsyncIterator[Dataset]:
     """WADO retrieve helper.
 
-    Mainly converts a sync callback (by the operator) to an async iterator.
+    Mainly converts the errors of the operator to API errors.
     """
     operator = DicomOperator(source_server)
     query_ds = QueryDataset.from_dict(query)
 
-    loop = asyncio.get_running_loop()
-    queue = asyncio.Queue[Dataset]()
-
-    def callback(ds: Dataset) -> None:
-        loop.call_soon_threadsafe(queue.put_nowait, ds)
-
     try:
         if level == "STUDY":
-            fetch_task = asyncio.create_task(
-                sync_to_async(operator.fetch_study, thread_sensitive=False)(
-                    patient_id=query_ds.PatientID,
-                    study_uid=query_ds.StudyInstanceUID,
-                    callback=callback,
-                )
+            images = operator.afetch_study(
+                patient_id=query_ds.PatientID,
+                study_uid=query_ds.StudyInstanceUID,
             )
         elif level == "SERIES":
-            fetch_task = asyncio.create_task(
-                sync_to_async(operator.fetch_series, thread_sensitive=False)(
-                    patient_id=query_ds.PatientID,
-                    study_uid=query_ds.StudyInstanceUID,
-                    series_uid=query_ds.SeriesInstanceUID,
-                    callback=callback,
-                )
+            images = operator.afetch_series(
+                patient_id=query_ds.PatientID,
+                study_uid=query_ds.StudyInstanceUID,
+                series_uid=query_ds.SeriesInstanceUID,
             )
         elif level == "IMAGE":
             assert query_ds.has("SeriesInstanceUID")
-            fetch_task = asyncio.create_task(
-                sync_to_async(operator.fetch_image, thread_sensitive=False)(
-                    patient_id=query_ds.PatientID,
-                    study_uid=query_ds.StudyInstanceUID,
-                    series_uid=query_ds.SeriesInstanceUID,
-                    image_uid=query_ds.SOPInstanceUID,
-                    callback=callback,
-                )
+            images = operator.afetch_image(
+                patient_id=query_ds.PatientID,
+                study_uid=query_ds.StudyInstanceUID,
+                series_uid=query_ds.SeriesInstanceUID,
+                image_uid=query_ds.SOPInstanceUID,
             )
         else:
             raise ValueError(f"Invalid WADO-RS level: {level}.")
 
-        while True:
-            queue_get_task = asyncio.create_task(queue.get())
-            done, _ = await asyncio.wait(
-                [fetch_task, queue_get_task], return_when=asyncio.FIRST_COMPLETED
-            )
+        async for ds in images:
+            yield ds
+
+    except RetriableDicomError as err:
+        raise ServiceUnavailableApiError(str(err))
+    except DicomError as err:
+        raise BadGatewayApiError(str(err))
 
-            finished = False
-            for task in done:
-                if task == queue_get_task:
-                    yield queue_get_task.result()
-                if task == fetch_task:
-                    finished = True
 
-            if finished:
-                queue_get_task.cancel()
-                break
+async def wado_retrieve_metadata(
+    source_server: DicomServer,
+    query: dict[str, str],
+    level: Literal["STUDY", "SERIES", "IMAGE"],
+) -> AsyncIterator[Dataset]:
+    """WADO retrieve metadata helper.
+
+    Yields the metadata of the images (without pixel data and other bulk data) and
+    converts the errors of the operator to API errors.
+    """
+    operator = DicomOperator(source_server)
+    query_ds = QueryDataset.from_dict(query)
+
+    try:
+        if level == "STUDY":
+            images = operator.afetch_study_metadata(
+                patient_id=query_ds.PatientID,
+                study_uid=query_ds.StudyInstanceUID,
+            )
+        elif level == "SERIES":
+            images = operator.afetch_series_metadata(
+                patient_id=query_ds.PatientID,
+                study_uid=query_ds.StudyInstanceUID,
+                series_uid=query_ds.SeriesInstanceUID,
+            )
+        elif level == "IMAGE":
+            assert query_ds.has("SeriesInstanceUID")
+            images = operator.afetch_image_metadata(
+                patient_id=query_ds.PatientID,
+                study_uid=query_ds.StudyInstanceUID,
+                series_uid=query_ds.SeriesInstanceUID,
+                image_uid=query_ds.SOPInstanceUID,
+            )
+        else:
+            raise ValueError(f"Invalid WADO-RS level: {level}.")
 
-        await asyncio.wait([fetch_task, queue_get_task])
+        async for ds in images:
+            yield ds
 
     except RetriableDicomError as err:
         raise ServiceUnavailableApiError(str(err))
@@ -13,7 +13,7 @@ from rest_framework.response import Response
 from rest_framework.utils.mediatypes import media_type_matches
 
 from adit.core.models import DicomServer
-from adit.core.utils.dicom_dataset import QueryDataset
+from adit.core.utils.dicom_dataset import QueryDataset, ResultDataset
 from adit.dicom_web.utils.peekable import AsyncPeekable
 
 from .parsers import parse_request_in_chunks
@@ -26,7 +26,7 @@ from .renderers import (
 )
 from .utils.qidors_utils import qido_find
 from .utils.stowrs_utils import stow_store
-from .utils.wadors_utils import wado_retrieve
+from .utils.wadors_utils import wado_retrieve, wado_retrieve_metadata
 
 logger = logging.getLogger(__name__)
 
@@ -85,55 +85,81 @@ class QueryAPIView(WebDicomAPIView):
         query_ds.ensure_elements(*request.GET.getlist("includefield"))
         return query_ds, limit_results
 
+    async def peek_results(
+        self, results: AsyncIterator[ResultDataset]
+    ) -> AsyncPeekable[ResultDataset]:
+        # Like when retrieving images (see RetrieveAPIView.peek_images) we wait for the
+        # first result, so that an error of the query itself still leads to an error
+        # response (instead of a broken stream).
+        peekable_results = AsyncPeekable(results)
+        try:
+            await peekable_results.peek()
+        except StopAsyncIteration:
+            pass
+
+        return peekable_results
+
+    def stream_results(
+        self, request: AuthenticatedApiRequest, results: AsyncIterator[ResultDataset]
+    ) -> StreamingHttpResponse:
+        renderer = cast(QidoApplicationDicomJsonRenderer, getattr(request, "accepted_renderer"))
+        return StreamingHttpResponse(
+            streaming_content=renderer.render_stream(results),
+            content_type=renderer.media_type,
+        )
+
 
 class QueryStudiesAPIView(QueryAPIView):
     async def get(
         self,
         request: AuthenticatedApiRequest,
         ae_title: str,
-    ) -> Response:
+    ) -> StreamingHttpResponse:
         query_ds, limit_results = self._extract_query_parameters(request)
         source_server = await self._get_dicom_server(request, ae_title, "source")
 
+        results = qido_find(source_server, query_ds, limit_results, "STUDY")
         try:
-            results = await qido_find(source_server, query_ds, limit_results, "STUDY")
+            results = await self.peek_results(results)
         except ValueError as err:
             logger.warning(f"Invalid DICOMweb study query - {err}")
             raise ValidationError(str(err)) from err
 
-        return Response([result.dataset.to_json_dict() for result in results])
+        return self.stream_results(request, results)
 
 
 class QuerySeriesAPIView(QueryAPIView):
     async def get(
         self, request: AuthenticatedApiRequest, ae_title: str, study_uid: str
-    ) -> Response:
+    ) -> StreamingHttpResponse:
         query_ds, limit_results = self._extract_query_parameters(request, study_uid)
         source_server = await self._get_dicom_server(request, ae_title, "source")
 
+        results = qido_find(source_server, query_ds, limit_results, "SERIES")
         try:
-            results = await qido_find(source_server, query_ds, limit_results, "SERIES")
+            results = await self.peek_results(results)
         except ValueError as err:
             logger.warning(f"Invalid DICOMweb series query - {err}")
             raise ValidationError(str(err)) from err
 
-        return Response([result.dataset.to_json_dict() for result in results])
+        return self.stream_results(request, results)
 
 
 class QueryImagesAPIView(QueryAPIView):
     async def get(
         self, request: AuthenticatedApiRequest, ae_title: str, series_uid: str
-    ) -> Response:
+    ) -> StreamingHttpResponse:
         query_ds, limit_results = self._extract_query_parameters(request, series_uid)
         source_server = await self._get_dicom_server(request, ae_title, "source")
 
+        results = qido_find(source_server, query_ds, limit_results, "IMAGE")
         try:
-            results = await qido_find(source_server, query_ds, limit_results, "IMAGE")
+            results = await self.peek_results(results)
         except ValueError as err:
             logger.warning(f"Invalid DICOMweb image query - {err}")
             raise ValidationError(str(err)) from err
 
-        return Response([result.dataset.to_json_dict() for result in results])
+        return self.stream_results(request, results)
 
 
 # TODO: respect permission can_retrieve
@@ -184,12 +210,8 @@ class RetrieveAPIView(WebDicomAPIView):
         return peekable_images
 
     async def extract_metadata(self, images: AsyncIterator[Dataset]) -> list[dict]:
-        metadata: list[dict] = []
-        async for image in images:
-            if hasattr(image, "PixelData"):
-                del image.PixelData
-            metadata.append(image.to_json_dict())
-        return metadata
+        # The images come from wado_retrieve_metadata and so are already without bulk data
+        return [image.to_json_dict() async for image in images]
 
 
 class RetrieveStudyAPIView(RetrieveAPIView):
@@ -220,7 +242,7 @@ class RetrieveStudyMetadataAPIView(RetrieveStudyAPIView):
         query = self.query.copy()
         query["StudyInstanceUID"] = study_uid
 
-        images = wado_retrieve(source_server, query, "STUDY")
+        images = wado_retrieve_metadata(source_server, query, "STUDY")
         metadata = await self.extract_metadata(images)
 
         renderer = cast(DicomWebWadoRenderer, getattr(request, "accepted_renderer"))
@@ -257,7 +279,7 @@ class RetrieveSeriesMetadataAPIView(RetrieveSeriesAPIView):
         query["StudyInstanceUID"] = study_uid
         query["SeriesInstanceUID"] = series_uid
 
-        images = wado_retrieve(source_server, query, "SERIES")
+        images = wado_retrieve_metadata(source_server, query, "SERIES")
         metadata = await self.extract_metadata(images)
 
         renderer = cast(DicomWebWadoRenderer, getattr(request, "accepted_renderer"))
@@ -306,7 +328,7 @@ class RetrieveImageMetadataAPIView(RetrieveImageAPIView):
         query["SeriesInstanceUID"] = series_uid
         query["SOPInstanceUID"] = image_uid
 
-        images = wado_retrieve(source_server, query, "IMAGE")
+        images = wado_retrieve_metadata(source_server, query, "IMAGE")
         metadata = await self.extract_metadata(images)
 
         renderer = cast(DicomWebWadoRenderer, getattr(request, "accepted_renderer"))
@@ -352,6 +352,10 @@ BATCH_QUERY_URGENT_PRIORITY = 7
 # (in contrast to .zip), but .zip is more widely used.
 SELECTIVE_TRANSFER_ARCHIVE_TYPE: Literal["7z", "zip"] = "zip"
 
+# The maximum number of bytes of fetched images that are buffered in memory before
+# they are appended to an archive.
+ARCHIVE_WRITE_BUFFER_SIZE = 100 * 1024 * 1024
+
 # The maximum number of resulting studies for selective_transfer query
 SELECTIVE_TRANSFER_RESULT_LIMIT = 101
 
@@ -361,6 +365,80 @@ DICOM_EXPLORER_RESULT_LIMIT = 101
 # The timeout in dicom_explorer a DICOM server must respond
 DICOM_EXPLORER_RESPONSE_TIMEOUT = 3  # seconds
 
+# The maximum number of idle DIMSE associations per DICOM server that are kept open
+# (in each process) to be reused by later operations. 0 disables the reuse.
+DIMSE_ASSOCIATION_POOL_SIZE = env.int("DIMSE_ASSOCIATION_POOL_SIZE", default=4)
+
+# The time in seconds after which an idle (pooled) DIMSE association is not reused anymore
+DIMSE_ASSOCIATION_POOL_IDLE_TIMEOUT = 30
+
+# The time in seconds the storage contexts a server accepted for C-GET are reused
+# before all contexts are proposed again (e.g. in case the server supports new ones).
+DIMSE_ACCEPTED_CONTEXTS_MAX_AGE = 60 * 60 * 24  # 1 day
+
+# The number of associations over which images are uploaded (C-STORE) concurrently
+# to a DICOM server (per upload).
+DIMSE_STORE_ASSOCIATIONS = env.int("DIMSE_STORE_ASSOCIATIONS", default=1)
+
+# The number of DICOM files of a folder that are read ahead while uploading (C-STORE)
+DIMSE_STORE_PREFETCH = 4
+
+# The number of latest C-FIND response latencies per DICOM server that are tracked to
+# derive its C-FIND timeout. Each process writes them in batches of the given size.
+DICOM_SERVER_HEALTH_WINDOW = 50
+DICOM_SERVER_LATENCY_BATCH_SIZE = 10
+
+# After how many consecutive connection failures the circuit of a DICOM server opens
+# (then operations with the server fail fast until the cooldown passed). 0 disables it.
+DICOM_SERVER_CIRCUIT_BREAKER_THRESHOLD = env.int(
+    "DICOM_SERVER_CIRCUIT_BREAKER_THRESHOLD", default=5
+)
+
+# The time in seconds after which a single operation probes if the server is available again
+DICOM_SERVER_CIRCUIT_BREAKER_COOLDOWN = 60
+
+# The DIMSE timeout (in seconds) of C-FIND operations is derived from the 95th percentile
+# of the observed C-FIND response latencies of a server (multiplied by the factor and
+# clamped by the min and max). The default timeout is used as long as too few latencies
+# were observed, and always for retrievals and uploads (C-GET, C-MOVE and C-STORE), where
+# long gaps between the responses are normal.
+DIMSE_DEFAULT_TIMEOUT = 60
+DIMSE_ADAPTIVE_TIMEOUT_FACTOR = 5
+DIMSE_ADAPTIVE_TIMEOUT_MIN = 20
+DIMSE_ADAPTIVE_TIMEOUT_MAX = 300
+DIMSE_ADAPTIVE_TIMEOUT_MIN_SAMPLES = 10
+
+# The maximum number of kept-alive HTTP connections per DICOMweb server (in each process)
+DICOMWEB_CONNECTION_POOL_SIZE = env.int("DICOMWEB_CONNECTION_POOL_SIZE", default=10)
+
+# How often a failed idempotent DICOMweb request (e.g. QIDO-RS or WADO-RS, but not STOW-RS)
+# is retried (with an exponential backoff) before the operation fails.
+DICOMWEB_RETRIES = 3
+DICOMWEB_RETRY_BACKOFF_FACTOR = 0.5
+
+# The number of results that are requested per QIDO-RS page (if not set for the
+# server itself). 0 requests all results at once.
+DICOMWEB_QIDO_PAGE_SIZE = 100
+
+# The number of concurrent WADO-RS requests (each over its own connection) a study is
+# fetched with. The series of the study are listed first (by a query) and then fetched in
+# parallel, series with more images than the batch size are split into batches of images.
+# 1 fetches the whole study with a single request. The queue size is the maximum number
+# of fetched images that wait to be handled (the fetching pauses when reached). It also
+# limits the images that wait to be streamed when the API fetches them by DIMSE.
+DICOMWEB_PARALLEL_WADO_FETCHES = env.int("DICOMWEB_PARALLEL_WADO_FETCHES", default=1)
+DICOMWEB_WADO_INSTANCE_BATCH_SIZE = 500
+DICOMWEB_WADO_QUEUE_SIZE = 100
+
+# The maximum number of images (and their total size in bytes) that are uploaded with a
+# single STOW-RS request (1 sends every image with its own request).
+DICOMWEB_STOW_BATCH_MAX_INSTANCES = env.int("DICOMWEB_STOW_BATCH_MAX_INSTANCES", default=50)
+DICOMWEB_STOW_BATCH_MAX_BYTES = 50 * 1024 * 1024
+
+# The maximum number of independent queries (e.g. of a batch query for multiple
+# modalities) that are run at the same time against a server (in each process).
+PARALLEL_QUERIES_PER_SERVER = env.int("PARALLEL_QUERIES_PER_SERVER", default=4)
+
 # The timeout we wait for images of a C-MOVE download
 C_MOVE_DOWNLOAD_TIMEOUT = 30  # seconds
 
@@ -401,6 +479,45 @@ ERROR_MESSAGE = "Processing your DicomWeb request failed."
 # Otherwise all images of the whole study are placed into folder.
 CREATE_SERIES_SUB_FOLDERS = True
 
+# The number of threads that write the fetched images to a destination folder and the
+# maximum number of images that wait to be written (the fetching pauses when reached).
+FOLDER_WRITE_WORKERS = 4
+FOLDER_WRITE_QUEUE_SIZE = 100
+
+# The written images are synced to disk in batches of this size (0 disables syncing).
+FOLDER_WRITE_FSYNC_BATCH_SIZE = 100
+
+# The maximum number of images that are buffered in memory when directly streaming
+# images from the source to the destination server. When the queue is full the download
+# waits for the upload to catch up.
+TRANSFER_STREAM_QUEUE_SIZE = 100
+
+# The number of stored images after which the manifest of a transfer task (the images
+# that already reached the destination) is saved, so that a retry can resume from there.
+TRANSFER_MANIFEST_SAVE_INTERVAL = 100
+
+# The number of series of a study that are fetched in parallel (each over its own
+# connection to the source server) when a transfer is done on the series level.
+TRANSFER_PARALLEL_SERIES_FETCHES = env.int("TRANSFER_PARALLEL_SERIES_FETCHES", default=1)
+
+# The number of processes used to pseudonymize the fetched images of a single transfer
+# task. If 0 the images are pseudonymized in the process of the task itself.
+TRANSFER_PSEUDONYMIZATION_PROCESSES = env.int("TRANSFER_PSEUDONYMIZATION_PROCESSES", default=0)
+
+# The maximum number of images that are pseudonymized by the above processes at the same time.
+TRANSFER_PSEUDONYMIZATION_QUEUE_SIZE = 50
+
+# If enabled, transfers between two servers that don't need any modification of the images
+# (no pseudonymization and no trial protocol) are done by a C-MOVE from the source directly
+# to the destination server (without the images passing ADIT). This requires that the
+# destination server is configured as a move destination on the source server.
+ENABLE_DIRECT_MOVE_TRANSFERS = env.bool("ENABLE_DIRECT_MOVE_TRANSFERS", default=False)
+
+# If enabled, images are transcoded (in the worker) when the destination server did not
+# accept their transfer syntax (e.g. compressed images are decompressed). Decompressing
+# requires a pixel data handler (like pylibjpeg) for the syntax of the images.
+ENABLE_TRANSCODING = env.bool("ENABLE_TRANSCODING", default=False)
+
 # Elements to keep during pseudonymization
 SKIP_ELEMENTS_ANONYMIZATION = [
     "AcquisitionDate",